@@ -0,0 +1,207 @@
+"""
+Drives a BeeBot through simulated days against the fake Discord in
+test/fake_discord.py: a number of guilds have posts scheduled across the
+day's time slots; on each day, the posts of every slot are sent (in order,
+without waiting for the actual times) while users guess in the channels that
+have already gotten their puzzle at a steady rate. Between days the date
+rolls over, so the second day's posts also send the previous day's "words no
+one got" messages. Reports post throughput, guess
+latency percentiles, API calls and 429s, and peak memory.
+
+Needs a saved puzzle; one is fetched from the NYT if the database has none.
+The same puzzle is used for every day. Run from the repository root with:
+
+    python -m benchmarks.bench_day [--guilds 500] [--guess-rate 50] [--days 2] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import random
+import resource
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+import bot
+from benchmarks.bench_loop_lag import get_puzzle, make_guesses
+from bot import BeeBot, BeeBotConfig
+from models import ScheduledPost
+from test.fake_discord import FakeAPI, FakeDiscord
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def guess_steadily(
+    beebot: BeeBot,
+    fake: FakeDiscord,
+    guessing: list[int],
+    guesses: list[str],
+    rate: float,
+    stop: asyncio.Event,
+    latencies: list[float],
+):
+    """
+    Sends a guess every 1/rate seconds to a random channel from guessing
+    (which grows as posts go out) until stop is set.
+    """
+    pending = set()
+
+    async def guess(message):
+        start = time.perf_counter()
+        await beebot.respond_to_guesses(message)
+        latencies.append(time.perf_counter() - start)
+
+    while not stop.is_set():
+        if guessing:
+            channel = fake.channels[random.choice(guessing)]
+            task = asyncio.create_task(
+                guess(channel.make_message(random.choice(guesses)))
+            )
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*pending)
+
+
+async def simulate_day(
+    beebot: BeeBot, fake: FakeDiscord, posts: list[ScheduledPost], puzzle, args
+) -> dict:
+    slots = defaultdict(list)
+    for post in posts:
+        slots[post.timing].append(post)
+    guessing: list[int] = []
+    latencies: list[float] = []
+    stop = asyncio.Event()
+    guesser = asyncio.create_task(
+        guess_steadily(
+            beebot,
+            fake,
+            guessing,
+            make_guesses(puzzle, 1000),
+            args.guess_rate,
+            stop,
+            latencies,
+        )
+    )
+    requests_before = fake.api.total_requests
+    limited_before = fake.api.rate_limited
+    start = time.perf_counter()
+    for timing in sorted(slots):
+        await beebot.send_scheduled_batch(slots[timing])
+        guessing.extend(post.channel_id for post in slots[timing])
+    posting = time.perf_counter() - start
+    # keep guessing for a bit after the last slot, like users do
+    await asyncio.sleep(args.linger)
+    stop.set()
+    await guesser
+    await beebot.sessions.flush()
+    return {
+        "posts": sum(metrics.sent for metrics in beebot.slot_metrics),
+        "failed": sum(metrics.failed for metrics in beebot.slot_metrics),
+        "posting": posting,
+        "latencies": sorted(latencies),
+        "requests": fake.api.total_requests - requests_before,
+        "rate_limited": fake.api.rate_limited - limited_before,
+    }
+
+
+async def main(args):
+    workdir = Path(tempfile.mkdtemp())
+    bot.bee_db = str(workdir / "bee.db")
+    bot.schedule_db = str(workdir / "schedule.db")
+    bot.command_hash_file = str(workdir / "command_hash.txt")
+    if Path(args.bee_db).exists():
+        shutil.copy(args.bee_db, bot.bee_db)
+    puzzle = await get_puzzle(bot.bee_db)
+    BeeBotConfig.post_rate_limit = args.post_rate
+
+    fake = FakeDiscord(
+        args.guilds,
+        FakeAPI(
+            latency=args.latency, jitter=args.latency / 2, rate_limit=args.api_limit
+        ),
+    )
+    beebot = BeeBot()
+    choices = [hour for hour in BeeBotConfig.timing_choices.values() if hour >= 0]
+    posts = [
+        ScheduledPost(
+            guild_id=guild.id,
+            channel_id=guild.channels[0].id,
+            timing=random.choice(choices),
+        )
+        for guild in fake.guilds.values()
+    ]
+    await beebot.storage.run(beebot.storage._add_posts, *posts)
+
+    day = date.today()
+
+    async def skip(*_):
+        pass
+
+    # the puzzle for each simulated day is provided below instead of fetched,
+    # and catching up on "missed" posts would send the first day's posts early
+    beebot.ensure_todays_puzzle = skip
+    beebot.catch_up = skip
+    beebot.get_current_date = lambda: str(day)
+
+    print(
+        f"{'day':>4} {'posts':>6} {'posts/s':>8} {'guesses':>8} {'p50 (ms)':>9}"
+        f" {'p99 (ms)':>9} {'API calls':>10} {'429s':>6} {'peak RSS (MiB)':>15}"
+    )
+    with fake.install(beebot):
+        await beebot.on_ready()
+        # the posts are sent below instead of at their actual times
+        beebot.scheduler.stop()
+        for n in range(args.days):
+            # (each day's posts start sessions of the same puzzle, which the
+            # bot treats as the previous day's once the date has moved on)
+            beebot.resolve_puzzle(str(day), puzzle)
+            beebot.slot_metrics.clear()
+            report = await simulate_day(beebot, fake, posts, puzzle, args)
+            latencies = report["latencies"]
+            print(
+                f"{n + 1:>4} {report['posts']:>6}"
+                f" {report['posts'] / report['posting']:>8.1f} {len(latencies):>8}"
+                f" {percentile(latencies, 50) * 1000:>9.2f}"
+                f" {percentile(latencies, 99) * 1000:>9.2f}"
+                f" {report['requests']:>10} {report['rate_limited']:>6}"
+                # (ru_maxrss is in KiB on Linux)
+                f" {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:>15.1f}"
+            )
+            day += timedelta(days=1)
+        await beebot.close()
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bee-db", default="data/bee.db")
+    parser.add_argument("--guilds", type=int, default=500)
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument(
+        "--guess-rate", type=float, default=50, help="guesses per second"
+    )
+    parser.add_argument(
+        "--linger",
+        type=float,
+        default=5,
+        help="seconds of guessing after each day's last post",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="seconds per API request"
+    )
+    parser.add_argument(
+        "--api-limit", type=int, default=50, help="API requests per second before 429s"
+    )
+    parser.add_argument(
+        "--post-rate",
+        type=float,
+        default=BeeBotConfig.post_rate_limit,
+        help="BeeBotConfig.post_rate_limit",
+    )
+    asyncio.run(main(parser.parse_args()))
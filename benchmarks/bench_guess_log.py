@@ -0,0 +1,132 @@
+"""
+Cost of saving guesses, one commit per guess, for three ways of storing
+sessions: bee_engine rewriting the whole SessionBee (persist_to), the
+session's bitset row being rewritten in place, and the guess being appended
+to the guess log (Storage.save_sessions). Sessions guess their answers in a
+random order, interleaved with each other; bytes written are what this
+process passed to write() for the database files and their WALs, as counted
+in /proc/self/io (so this only runs on Linux.) Loading every session back
+from its snapshot and log tail is timed as well.
+
+Needs a saved puzzle; one is fetched from the NYT if the database has none.
+Run from the repository root with:
+
+    python -m benchmarks.bench_guess_log [--sessions 50] [--guesses 2000]
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from bee_engine import SessionBee
+from sqlalchemy import update
+
+from benchmarks.bench_loop_lag import get_puzzle
+from compact_session import CompactSession
+from models import ScheduledPost, SessionProgress
+from storage import Storage
+
+
+def bytes_written() -> int:
+    """Bytes that this process has passed to write() so far."""
+    with open("/proc/self/io") as io:
+        for line in io:
+            if line.startswith("wchar:"):
+                return int(line.split()[1])
+    raise RuntimeError("wchar missing from /proc/self/io")
+
+
+def make_guesses(answers: list[str], sessions: int, count: int) -> list[tuple]:
+    """(session index, answer) pairs, each answer once per session."""
+    orders = [random.sample(answers, len(answers)) for _ in range(sessions)]
+    guesses = []
+    while len(guesses) < count and any(orders):
+        i = random.choice([i for i, order in enumerate(orders) if order])
+        guesses.append((i, orders[i].pop()))
+    return guesses
+
+
+async def measure(save, guesses: list[tuple]) -> tuple[float, float]:
+    """Returns guesses saved per second and bytes written per guess."""
+    before = bytes_written()
+    start = time.perf_counter()
+    for i, word in guesses:
+        await save(i, word)
+    elapsed = time.perf_counter() - start
+    return len(guesses) / elapsed, (bytes_written() - before) / len(guesses)
+
+
+def rewrite_row(storage: Storage, bee: CompactSession):
+    storage.session.connection().execute(
+        update(SessionProgress.__table__)
+        .where(SessionProgress.session_id == bee.session_id)
+        .values(gotten=bee.gotten_bytes())
+    )
+    storage.session.commit()
+
+
+async def start_sessions(storage: Storage, puzzle, count: int, offset: int):
+    posts = [
+        ScheduledPost(guild_id=-i, channel_id=-i, timing=7)
+        for i in range(offset + 1, offset + count + 1)
+    ]
+    return [bee for bee, _ in await storage.start_sessions(posts, puzzle)]
+
+
+async def main(args):
+    workdir = Path(tempfile.mkdtemp())
+    bee_db = str(workdir / "bee.db")
+    if Path(args.bee_db).exists():
+        shutil.copy(args.bee_db, bee_db)
+    puzzle = await get_puzzle(bee_db)
+    storage = Storage(str(workdir / "schedule.db"), bee_db)
+    guesses = make_guesses(list(puzzle.answers), args.sessions, args.guesses)
+
+    session_bees = [SessionBee(puzzle) for _ in range(args.sessions)]
+    rewritten = await start_sessions(storage, puzzle, args.sessions, 0)
+    logged = await start_sessions(storage, puzzle, args.sessions, args.sessions)
+
+    async def persist_to(i: int, word: str):
+        session_bees[i].respond_to_guesses(word)
+        session_bees[i].persist_to(bee_db)
+
+    async def rewrite(i: int, word: str):
+        rewritten[i].respond_to_guesses(word)
+        rewritten[i].take_unsaved()
+        await storage.run(rewrite_row, storage, rewritten[i])
+
+    async def append(i: int, word: str):
+        logged[i].respond_to_guesses(word)
+        await storage.save_sessions([logged[i]])
+
+    print(f"{'saving':<12} {'guesses/s':>10} {'bytes/guess':>12}")
+    for name, save in (
+        ("persist_to", persist_to),
+        ("bitset row", rewrite),
+        ("guess log", append),
+    ):
+        rate, size = await measure(save, guesses)
+        print(f"{name:<12} {rate:>10.0f} {size:>12.0f}")
+
+    start = time.perf_counter()
+    loaded = [await storage.read_session(bee.session_id) for bee in logged]
+    elapsed = time.perf_counter() - start
+    assert [bee.gotten for bee in loaded] == [bee.gotten for bee in logged]
+    print(
+        f"loaded {len(loaded)} sessions from {len(guesses)} logged guesses"
+        f" in {elapsed * 1000:.0f} ms"
+    )
+    storage.close()
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bee-db", default="data/bee.db")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--guesses", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,153 @@
+"""
+Microbenchmark for picking the guesses out of chat messages. A corpus of
+realistic messages (chatter, mentions, guesses of real answers and of made-up
+words) is run through the PuzzleIndex, and, if a saved puzzle is available,
+through SessionBee.respond_to_guesses on the raw message text the way every
+mention used to be handled.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_guess_parsing [--messages 100000] [--bee-db data/bee.db]
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+from puzzle_index import PuzzleIndex
+
+sample_puzzle = PuzzleIndex(
+    "2022-01-01",
+    "a",
+    ["l", "e", "r", "t", "n", "p"],
+    [
+        "alert",
+        "alter",
+        "antler",
+        "apparent",
+        "appeal",
+        "apple",
+        "applet",
+        "earl",
+        "eternal",
+        "lane",
+        "later",
+        "lean",
+        "leap",
+        "learn",
+        "least",
+        "lent",
+        "lantern",
+        "nape",
+        "neat",
+        "paean",
+        "pale",
+        "palette",
+        "panel",
+        "papa",
+        "parent",
+        "partner",
+        "patent",
+        "patter",
+        "peal",
+        "pean",
+        "pertain",
+        "plan",
+        "plane",
+        "planet",
+        "planner",
+        "plant",
+        "planter",
+        "plate",
+        "platen",
+        "platter",
+        "prattle",
+        "rant",
+        "rate",
+        "real",
+        "relate",
+        "renal",
+        "rental",
+        "repeal",
+        "replant",
+        "tallent",
+        "tantra",
+        "tapa",
+        "tape",
+        "taper",
+        "tarp",
+        "tattle",
+        "teal",
+        "tear",
+        "tenant",
+    ],
+)
+
+chatter = (
+    "good morning everyone did you see today's puzzle this one is hard "
+    "lol nice genius already how do you do it I only have a few words so "
+    "far brb coffee first anyone know the pangram no spoilers please haha "
+    "the hints helped wow okay that's a weird word never heard of it"
+).split()
+
+
+def make_corpus(puzzle: PuzzleIndex, count: int) -> list[str]:
+    random.seed(count)
+    answers = sorted(puzzle.answers)
+    letters = sorted(puzzle.letters)
+    corpus = []
+    for _ in range(count):
+        words = random.sample(chatter, k=random.randint(2, 12))
+        kind = random.random()
+        if kind < 0.5:
+            for _ in range(random.randint(1, 4)):
+                words.insert(random.randrange(len(words) + 1), random.choice(answers))
+        elif kind < 0.7:
+            for _ in range(random.randint(1, 3)):
+                made_up = "".join(random.choices(letters, k=random.randint(4, 9)))
+                words.insert(random.randrange(len(words) + 1), made_up)
+        if random.random() < 0.8:
+            words.insert(0, "<@936097636153425981>")
+        corpus.append(" ".join(words) + random.choice(["", "!", "?", "..."]))
+    return corpus
+
+
+def timed(label: str, func, corpus: list[str]):
+    start = time.perf_counter()
+    accepted = sum(1 for message in corpus if func(message))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:>24}: {elapsed / len(corpus) * 1e6:8.2f} µs/message,"
+        f" {accepted / len(corpus):6.1%} of messages had possible guesses"
+    )
+
+
+def main(args):
+    if args.bee_db and Path(args.bee_db).exists():
+        from bee_engine import SessionBee, SpellingBee
+
+        puzzle = SpellingBee.retrieve_saved(db_path=args.bee_db)
+        index = PuzzleIndex.from_bee(puzzle)
+        corpus = make_corpus(index, args.messages)
+
+        def respond_to_raw(message: str):
+            return SessionBee(puzzle).respond_to_guesses(message)
+
+        def respond_to_indexed(message: str):
+            guesses = index.find_guesses(message)
+            return guesses and SessionBee(puzzle).respond_to_guesses(" ".join(guesses))
+
+        timed("raw respond_to_guesses", respond_to_raw, corpus)
+        timed("indexed respond", respond_to_indexed, corpus)
+    else:
+        index = sample_puzzle
+        corpus = make_corpus(index, args.messages)
+    timed("PuzzleIndex.find_guesses", index.find_guesses, corpus)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--bee-db", default="data/bee.db")
+    main(parser.parse_args())
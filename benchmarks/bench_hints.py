@@ -0,0 +1,118 @@
+"""
+Latency of /obtain_hint's hint chart across many live sessions, each with
+some of the puzzle found, as requests for it are spread across them with
+answers being found in between: rebuilt by bee_engine (a SessionBee replayed
+to the session's progress, as get_unguessed_hints used to), looked up in the
+day's HintChart (which keeps bee_engine's text for each set of gotten answers)
+for every request, and through each session's own view of the chart, which
+only looks its text up again after the session's progress changes.
+
+Needs a saved puzzle; one is fetched from the NYT if the database has none.
+Run from the repository root with:
+
+    python -m benchmarks.bench_hints [--sessions 1000] [--requests 20000] [--found 0.1]
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from bee_engine import SessionBee
+
+from benchmarks.bench_loop_lag import get_puzzle
+from compact_session import CompactSession, PuzzleRecord
+
+
+def bee_engine_hints(bee: CompactSession) -> str:
+    probe = SessionBee(bee.record.puzzle)
+    if bee.gotten:
+        probe.respond_to_guesses(" ".join(bee.gotten_words))
+    return probe.get_unguessed_hints().format_all_for_discord()
+
+
+def chart_hints(bee: CompactSession) -> str:
+    return bee.record.hints.unguessed(bee.gotten).format_all_for_discord()
+
+
+def view_hints(bee: CompactSession) -> str:
+    return bee.get_unguessed_hints().format_all_for_discord()
+
+
+def make_sessions(record: PuzzleRecord, count: int) -> list[CompactSession]:
+    sessions = []
+    for _ in range(count):
+        bee = CompactSession.new(record)
+        found = random.randint(0, len(record.answers) // 2)
+        bee.replay(random.sample(record.answers, found))
+        sessions.append(bee)
+    return sessions
+
+
+def run_requests(get_hints, sessions, requests: list[tuple]) -> list[float]:
+    """Returns the latency of each request, in seconds."""
+    latencies = []
+    for i, word in requests:
+        bee = sessions[i]
+        if word is not None:
+            bee.respond_to_guesses(word)
+        start = time.perf_counter()
+        get_hints(bee)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main(args):
+    workdir = Path(tempfile.mkdtemp())
+    bee_db = str(workdir / "bee.db")
+    if Path(args.bee_db).exists():
+        shutil.copy(args.bee_db, bee_db)
+    puzzle = await get_puzzle(bee_db)
+    record = PuzzleRecord.from_puzzle(puzzle)
+    sessions = make_sessions(record, args.sessions)
+    # (session index, answer found just before the request or None)
+    requests = [
+        (
+            random.randrange(args.sessions),
+            random.choice(record.answers) if random.random() < args.found else None,
+        )
+        for _ in range(args.requests)
+    ]
+
+    print(
+        f"{'hints':<12} {'mean (ms)':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}"
+        f" {'total (s)':>10}"
+    )
+    for name, get_hints in (
+        ("bee_engine", bee_engine_hints),
+        ("day chart", chart_hints),
+        ("view", view_hints),
+    ):
+        latencies = run_requests(
+            get_hints, [bee.__copy__() for bee in sessions], requests
+        )
+        ms = [latency * 1000 for latency in latencies]
+        centiles = statistics.quantiles(ms, n=100)
+        print(
+            f"{name:<12} {statistics.mean(ms):>10.3f} {centiles[49]:>9.3f}"
+            f" {centiles[98]:>9.3f} {sum(latencies):>10.2f}"
+        )
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bee-db", default="data/bee.db")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument(
+        "--found",
+        type=float,
+        default=0.1,
+        help="fraction of requests that come right after an answer is found",
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,152 @@
+"""
+Per-guess latency with the old logging setup and with the queue-based one
+from logging_setup. Each guess is handled like BeeBot.respond_to_guesses does
+it (through the SessionCache), logged to the conversation log like on_message
+does, and accompanied by one schedule database query, which is what the SQL
+log records. The old setup wrote pformatted dicts and every SQL statement to
+files from the event loop; the new one hands records to a background thread,
+writes JSON lines, and leaves SQL statements out at its default level.
+
+Needs a saved puzzle; one is fetched from the NYT if the database has none.
+Run from the repository root with:
+
+    python -m benchmarks.bench_logging [--sessions 50] [--guesses 2000]
+"""
+
+import argparse
+import asyncio
+import atexit
+import logging
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from logging import FileHandler, Formatter, getLogger
+from pathlib import Path
+from pprint import pformat
+
+from bee_engine import SessionBee
+
+from benchmarks.bench_loop_lag import get_puzzle, make_guesses
+from logging_setup import LoggingConfig, setup_logging
+from session_cache import SessionCache
+from storage import Storage
+
+logger_names = ("BeeBot.External", "sqlalchemy.engine")
+
+
+def reset_loggers():
+    for name in logger_names:
+        logger = getLogger(name)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+
+
+def old_logging(log_dir: Path):
+    """The handlers that bot.py and models.py used to set up."""
+    formatter = Formatter("%(asctime)s %(levelname)s %(message)s", "%Y-%m-%d %H:%M:%S")
+    external_logger = getLogger("BeeBot.External")
+    external_logger.setLevel(logging.DEBUG)
+    handler = FileHandler(log_dir / "communication.log", mode="a+", encoding="utf-8")
+    handler.setFormatter(formatter)
+    external_logger.addHandler(handler)
+    sql_logger = getLogger("sqlalchemy.engine")
+    sql_logger.setLevel(logging.INFO)
+    sql_logger.addHandler(FileHandler(log_dir / "sql.log"))
+
+
+def log_old(content: str):
+    getLogger("BeeBot.External").info(
+        "Incoming message:\n"
+        + pformat(
+            {
+                "time": str(datetime.now()),
+                "guild": "Benchmark Guild",
+                "channel": "bees",
+                "message": content,
+            },
+            sort_dicts=False,
+        )
+    )
+
+
+def log_new(content: str):
+    getLogger("BeeBot.External").info(
+        "incoming message",
+        extra={
+            "data": {
+                "guild": "Benchmark Guild",
+                "channel": "bees",
+                "content": content,
+            }
+        },
+    )
+
+
+async def run_guesses(
+    storage: Storage, session_ids: list[str], guesses: list[str], log
+) -> list[float]:
+    cache = SessionCache(storage, flush_interval=1)
+    latencies = []
+    for message in guesses:
+        start = time.perf_counter()
+        bee = await cache.get(random.choice(session_ids))
+        if bee.respond_to_guesses(message):
+            cache.mark_dirty(bee)
+        await storage.get_post(random.randrange(1000))
+        log(message)
+        latencies.append(time.perf_counter() - start)
+    await cache.close()
+    return latencies
+
+
+async def main(args):
+    workdir = Path(tempfile.mkdtemp())
+    bee_db = str(workdir / "bee.db")
+    source = Path(args.bee_db)
+    if source.exists():
+        shutil.copy(source, bee_db)
+    old_logging(workdir)
+    storage = Storage(str(workdir / "schedule.db"), bee_db)
+    puzzle = await get_puzzle(bee_db)
+    session_ids = []
+    for _ in range(args.sessions):
+        session = SessionBee(puzzle)
+        session.persist_to(bee_db)
+        session_ids.append(session.session_id)
+    guesses = make_guesses(puzzle, args.guesses)
+
+    class Config(LoggingConfig):
+        log_dir = str(workdir / "new")
+
+    print(
+        f"{'logging':>8} {'mean (ms)':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9}"
+    )
+    setups = (("old", log_old, None), ("queued", log_new, Config))
+    for name, log, config in setups:
+        if config is not None:
+            reset_loggers()
+            listener = setup_logging(config=config)
+        latencies = await run_guesses(storage, session_ids, guesses, log)
+        ms = sorted(x * 1000 for x in latencies)
+        print(
+            f"{name:>8} {statistics.mean(ms):>10.3f}"
+            f" {ms[len(ms) // 2]:>9.3f} {ms[int(len(ms) * 0.99)]:>9.3f}"
+            f" {ms[-1]:>9.3f}"
+        )
+    listener.stop()
+    atexit.unregister(listener.stop)
+    reset_loggers()
+    storage.close()
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bee-db", default="data/bee.db")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--guesses", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+"""
+Load test for the storage layer: many concurrent guesses are processed the way
+respond_to_guesses does it while a monitor measures how late the event loop
+gets, first with the SQLite work done inline on the event loop (as it used to
+be), then with each guess loaded and saved through Storage's database thread,
+and then with sessions kept in the write-behind SessionCache.
+
+Needs a saved puzzle; one is fetched from the NYT if the database has none.
+Run from the repository root with:
+
+    python -m benchmarks.bench_loop_lag [--sessions 50] [--guesses 2000] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from bee_engine import SessionBee, SpellingBee
+
+from metrics import LagMonitor
+from session_cache import SessionCache
+from storage import Storage
+
+
+async def get_puzzle(bee_db: str) -> SpellingBee:
+    puzzle = SpellingBee.retrieve_saved(db_path=bee_db)
+    if puzzle is None:
+        puzzle = await SpellingBee.fetch_from_nyt()
+        puzzle.persist_to(bee_db)
+    return puzzle
+
+
+def make_guesses(puzzle: SpellingBee, count: int) -> list[str]:
+    answers = list(puzzle.answers)
+    letters = [puzzle.center, *puzzle.outside]
+    guesses = []
+    for _ in range(count):
+        words = random.sample(answers, k=min(2, len(answers)))
+        words.append("".join(random.choices(letters, k=random.randint(4, 8))))
+        guesses.append(f"<@1234> {' '.join(words)}")
+    return guesses
+
+
+async def run_guesses(
+    guess, session_ids: list[str], guesses: list[str], concurrency: int
+):
+    queue: asyncio.Queue = asyncio.Queue()
+    for message in guesses:
+        queue.put_nowait((random.choice(session_ids), message))
+
+    async def worker():
+        while not queue.empty():
+            await guess(*queue.get_nowait())
+            # stands in for awaiting the reactions and the status message edit
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def main(args):
+    workdir = Path(tempfile.mkdtemp())
+    bee_db = str(workdir / "bee.db")
+    source = Path(args.bee_db)
+    if source.exists():
+        shutil.copy(source, bee_db)
+    puzzle = await get_puzzle(bee_db)
+    session_ids = []
+    for _ in range(args.sessions):
+        session = SessionBee(puzzle)
+        session.persist_to(bee_db)
+        session_ids.append(session.session_id)
+    guesses = make_guesses(puzzle, args.guesses)
+
+    async def inline_guess(session_id: str, message: str):
+        bee = SessionBee.retrieve_saved(session_id, bee_db)
+        bee.persist_to(bee_db)
+        bee.respond_to_guesses(message)
+
+    storage = Storage(str(workdir / "schedule.db"), bee_db)
+
+    async def storage_guess(session_id: str, message: str):
+        bee = await storage.read_session(session_id)
+        bee.respond_to_guesses(message)
+        await storage.save_sessions([bee])
+
+    cache = SessionCache(storage, flush_interval=1)
+
+    async def cached_guess(session_id: str, message: str):
+        bee = await cache.get(session_id)
+        if bee.respond_to_guesses(message):
+            cache.mark_dirty(bee)
+
+    print(
+        f"{'mode':>8} {'guesses/s':>10} {'p50 lag (ms)':>13} {'p99 lag (ms)':>13} {'max lag (ms)':>13}"
+    )
+    modes = (
+        ("inline", inline_guess),
+        ("storage", storage_guess),
+        ("cache", cached_guess),
+    )
+    for mode, guess in modes:
+        async with LagMonitor() as monitor:
+            start = time.perf_counter()
+            await run_guesses(guess, session_ids, guesses, args.concurrency)
+            elapsed = time.perf_counter() - start
+        print(
+            f"{mode:>8} {len(guesses) / elapsed:>10.1f}"
+            f" {monitor.percentile(50) * 1000:>13.2f}"
+            f" {monitor.percentile(99) * 1000:>13.2f}"
+            f" {monitor.max_lag * 1000:>13.2f}"
+        )
+    await cache.close()
+    storage.close()
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bee-db", default="data/bee.db")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--guesses", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
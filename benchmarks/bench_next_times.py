@@ -0,0 +1,49 @@
+"""
+Compares computing the next posting time of N simulated schedules one post at
+a time with ScheduledPost.get_next_time against computing them all at once
+with models.get_next_timestamps, and checks that both give the same results.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_next_times [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.bench_scheduler import simulated_schedule
+from models import get_next_timestamps, tz
+
+
+def main(sizes: list[int]):
+    now = datetime.now(tz=tz)
+    print(f"{'schedules':>10} {'per post (s)':>13} {'batch (s)':>10} {'speedup':>8}")
+    for n in sizes:
+        posts = simulated_schedule(n)
+
+        start = time.perf_counter()
+        per_post = [scheduled.get_next_time(now).timestamp() for scheduled in posts]
+        per_post_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = get_next_timestamps([scheduled.timing for scheduled in posts], now)
+        batch_elapsed = time.perf_counter() - start
+
+        assert np.array_equal(np.array(per_post), batch)
+        print(
+            f"{n:>10} {per_post_elapsed:>13.3f} {batch_elapsed:>10.3f}"
+            f" {per_post_elapsed / batch_elapsed:>7.0f}x"
+        )
+        del posts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+    main(args.sizes)
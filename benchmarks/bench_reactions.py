@@ -0,0 +1,120 @@
+"""
+Measures how long it takes from a guess message coming in until its last
+reaction has been added, against the fake Discord in test/fake_discord.py:
+messages with several guesses each come in across a number of channels while
+status message edits are also being made, and the reactions are added either
+one after another (as respond_to_guesses used to) or through an
+OutboundQueue, which adds them concurrently and ahead of the edits. Reports
+p50/p99 latencies and 429s.
+
+The fake API doesn't enforce Discord's per-channel limits, so with guess rates
+well above a few reactions per second per channel, the sequential reactions
+get through faster than Discord would actually let them, while the queue
+sticks to the limits.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_reactions [--channels 20] [--messages 500] [--rate 5] [--latency 0.1]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from functools import partial
+
+from outbound import FEEDBACK, STATUS, OutboundQueue
+from test.fake_discord import FakeAPI, FakeDiscord
+
+reaction_choices = ["🐝", "👍", "👏", "🔁", "❌", "🤷"]
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def sequential(queue: OutboundQueue, message, reactions: list[str]):
+    for reaction in reactions:
+        await message.add_reaction(reaction)
+
+
+async def queued(queue: OutboundQueue, message, reactions: list[str]):
+    await asyncio.gather(
+        *(
+            queue.run(
+                message.channel.id,
+                "reaction",
+                partial(message.add_reaction, reaction),
+                FEEDBACK,
+            )
+            for reaction in reactions
+        )
+    )
+
+
+async def edit_status(queue: OutboundQueue, use_queue: bool, status):
+    if use_queue:
+        await queue.run(status.channel.id, "edit", partial(status.edit, "x"), STATUS)
+    else:
+        await status.edit("x")
+
+
+async def run(react, use_queue: bool, args) -> tuple[list[float], int]:
+    fake = FakeDiscord(
+        args.channels,
+        FakeAPI(latency=args.latency, jitter=args.latency / 2, rate_limit=args.limit),
+    )
+    queue = OutboundQueue()
+    channels = list(fake.channels.values())
+    statuses = {channel.id: channel.make_message("status") for channel in channels}
+    latencies = []
+
+    async def guess(channel):
+        message = channel.make_message("guesses")
+        reactions = random.sample(reaction_choices, args.reactions)
+        start = time.perf_counter()
+        await react(queue, message, reactions)
+        latencies.append(time.perf_counter() - start)
+        # (the status edit that follows a guess doesn't count towards it)
+        await edit_status(queue, use_queue, statuses[channel.id])
+
+    tasks = []
+    for _ in range(args.messages):
+        tasks.append(asyncio.create_task(guess(random.choice(channels))))
+        await asyncio.sleep(1 / args.rate)
+    await asyncio.gather(*tasks)
+    await queue.close()
+    return sorted(latencies), fake.api.rate_limited
+
+
+async def main(args):
+    print(f"{'reactions':<12} {'p50 (ms)':>9} {'p99 (ms)':>9} {'429s':>6}")
+    for name, react, use_queue in [
+        ("sequential", sequential, False),
+        ("queued", queued, True),
+    ]:
+        random.seed(0)
+        latencies, rate_limited = await run(react, use_queue, args)
+        print(
+            f"{name:<12} {percentile(latencies, 50) * 1000:>9.1f}"
+            f" {percentile(latencies, 99) * 1000:>9.1f} {rate_limited:>6}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument(
+        "--reactions", type=int, default=3, help="reactions per guess message"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=5, help="guess messages per second"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.1, help="seconds per API request"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=None, help="API requests per second before 429s"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,113 @@
+"""
+Measures how long it takes to load N simulated schedules into the posting
+scheduler at startup, and how much memory the scheduler holds onto for them.
+The old one-aiocron-job-per-guild approach can be measured for comparison.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_scheduler [--sizes 10000 100000 1000000] [--aiocron]
+"""
+
+import argparse
+import asyncio
+import gc
+import random
+import time
+import tracemalloc
+
+import aiocron
+
+from models import ScheduledPost, tz
+from scheduler import PostScheduler
+
+timing_choices = [7, 12, 16, 20, 3]
+
+
+def simulated_schedule(n: int) -> list[ScheduledPost]:
+    random.seed(n)
+    posts = []
+    for guild_id in range(n):
+        if random.random() < 0.1:
+            # "Now, and 24 hours from now, and so on"
+            timing = random.uniform(0, 24)
+        else:
+            timing = random.choice(timing_choices)
+        posts.append(
+            ScheduledPost(guild_id=guild_id, channel_id=guild_id, timing=timing)
+        )
+    return posts
+
+
+def measure(setup, teardown) -> tuple[float, int]:
+    """
+    Times setup() and then runs it a second time under tracemalloc to find how
+    much memory its result holds (tracemalloc itself slows everything down.)
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = setup()
+    elapsed = time.perf_counter() - start
+    teardown(result)
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = setup()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    teardown(result)
+    return elapsed, memory
+
+
+def load_scheduler(posts: list[ScheduledPost]) -> PostScheduler:
+    scheduler = PostScheduler(lambda due: None)
+    scheduler.load(posts)
+    return scheduler
+
+
+def load_aiocron(posts: list[ScheduledPost]) -> list[aiocron.Cron]:
+    jobs = []
+    for scheduled in posts:
+        hours = int(scheduled.timing)
+        minutes = int(scheduled.timing % 1 * 60)
+        seconds = int(scheduled.timing % 1 * 60 % 1 * 60)
+        jobs.append(
+            aiocron.crontab(
+                f"{minutes} {hours} * * * {seconds}",
+                tz=tz,
+                func=asyncio.sleep,
+                args=(0,),
+            )
+        )
+    return jobs
+
+
+async def main(sizes: list[int], compare_aiocron: bool):
+    print(
+        f"{'schedules':>10} {'approach':>10} {'startup (s)':>12} {'memory (MiB)':>13}"
+    )
+    for n in sizes:
+        posts = simulated_schedule(n)
+        elapsed, memory = measure(
+            lambda: load_scheduler(posts), lambda scheduler: scheduler.stop()
+        )
+        print(f"{n:>10} {'heap':>10} {elapsed:>12.3f} {memory / 2**20:>13.1f}")
+        if compare_aiocron:
+            elapsed, memory = measure(
+                lambda: load_aiocron(posts), lambda jobs: [j.stop() for j in jobs]
+            )
+            print(f"{n:>10} {'aiocron':>10} {elapsed:>12.3f} {memory / 2**20:>13.1f}")
+        del posts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--aiocron",
+        action="store_true",
+        help="also measure one aiocron job per schedule (slow for large sizes)",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.aiocron))
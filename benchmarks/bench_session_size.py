@@ -0,0 +1,110 @@
+"""
+Storage and memory used per session, for sessions saved by bee_engine (a
+SessionBee per channel, each with its own copy of the puzzle) and for
+CompactSessions (a bitset per channel over a PuzzleRecord shared by all of
+them). Each session gets a few answers guessed; the database size is the
+growth of the file that the sessions are saved to, and the memory is what
+stays allocated (as measured by tracemalloc) while every session is loaded
+at once, the way the SessionCache holds them.
+
+Needs a saved puzzle; one is fetched from the NYT if the database has none.
+Run from the repository root with:
+
+    python -m benchmarks.bench_session_size [--sessions 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from bee_engine import SessionBee
+
+from benchmarks.bench_loop_lag import get_puzzle
+from models import ScheduledPost
+from storage import Storage
+
+
+def db_size(db_path: str) -> int:
+    """Size of a database file once everything in its WAL is written to it."""
+    with sqlite3.connect(db_path) as db:
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.close()
+    return os.path.getsize(db_path)
+
+
+def measure(load) -> tuple[list, int]:
+    """Returns what load() returns and how many bytes it keeps allocated."""
+    tracemalloc.start()
+    loaded = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return loaded, size
+
+
+async def bee_engine_sessions(puzzle, bee_db: str, count: int) -> tuple[int, int]:
+    before = db_size(bee_db)
+    session_ids = []
+    for _ in range(count):
+        session = SessionBee(puzzle)
+        session.respond_to_guesses(" ".join(random.sample(list(puzzle.answers), 3)))
+        session.persist_to(bee_db)
+        session_ids.append(session.session_id)
+    size = db_size(bee_db) - before
+    _, memory = measure(
+        lambda: [SessionBee.retrieve_saved(id, bee_db) for id in session_ids]
+    )
+    return size, memory
+
+
+async def compact_sessions(puzzle, storage: Storage, count: int) -> tuple[int, int]:
+    schedule_db = storage.engine.url.database
+    before = db_size(schedule_db)
+    posts = [
+        ScheduledPost(guild_id=-i, channel_id=-i, timing=7) for i in range(1, count + 1)
+    ]
+    started = await storage.start_sessions(posts, puzzle)
+    for bee, _ in started:
+        bee.respond_to_guesses(" ".join(random.sample(list(puzzle.answers), 3)))
+    await storage.save_sessions([bee for bee, _ in started])
+    size = db_size(schedule_db) - before
+    # (the shared record is built before measuring, as it would have been
+    # for the day's first post)
+    session_ids = [bee.session_id for bee, _ in started]
+    _, memory = measure(
+        lambda: [storage.call_sync(storage._read_session, id) for id in session_ids]
+    )
+    return size, memory
+
+
+async def main(args):
+    workdir = Path(tempfile.mkdtemp())
+    bee_db = str(workdir / "bee.db")
+    if Path(args.bee_db).exists():
+        shutil.copy(args.bee_db, bee_db)
+    puzzle = await get_puzzle(bee_db)
+    storage = Storage(str(workdir / "schedule.db"), bee_db)
+
+    print(f"{'sessions':<12} {'DB bytes/session':>17} {'memory bytes/session':>21}")
+    for name, size, memory in [
+        ("bee_engine", *await bee_engine_sessions(puzzle, bee_db, args.sessions)),
+        ("compact", *await compact_sessions(puzzle, storage, args.sessions)),
+    ]:
+        print(
+            f"{name:<12} {size / args.sessions:>17.0f}"
+            f" {memory / args.sessions:>21.0f}"
+        )
+    storage.close()
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bee-db", default="data/bee.db")
+    parser.add_argument("--sessions", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,102 @@
+"""
+Commit throughput of the databases under the default StorageProfile and under
+SQLite's defaults (models.legacy_profile). Schedule churn adds, replaces and
+deletes scheduled posts through Storage, one commit each, the way the
+/schedule and /unschedule commands do; guess persistence saves one session at
+a time, the way each flush of a guessed-in session does.
+
+Needs a saved puzzle; one is fetched from the NYT if the database has none.
+Run from the repository root with:
+
+    python -m benchmarks.bench_storage [--posts 2000] [--guesses 2000] [--sessions 50]
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from bee_engine import SessionBee
+
+from benchmarks.bench_loop_lag import get_puzzle, make_guesses
+from models import ScheduledPost, StorageProfile, default_profile, legacy_profile
+from storage import Storage
+
+
+async def schedule_churn(storage: Storage, count: int) -> float:
+    """Returns the number of commits per second."""
+    guild_ids = list(range(1, count // 4 + 2))
+    start = time.perf_counter()
+    for i in range(count):
+        guild_id = random.choice(guild_ids)
+        if i % 4 == 3:
+            await storage.delete_post(guild_id)
+        else:
+            # replacing a guild's post deletes the old one first, like
+            # BeeBot.add_scheduled_post
+            await storage.delete_post(guild_id)
+            await storage.add_post(
+                ScheduledPost(
+                    guild_id=guild_id,
+                    channel_id=i,
+                    timing=random.choice([3, 7, 12, 16, 20]),
+                )
+            )
+    elapsed = time.perf_counter() - start
+    commits = sum(1 if i % 4 == 3 else 2 for i in range(count))
+    return commits / elapsed
+
+
+async def guess_persistence(
+    storage: Storage, session_ids: list[str], guesses: list[str]
+) -> float:
+    """Returns the number of commits per second."""
+    start = time.perf_counter()
+    for message in guesses:
+        bee = await storage.read_session(random.choice(session_ids))
+        bee.respond_to_guesses(message)
+        await storage.save_sessions([bee])
+    return len(guesses) / (time.perf_counter() - start)
+
+
+async def run_profile(
+    name: str, profile: StorageProfile, source_db: Path, args
+) -> tuple[str, float, float]:
+    workdir = Path(tempfile.mkdtemp())
+    bee_db = str(workdir / "bee.db")
+    if source_db.exists():
+        shutil.copy(source_db, bee_db)
+    storage = Storage(str(workdir / "schedule.db"), bee_db, profile)
+    puzzle = await get_puzzle(bee_db)
+    session_ids = []
+    for _ in range(args.sessions):
+        session = SessionBee(puzzle)
+        session.persist_to(bee_db)
+        session_ids.append(session.session_id)
+    guesses = make_guesses(puzzle, args.guesses)
+
+    churn = await schedule_churn(storage, args.posts)
+    persistence = await guess_persistence(storage, session_ids, guesses)
+    storage.close()
+    shutil.rmtree(workdir)
+    return name, churn, persistence
+
+
+async def main(args):
+    source_db = Path(args.bee_db)
+    print(f"{'profile':>8} {'schedule commits/s':>19} {'guess commits/s':>16}")
+    for name, profile in (("legacy", legacy_profile), ("default", default_profile)):
+        name, churn, persistence = await run_profile(name, profile, source_db, args)
+        print(f"{name:>8} {churn:>19.0f} {persistence:>16.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bee-db", default="data/bee.db")
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--guesses", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
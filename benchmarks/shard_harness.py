@@ -0,0 +1,190 @@
+"""
+Local harness for the sharded deployment that doesn't connect to Discord: runs
+N simulated shard processes against shared copies of the databases. Like the
+shards started by shards.Coordinator, each one waits for the puzzle to be
+announced through a pipe, then starts sessions for the posts of the guilds it
+owns the way a batch of scheduled posts does, and then saves guesses to those
+sessions through a SessionCache while the other shards do the same. Reports
+each shard's throughput and how many of its writes failed because the
+database was locked.
+
+Needs a saved puzzle; one is fetched from the NYT if the database has none.
+Run from the repository root with:
+
+    python -m benchmarks.shard_harness [--shards 4] [--guilds 2000] [--guesses 2000] [--legacy-profile]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+
+import sqlalchemy.exc
+from sqlalchemy.orm import Session
+
+from benchmarks.bench_loop_lag import get_puzzle, make_guesses
+from models import (
+    ScheduledPost,
+    StorageProfile,
+    create_db,
+    default_profile,
+    legacy_profile,
+    shard_for,
+)
+from session_cache import SessionCache
+from storage import Storage
+
+locked_errors = (sqlite3.OperationalError, sqlalchemy.exc.OperationalError)
+
+
+async def simulate_shard(
+    shard_id: int,
+    shard_count: int,
+    conn: Connection,
+    schedule_db: str,
+    bee_db: str,
+    guess_count: int,
+    profile: StorageProfile,
+) -> dict:
+    storage = Storage(schedule_db, bee_db, profile)
+    sessions = SessionCache(storage, flush_interval=1)
+    day, puzzle_day = await asyncio.get_running_loop().run_in_executor(None, conn.recv)
+    puzzle = await storage.load_puzzle(puzzle_day)
+    locked = 0
+
+    start = time.perf_counter()
+    owned = [
+        row.guild_id
+        async for row in storage.stream_schedule()
+        if shard_for(row.guild_id, shard_count) == shard_id
+    ]
+    posts = await storage.get_posts(owned)
+    for batch_start in range(0, len(posts), 100):
+        try:
+            await storage.start_sessions(posts[batch_start : batch_start + 100], puzzle)
+        except locked_errors:
+            locked += 1
+    posting = time.perf_counter() - start
+
+    session_ids = [post.current_session for post in posts if post.current_session]
+    start = time.perf_counter()
+    for message in make_guesses(puzzle, guess_count):
+        bee = await sessions.get(random.choice(session_ids))
+        if bee.respond_to_guesses(message):
+            sessions.mark_dirty(bee)
+        await asyncio.sleep(0)
+    try:
+        await sessions.close()
+    except locked_errors:
+        locked += 1
+    guessing = time.perf_counter() - start
+    storage.close()
+    return {
+        "shard": shard_id,
+        "posts": len(posts),
+        "posting": posting,
+        "guessing": guessing,
+        "locked": locked,
+    }
+
+
+def run_simulated_shard(*args):
+    results: multiprocessing.Queue = args[-1]
+    results.put(asyncio.run(simulate_shard(*args[:-1])))
+
+
+def populate_schedule(schedule_db: str, guilds: int, profile: StorageProfile):
+    profile.prepare(schedule_db)
+    engine = create_db(schedule_db, profile)
+    with Session(engine) as session:
+        session.add_all(
+            ScheduledPost(
+                # (shards are assigned by the timestamp bits of the ID)
+                guild_id=random.randrange(1 << 22, 1 << 62),
+                channel_id=i,
+                timing=7,
+            )
+            for i in range(guilds)
+        )
+        session.commit()
+    engine.dispose()
+
+
+async def main(args):
+    workdir = Path(tempfile.mkdtemp())
+    schedule_db = str(workdir / "schedule.db")
+    bee_db = str(workdir / "bee.db")
+    if Path(args.bee_db).exists():
+        shutil.copy(args.bee_db, bee_db)
+    puzzle = await get_puzzle(bee_db)
+    populate_schedule(schedule_db, args.guilds, args.profile)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes, conns = [], []
+    for shard_id in range(args.shards):
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=run_simulated_shard,
+            args=(
+                shard_id,
+                args.shards,
+                child_conn,
+                schedule_db,
+                bee_db,
+                args.guesses // args.shards,
+                args.profile,
+                results,
+            ),
+        )
+        process.start()
+        processes.append(process)
+        conns.append(parent_conn)
+    start = time.perf_counter()
+    for conn in conns:
+        conn.send((puzzle.day, puzzle.day))
+    reports = sorted(
+        (results.get() for _ in processes), key=lambda report: report["shard"]
+    )
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    print(f"{'shard':>5} {'posts':>6} {'posts/s':>8} {'guesses/s':>10} {'locked':>7}")
+    for report in reports:
+        print(
+            f"{report['shard']:>5} {report['posts']:>6}"
+            f" {report['posts'] / report['posting']:>8.0f}"
+            f" {args.guesses // args.shards / report['guessing']:>10.0f}"
+            f" {report['locked']:>7}"
+        )
+    print(f"all shards finished in {elapsed:.2f}s")
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--guesses", type=int, default=2000)
+    parser.add_argument(
+        "--bee-db",
+        default="data/bee.db",
+        help="database to copy a saved puzzle from",
+    )
+    parser.add_argument(
+        "--legacy-profile",
+        dest="profile",
+        action="store_const",
+        const=legacy_profile,
+        default=default_profile,
+        help="use SQLite's default settings (rollback journal, no pooling)",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -1,80 +1,55 @@
 import asyncio
+from collections import deque
 from datetime import datetime
+from functools import partial
+import hashlib
 from io import BytesIO
-from pprint import pformat
+import json
+from pathlib import Path
 import random
-from typing import Optional
-import sys
-import logging
-from logging import FileHandler, getLogger, StreamHandler
+from typing import Optional, Sequence
+from logging import getLogger
 from zoneinfo import ZoneInfo
 
 import aiocron
 import disnake as discord
 from disnake import ApplicationCommandInteraction
 from disnake.ext.commands import Param, InteractionBot, CommandSyncFlags
-from bee_engine import SessionBee, SpellingBee
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from bee_engine import SpellingBee
 
-from models import ScheduledPost, create_db, hourable
+from compact_session import CompactSession
+from daily_puzzle import PuzzlePipeline
+from fetching import NYTSource, PuzzleFetcher
+from maintenance import run_maintenance
+from metrics import BotMetrics, SlotMetrics, StartupTimings
+from outbound import BACKGROUND, FEEDBACK, OutboundQueue, default_limits
+from models import PostRow, ScheduledPost, StorageProfile, hourable, shard_for
+from puzzle_index import PuzzleIndex
+from ratelimit import RateLimiter
+from rendering import PuzzleRenderer
+from scheduler import PostScheduler
+from session_actors import SessionActors
+from session_cache import SessionCache
+from status_updates import StatusUpdater
+from storage import Storage
 
 bee_db = "data/bee.db"
 schedule_db = "data/schedule.db"
+command_hash_file = "data/command_hash.txt"
 et = ZoneInfo("America/New_York")
 
 
-def get_message_log(message: discord.Message):
-    return pformat(
-        {
-            "time": str(datetime.now(tz=et)),
-            "guild": str(message.guild),
-            "channel": str(message.channel),
-            "message": message.content,
-        },
-        sort_dicts=False,
-    )
-
-
-def logger_setup():
-    file_formatter = logging.Formatter(
-        "%(asctime)s %(levelname)s %(message)s", "%Y-%m-%d %H:%M:%S"
-    )
-
-    discord_logger = getLogger("discord")
-    for handler in discord_logger.handlers:
-        discord_logger.removeHandler(handler)
-    discord_logger.setLevel(logging.DEBUG)
-    discord_file_handler = FileHandler("logs/discord.log", mode="a+", encoding="utf-8")
-    discord_file_handler.setFormatter(file_formatter)
-    discord_logger.addHandler(discord_file_handler)
-    discord_stream_handler = StreamHandler(sys.stdout)
-    discord_stream_handler.setLevel(logging.WARNING)
-    discord_logger.addHandler(discord_stream_handler)
-
-    internal_logger = getLogger("BeeBot.Internal")
-    internal_logger.setLevel(logging.DEBUG)
-    streamhandler = StreamHandler(sys.stdout)
-    streamhandler.setLevel(logging.DEBUG)
-    internal_logger.addHandler(streamhandler)
-    filehandler = FileHandler("logs/BeeBot.log", mode="a+", encoding="utf-8")
-    filehandler.setLevel(logging.DEBUG)
-    filehandler.setFormatter(file_formatter)
-    internal_logger.addHandler(filehandler)
-
-    external_logger = getLogger("BeeBot.External")
-    external_logger.setLevel(logging.DEBUG)
-    external_file_handler = FileHandler(
-        "logs/communication.log", mode="a+", encoding="utf-8"
-    )
-    external_file_handler.setLevel(logging.DEBUG)
-    external_file_handler.setFormatter(file_formatter)
-    external_logger.addHandler(external_file_handler)
-
-    return internal_logger, external_logger
-
-
-internal_logger, external_logger = logger_setup()
+def get_message_log(message: discord.Message) -> dict:
+    """Fields for logging a message with external_logger (as extra={"data": ...})."""
+    return {
+        "guild": str(message.guild),
+        "channel": str(message.channel),
+        "content": message.content,
+    }
+
+
+internal_logger = getLogger("BeeBot.Internal")
+external_logger = getLogger("BeeBot.External")
 
 
 class BeeBotConfig:
@@ -88,6 +63,108 @@ class BeeBotConfig:
         "Now, and 24 hours from now, and so on": -1,
     }
 
+    # Posts that come due at the same time are sent together by a pool of
+    # workers if this is on (instead of each post being sent independently)
+    batched_dispatch = True
+    dispatch_workers = 8
+    # Maximum number of messages per second sent by scheduled posts; Discord's
+    # global limit is 50 API requests per second
+    post_rate_limit = 40
+
+    # Active sessions are kept in memory and the answers gotten in them are
+    # appended to the guess log in batches; the cache holds at most this many
+    # sessions, drops the ones that have been idle for this many seconds, and
+    # saves guesses this often
+    session_cache_size = 1000
+    session_idle_timeout = 60 * 60
+    session_flush_interval = 10
+    # Sessions are loaded from a snapshot plus the guesses logged since it; on
+    # this schedule, new snapshots are written for the sessions that have had
+    # at least this many guesses logged since their last one
+    guess_log_compaction_cron = "*/15 * * * *"
+    guess_log_snapshot_after = 50
+    # Guesses for each session are applied in order by a task that owns it,
+    # which exits after this many seconds without guesses
+    session_actor_idle_timeout = 60
+
+    # Status message edits for a session that come within this many seconds of
+    # the last one are merged into a single edit
+    status_edit_window = 2
+
+    # Reactions, status edits and messages in each channel are paced by
+    # per-channel token buckets of (requests, per seconds) for each route, with
+    # up to this many running at once; reactions to guesses go first
+    channel_rate_limits = default_limits
+    channel_concurrency = 5
+
+    # After a day's puzzle image has been uploaded once, link to that upload in
+    # the rest of the day's posts instead of uploading it again
+    reuse_puzzle_image = True
+
+    # Posts that were missed while the bot was offline are sent after it
+    # starts in batches of this size, at this many posts per second (on top of
+    # post_rate_limit, which they count towards as well)
+    catch_up_batch_size = 50
+    catch_up_rate = 5
+
+    # The daily puzzle graphic is rendered in a separate process; each attempt
+    # is killed after this many seconds, and the render is tried this many
+    # times before it's done in the bot's own process instead
+    render_timeout = 120
+    render_attempts = 3
+
+    # Fetching the day's puzzle is retried with exponential backoff starting
+    # at fetch_base_delay seconds and going up to fetch_max_delay; after
+    # fetch_attempts failures, fetching starts over, and waiting posts keep
+    # waiting until the puzzle comes out or the day is over. If late_notices is
+    # on, they tell their channels that it's late and that the latest saved
+    # puzzle is still open in the meantime (without starting sessions of it)
+    fetch_attempts = 8
+    fetch_base_delay = 5
+    fetch_max_delay = 5 * 60
+    late_notices = False
+
+    # Nightly database maintenance deletes the posts of guilds that the bot has
+    # left and compacts the databases, keeping the puzzles and sessions from
+    # this many days along with the sessions still in use and archiving the
+    # rest; only the latest archive_retention archives of each are kept
+    maintenance_cron = "30 2 * * *"
+    puzzle_retention_days = 7
+    archive_dir = "data/archive"
+    archive_retention = 7
+
+    # SQLite settings for the schedule and bee databases (write-ahead logging,
+    # pragmas and connection pooling); models.legacy_profile is SQLite's
+    # defaults
+    storage_profile = StorageProfile()
+
+    # Timings of each stage of handling guesses and posts, post counts and
+    # event loop lag are served in Prometheus's format at
+    # http://metrics_host:metrics_port/metrics if this is on (each shard adds
+    # its shard ID to the port)
+    metrics_enabled = False
+    metrics_host = "127.0.0.1"
+    metrics_port = 9464
+
+    # How slash commands are registered with Discord: "always" has disnake
+    # compare them with the registered ones every time the bot starts, and
+    # "hash" only registers them when a hash of their definitions differs from
+    # the one saved (in command_hash_file) the last time they were registered
+    command_sync = "hash"
+
+    @classmethod
+    def get_puzzle_pipeline(cls, storage: Storage) -> PuzzlePipeline:
+        fetcher = PuzzleFetcher(
+            NYTSource(),
+            max_attempts=cls.fetch_attempts,
+            base_delay=cls.fetch_base_delay,
+            max_delay=cls.fetch_max_delay,
+        )
+        renderer = PuzzleRenderer(
+            timeout=cls.render_timeout, attempts=cls.render_attempts
+        )
+        return PuzzlePipeline(storage, fetcher, renderer)
+
     @classmethod
     def get_timing_choices(cls) -> list[str]:
         return list(cls.timing_choices.keys())
@@ -104,25 +181,144 @@ class BeeBotConfig:
 
 class BeeBot(InteractionBot):
 
-    def __init__(self) -> None:
+    def __init__(self, startup: Optional[StartupTimings] = None, **kwargs) -> None:
         intents = discord.Intents.default()
-        super().__init__(intents=intents, command_sync_flags=CommandSyncFlags.all())
-        self.db_engine = create_db(schedule_db)
-        self.session = Session(self.db_engine)
+        # (other arguments, like shard_id and shard_count, go to InteractionBot;
+        # the commands are global, so one shard registering them is enough)
+        if BeeBotConfig.command_sync == "always" and not kwargs.get("shard_id"):
+            kwargs.setdefault("command_sync_flags", CommandSyncFlags.all())
+        else:
+            kwargs.setdefault("command_sync_flags", CommandSyncFlags.none())
+        super().__init__(intents=intents, **kwargs)
+        self.startup = startup if startup is not None else StartupTimings()
+        self.storage = Storage(schedule_db, bee_db, BeeBotConfig.storage_profile)
+        self.sessions = SessionCache(
+            self.storage,
+            max_size=BeeBotConfig.session_cache_size,
+            idle_timeout=BeeBotConfig.session_idle_timeout,
+            flush_interval=BeeBotConfig.session_flush_interval,
+        )
+        self.session_actors = SessionActors(
+            self.sessions,
+            self.score_guesses,
+            idle_timeout=BeeBotConfig.session_actor_idle_timeout,
+        )
         self.todays_puzzle_ready: Optional[asyncio.Task] = None
-        """Must be awaited to be sure that today's puzzle is available. The Task
-        is created in on_connect; thus, no puzzles can be sent before on_connect
-        runs (which makes sense anyway.)"""
+        """The Task that is retrieving today's puzzle. Posts wait for the puzzle
+        through wait_for_todays_puzzle instead, which returns as soon as the
+        puzzle is available. The Task is created in on_ready;
+        thus, no puzzles can be sent before on_ready runs (which makes sense
+        anyway.)"""
+        self.puzzle_tasks: dict[str, asyncio.Task] = {}
+        """Maps the last few days to the Tasks that got their puzzles; see
+        get_new_puzzle"""
 
         internal_logger.info("constructing new BeeBot!")
 
         self.initialized = False
-        self.scheduled_jobs: dict[int, aiocron.Cron] = {}
+        self.scheduler = PostScheduler(self.dispatch_scheduled_posts)
+        self.puzzle_indexes: dict[str, PuzzleIndex] = {}
+        self.channel_sessions: dict[tuple[int, int], Optional[str]] = {}
+        """Maps (guild ID, channel ID) to the current session ID for every
+        scheduled channel, mirroring the schedule table so that guesses can be
+        routed without a query. Kept current by add_scheduled_post,
+        remove_scheduled_post and the methods that start new sessions."""
+        self.channel_days: dict[tuple[int, int], Optional[str]] = {}
+        """The day of the puzzle that each channel's current session is for,
+        kept alongside channel_sessions, so that messages can be checked for
+        possible guesses before their session is loaded."""
+        self.post_rate_limiter = RateLimiter(BeeBotConfig.post_rate_limit)
+        self.outbound = OutboundQueue(
+            BeeBotConfig.channel_rate_limits, BeeBotConfig.channel_concurrency
+        )
+        self.status_updater = StatusUpdater(
+            BeeBotConfig.status_edit_window, self.outbound
+        )
+        self.puzzle_image_urls: dict[str, str] = {}
+        """Maps the day of the current puzzle to the URL of its uploaded image"""
+        self.image_upload_lock = asyncio.Lock()
+        self.slot_metrics: deque[SlotMetrics] = deque(maxlen=100)
+        """Throughput of the most recent batches of posts sent out"""
+        self.catch_up_rate_limiter = RateLimiter(BeeBotConfig.catch_up_rate)
+        self.catch_up_task: Optional[asyncio.Task] = None
+        self.puzzle_futures: dict[str, asyncio.Future] = {}
+        """Maps the last few days to Futures for their puzzles; see
+        get_puzzle_future"""
+        self.late_futures: dict[str, asyncio.Future] = {}
+        """Maps the last few days to Futures that are resolved with the latest
+        saved puzzle if the day's puzzle is late (see BeeBotConfig.late_notices)"""
+        self.puzzle_pipeline = BeeBotConfig.get_puzzle_pipeline(self.storage)
+        self.metrics = BotMetrics(BeeBotConfig.metrics_enabled)
+        self.metrics.add_gauge(
+            "beebot_active_sessions",
+            "Sessions held in the session cache",
+            lambda: len(self.sessions),
+        )
+        self.metrics.add_gauge(
+            "beebot_scheduled_guilds",
+            "Guilds with a scheduled post",
+            lambda: len(self.scheduler),
+        )
+        self.metrics.add_counter(
+            "beebot_status_edits_saved_total",
+            "Status message updates merged into other edits",
+            lambda: self.status_updater.edits_saved,
+        )
 
         aiocron.crontab("0 3 * * *", tz=et, func=self.get_new_puzzle)
+        aiocron.crontab(BeeBotConfig.maintenance_cron, tz=et, func=self.run_maintenance)
+        aiocron.crontab(
+            BeeBotConfig.guess_log_compaction_cron, tz=et, func=self.compact_guess_log
+        )
 
     async def get_new_puzzle(self):
+        """
+        Starts getting today's puzzle, unless the Task that was started for it
+        earlier is still running (like the one from on_ready, if the bot started
+        between midnight and the puzzle coming out.)
+        """
+        day = self.get_current_date()
+        running = self.puzzle_tasks.get(day)
+        if running is not None and not running.done():
+            internal_logger.info(f"already getting the puzzle for {day}")
+            return
         self.todays_puzzle_ready = asyncio.create_task(self.ensure_todays_puzzle())
+        self.puzzle_tasks[day] = self.todays_puzzle_ready
+        for old_day in sorted(self.puzzle_tasks)[:-3]:
+            del self.puzzle_tasks[old_day]
+
+    async def run_maintenance(self):
+        """
+        Deletes the scheduled posts of guilds that the bot is no longer in and
+        compacts the puzzle database (see maintenance.py.) This runs on the
+        storage thread, so other database work waits for it; unsaved guesses
+        are flushed first so that they end up in the compacted database.
+        """
+        if not self.initialized:
+            return
+        await self.sessions.flush()
+        report = await self.storage.run(
+            run_maintenance,
+            self.storage.engine,
+            schedule_db,
+            bee_db,
+            set(guild.id for guild in self.guilds),
+            BeeBotConfig.puzzle_retention_days,
+            BeeBotConfig.archive_dir,
+            BeeBotConfig.storage_profile,
+            BeeBotConfig.archive_retention,
+        )
+        internal_logger.info(f"database maintenance: {report}")
+
+    async def compact_guess_log(self):
+        """Writes new snapshots of the sessions with long guess logs."""
+        if not self.initialized:
+            return
+        await self.sessions.flush()
+        snapshots = await self.storage.compact_guess_log(
+            BeeBotConfig.guess_log_snapshot_after
+        )
+        internal_logger.info(f"wrote {snapshots} session snapshots")
 
     async def on_connect(self):
         """Overriding this to keep pycord from trying to register slash commands
@@ -135,25 +331,112 @@ class BeeBot(InteractionBot):
         if not self.initialized:
             await self.get_new_puzzle()
             in_guilds = set(x.id for x in self.guilds)
-            for scheduled in self.schedule:
-                # TODO: execute outstanding posts, if any
+            to_schedule = []
+            async for scheduled in self.storage.stream_schedule():
+                if not self.owns_guild(scheduled.guild_id):
+                    # (another shard's post; see shards.py)
+                    continue
                 if scheduled.guild_id in in_guilds:
-                    self.add_to_cron(scheduled)
+                    to_schedule.append(scheduled)
+                    self.channel_sessions[
+                        (scheduled.guild_id, scheduled.channel_id)
+                    ] = scheduled.current_session
+                    self.channel_days[(scheduled.guild_id, scheduled.channel_id)] = (
+                        scheduled.session_day
+                    )
                 else:
                     internal_logger.warning(
                         "scheduled post for guild that bot is not in!"
                         f" guild id is {scheduled.guild_id}"
                     )
-                    # TODO: delete ScheduledPost when brave enough
+                    # (deleted by the nightly maintenance job)
+            self.scheduler.load(to_schedule)
+            internal_logger.info(
+                f"scheduled posting jobs for {len(to_schedule)} guilds"
+            )
+            self.catch_up_task = asyncio.create_task(self.catch_up(in_guilds))
+            await self.metrics.start(
+                BeeBotConfig.metrics_host,
+                BeeBotConfig.metrics_port + (self.shard_id or 0),
+            )
             self.init_responses()
+            if BeeBotConfig.command_sync == "hash" and not self.shard_id:
+                try:
+                    await self.sync_commands()
+                except Exception:
+                    internal_logger.exception("failed to sync application commands")
             self.initialized = True
+            self.startup.record_ready()
+            internal_logger.info(f"startup: {self.startup}")
+
+    def get_command_hash(self) -> str:
+        """
+        Hash of the definitions of the bot's application commands, as they're
+        sent to Discord: their names, descriptions and parameters, including
+        the choices for each parameter (like the timing choices.)
+        """
+        definitions = sorted(
+            (command.body.to_dict() for command in self.application_commands),
+            key=lambda definition: (definition["type"], definition["name"]),
+        )
+        return hashlib.sha256(
+            json.dumps(definitions, sort_keys=True).encode()
+        ).hexdigest()
+
+    async def sync_commands(self):
+        """
+        Registers the bot's application commands with Discord, replacing the
+        ones registered before, unless their definitions haven't changed since
+        the last time this was done.
+        """
+        command_hash = self.get_command_hash()
+        hash_path = Path(command_hash_file)
+        if hash_path.exists() and hash_path.read_text().strip() == command_hash:
+            internal_logger.info("application commands unchanged; not syncing them")
+            return
+        with self.metrics.time("command_sync"):
+            await self.bulk_overwrite_global_commands(
+                [command.body for command in self.application_commands]
+            )
+        hash_path.write_text(command_hash)
+        internal_logger.info(f"synced application commands (hash {command_hash})")
+
+    async def on_slash_command_completion(self, ctx: ApplicationCommandInteraction):
+        if self.startup.record_interaction():
+            internal_logger.info(f"startup: {self.startup}")
+
+    async def close(self):
+        self.scheduler.stop()
+        if self.catch_up_task is not None:
+            self.catch_up_task.cancel()
+        await self.session_actors.close()
+        await self.status_updater.close()
+        await self.outbound.close()
+        await self.metrics.stop()
+        internal_logger.info(
+            f"merged {self.status_updater.edits_saved} status message edits"
+            f" out of {self.status_updater.requested} into others"
+        )
+        await super().close()
+        await self.sessions.close()
+        self.puzzle_pipeline.renderer.close()
+        self.storage.close()
 
     async def on_guild_join(self, guild: discord.Guild):
         internal_logger.info(f'Added to guild "{guild}"!')
 
     async def on_guild_remove(self, guild: discord.Guild):
         internal_logger.info(f'removed from guild "{guild}"')
-        self.remove_scheduled_post(guild.id)
+        await self.remove_scheduled_post(guild.id)
+
+    def owns_guild(self, guild_id: int) -> bool:
+        """
+        Whether this bot is responsible for the given guild; always true unless
+        it's one of several shards.
+        """
+        if not self.shard_count:
+            return True
+        return shard_for(guild_id, self.shard_count) == self.shard_id
 
     @staticmethod
     def get_current_date():
@@ -170,28 +453,113 @@ class BeeBot(InteractionBot):
     async def ensure_todays_puzzle(self):
         """
         If a SpellingBee for the current puzzle doesn't exist, retrieve it
-        and render the image. This method only needs to be called once a day, to
-        avoid fetching or rendering the same puzzle multiple times
-        simultaneously; the coroutine object it returns can be stored and
-        awaited to ensure the day's puzzle is available subsequently.
-        """
-        if SpellingBee.retrieve_saved(self.get_current_date(), bee_db) is None:
-            internal_logger.info("retrieving new puzzle...")
-            while True:
-                try:
-                    new_bee = await SpellingBee.fetch_from_nyt()
-                    break
-                except:
-                    await asyncio.sleep(5)
-            internal_logger.info("retrieved puzzle from NYT")
-            new_bee.persist_to(bee_db)
-            internal_logger.info("rendering graphic...")
-            await new_bee.render()
-            internal_logger.info("rendered graphic for today's puzzle")
+        and render the image (see PuzzlePipeline); either way, build its
+        PuzzleIndex and resolve the day's puzzle future with it, which wakes up
+        any posts that are waiting for it. If the puzzle never comes out, the
+        future is resolved with None so that those posts are skipped. This
+        method only needs to be called once a day, to avoid fetching or
+        rendering the same puzzle multiple times simultaneously.
+        """
+        day = self.get_current_date()
+        self.get_puzzle_future(day)
+
+        def on_puzzle(bee: SpellingBee):
+            self.get_puzzle_index(bee)
+            self.resolve_puzzle(day, bee)
+
+        def on_fallback(bee: SpellingBee):
+            self.resolve_late_puzzle(day, bee)
+
+        try:
+            with self.metrics.time("puzzle_ready"):
+                await self.puzzle_pipeline.ensure(
+                    day, on_puzzle, on_fallback if BeeBotConfig.late_notices else None
+                )
+        except Exception:
+            internal_logger.exception(
+                f"unable to get the puzzle for {day}; skipping the posts waiting"
+                " for it"
+            )
+            if not self.get_puzzle_future(day).done():
+                self.resolve_puzzle(day, None)
+
+    @staticmethod
+    def get_day_future(futures: dict[str, asyncio.Future], day: str) -> asyncio.Future:
+        """Returns the Future in futures for the given day, creating it if needed."""
+        future = futures.get(day)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            futures[day] = future
+            for old_day in sorted(futures)[:-3]:
+                del futures[old_day]
+        return future
+
+    def get_puzzle_future(self, day: str) -> asyncio.Future:
+        """
+        Returns the Future that is resolved with the puzzle for the given day
+        once it has been retrieved and rendered, or with None if it couldn't be.
+        """
+        return self.get_day_future(self.puzzle_futures, day)
+
+    def resolve_puzzle(self, day: str, bee: Optional[SpellingBee]):
+        future = self.get_puzzle_future(day)
+        if future.done():
+            # replace the result of an earlier call (which doesn't affect the
+            # posts that already got it)
+            future = asyncio.get_running_loop().create_future()
+            self.puzzle_futures[day] = future
+        future.set_result(bee)
+
+    def resolve_late_puzzle(self, day: str, fallback: SpellingBee):
+        """
+        Wakes up the posts for the given day that are waiting to tell their
+        channels that its puzzle is late; they go on waiting for it after that.
+        """
+        future = self.get_day_future(self.late_futures, day)
+        if not future.done():
+            future.set_result(fallback)
+
+    def get_puzzle_index(self, bee: SpellingBee) -> PuzzleIndex:
+        """
+        Returns the PuzzleIndex for the puzzle that a SpellingBee or session
+        is for, building it the first time it's needed.
+        """
+        index = self.puzzle_indexes.get(bee.day)
+        if index is None:
+            index = PuzzleIndex.from_bee(bee)
+            self.puzzle_indexes[bee.day] = index
+            # only the last few days' puzzles can still have active sessions
+            for day in sorted(self.puzzle_indexes)[:-3]:
+                del self.puzzle_indexes[day]
+        return index
+
+    async def find_guesses(
+        self, day: Optional[str], content: str
+    ) -> Optional[list[str]]:
+        """
+        Returns the possible guesses in a message for the given day's puzzle,
+        loading the puzzle to build its PuzzleIndex if necessary, or None if
+        the day isn't known or its puzzle can't be found.
+        """
+        if day is None:
+            return None
+        index = self.puzzle_indexes.get(day)
+        if index is None:
+            bee = await self.storage.load_puzzle(day)
+            if bee is None:
+                return None
+            index = self.get_puzzle_index(bee)
+        return index.find_guesses(content)
 
     @property
     def schedule(self) -> list[ScheduledPost]:
-        return list(x[0] for x in self.session.execute(select(ScheduledPost)))
+        """
+        Every ScheduledPost in the database. This blocks while the database is
+        queried; use self.storage.get_schedule() from the event loop instead,
+        or self.storage.stream_schedule() to go through every post without
+        loading them all at once.
+        """
+        return self.storage.call_sync(self.storage._get_schedule)
 
     async def add_scheduled_post(self, new: ScheduledPost) -> str:
         """
@@ -200,7 +568,7 @@ class BeeBot(InteractionBot):
         active session for this day's puzzle for this channel, a post will be
         immediately sent. Responds with a status update message.
         """
-        existed = self.remove_scheduled_post(new.guild_id)
+        existed = await self.remove_scheduled_post(new.guild_id)
         if existed is not None:
             internal_logger.info(f"replacing post for guild {new.guild_id}")
         # if we're replacing an old scheduled post, the new one inherits the
@@ -209,9 +577,10 @@ class BeeBot(InteractionBot):
         # briefly)
         if existed is not None and existed.current_session is not None:
             new.current_session = existed.current_session
-        self.session.add(new)
-        self.session.flush()
-        self.session.commit()
+            new.session_day = existed.session_day
+        await self.storage.add_post(new)
+        self.channel_sessions[(new.guild_id, new.channel_id)] = new.current_session
+        self.channel_days[(new.guild_id, new.channel_id)] = new.session_day
 
         # immediately send a puzzle if the time for the puzzle to be sent today
         # has passed and there wasn't already a puzzle for this day in this
@@ -223,15 +592,16 @@ class BeeBot(InteractionBot):
                 or not existed.current_session
                 or existed.channel_id != new.channel_id
             )
-            not_up_to_date = hadnt_sent_yet or (
-                SessionBee.retrieve_saved(existed.current_session, bee_db).day
+            not_up_to_date = (
+                hadnt_sent_yet
+                or (await self.sessions.read(existed.current_session)).day
                 != self.get_current_date()
             )
             if not_up_to_date:
                 asyncio.create_task(self.send_scheduled_post(new))
                 sending_now = "now and "
 
-        self.add_to_cron(new)
+        self.add_to_scheduler(new)
 
         hours = round(new.seconds_until_next_time() / 60 / 60)
         hours_statement = (
@@ -256,18 +626,13 @@ class BeeBot(InteractionBot):
             return f"Great! This channel is now On the Schedule. " + hours_statement
 
     @staticmethod
-    def get_status_message(bee: SessionBee):
+    def get_status_message(bee: CompactSession):
         prefix = "Words found so far: "
         prefix += bee.list_gotten_words(enclose_with=["||", "||"])
         prefix += f" Current ranking: {bee.get_ranking()}!"
         return prefix
 
-    async def send_scheduled_post(self, scheduled: ScheduledPost):
-        """
-        Creates a new SessionBee with the latest SpellingBee puzzle; persists
-        it, sends a message with its graphic, creates a status message, and
-        stores the ID of that so it can be updated later.
-        """
+    async def get_post_channel(self, scheduled: ScheduledPost):
         channel = self.get_channel(scheduled.channel_id)
         if channel is None:
             internal_logger.warning(f'unable to "get" channel for post:')
@@ -276,72 +641,154 @@ class BeeBot(InteractionBot):
                 channel = await self.fetch_channel(scheduled.channel_id)
             except:
                 internal_logger.warning("also unable to fetch it via api")
-                return
+                return None
             internal_logger.warning("able to fetch it via api")
-        async with channel.typing():
-            await self.todays_puzzle_ready
-            bee_base = SpellingBee.retrieve_saved(db_path=bee_db)
-            while bee_base.day != self.get_current_date():
-                # TODO: what is this supposed to do between midnight and the
-                # day's puzzle going live?
-                # internal_logger.warning(f"{bee_base.day} vs. {self.get_current_date()}")
-                await asyncio.sleep(5)
-                await self.todays_puzzle_ready
-                bee_base = SpellingBee.retrieve_saved(db_path=bee_db)
-            bee = SessionBee(bee_base)
-            bee.persist_to(bee_db)
-            old_session_id = scheduled.current_session
-            scheduled.current_session = bee.session_id
-            self.session.add(scheduled)
-            self.session.flush()
-            self.session.commit()
-            await asyncio.sleep(1)
-
-            def datesuffix(d: int):
-                return str(d) + (
-                    "th"
-                    if 11 <= d <= 13
-                    else {1: "st", 2: "nd", 3: "rd"}.get(d % 10, "th")
-                )
+        return channel
 
-            def dateformat(d: datetime):
-                return d.strftime("%A, %B ") + datesuffix(d.day)
-
-            sentiments = [
-                "and the Spelling Bee's gears are a-grinding.",
-                "for better or worse!",
-                "and tri-axle trucks are triangulating your location.",
-                "and today's quotidian bread is seeming a little more daily than usual.",
-                "and yet the world spins on.",
-                "and don't they know it.",
-                "and the sky is taking the day off today.",
-                "and the sky is looking a little bluer today.",
-                "despite our best efforts.",
-            ]
-            content = (
-                f"Good morning. It's {dateformat(datetime.now(tz=et))} in "
-                f"New York City, {random.choice(sentiments)} Reply to "
-                "this message with words that fit to help complete today's puzzle."
-            )
-            puzzle_message = await channel.send(
-                content,
-                file=discord.File(
-                    BytesIO(bee.image),
-                    filename="bee." + bee.image_file_type,
-                    description=f"Spelling Bee Puzzle. Center Letter: {bee.center}. "
-                    + f"Outside letters: {', '.join(bee.outside)}.",
-                ),
-            )
-            external_logger.info(
-                f"Outgoing puzzle message:\n{get_message_log(puzzle_message)}"
+    async def wait_for_todays_puzzle(
+        self, posts: Sequence[tuple[ScheduledPost, discord.abc.Messageable]] = ()
+    ) -> Optional[SpellingBee]:
+        """
+        Returns today's puzzle once it's ready, or None if it never comes out.
+        Between midnight and the day's puzzle going live, this waits for it to
+        come out; if it's late and BeeBotConfig.late_notices is on, the
+        channels of the given posts are told so while it's waited for.
+        """
+        day = self.get_current_date()
+        # (shielded so that a cancelled post doesn't cancel everyone's Future)
+        ready = asyncio.shield(self.get_puzzle_future(day))
+        if BeeBotConfig.late_notices and posts and not ready.done():
+            late = asyncio.shield(self.get_day_future(self.late_futures, day))
+            await asyncio.wait([ready, late], return_when=asyncio.FIRST_COMPLETED)
+            if not ready.done():
+                await self.send_late_notices(posts, late.result())
+        return await ready
+
+    async def send_late_notices(
+        self,
+        posts: Sequence[tuple[ScheduledPost, discord.abc.Messageable]],
+        fallback: SpellingBee,
+    ):
+        """
+        Tells the channels of posts that are waiting for a late puzzle that it's
+        late. The sessions they already have (of fallback, the latest puzzle
+        that came out, or an earlier one) stay open in the meantime.
+        """
+
+        async def notify(scheduled: ScheduledPost, channel):
+            content = "Today's puzzle is running late; it'll be posted here as soon as it's out."
+            if scheduled.current_session is not None:
+                content += " Until then, replies still count toward the last one."
+            try:
+                await self.send_to(channel, content)
+            except Exception:
+                internal_logger.exception(f"failed to send late notice to {channel}")
+
+        internal_logger.warning(
+            f"telling {len(posts)} channels that the puzzle after the one for"
+            f" {fallback.day} is late"
+        )
+        await asyncio.gather(
+            *(notify(scheduled, channel) for scheduled, channel in posts)
+        )
+
+    async def send_to(self, channel, *args, **kwargs) -> discord.Message:
+        """Sends a message once the rate limit for outgoing posts allows it."""
+        await self.post_rate_limiter.acquire()
+        return await self.outbound.run(
+            channel.id, "message", lambda: channel.send(*args, **kwargs), BACKGROUND
+        )
+
+    async def send_puzzle_message(self, channel, bee: CompactSession):
+        def datesuffix(d: int):
+            return str(d) + (
+                "th" if 11 <= d <= 13 else {1: "st", 2: "nd", 3: "rd"}.get(d % 10, "th")
             )
-        status_message = await channel.send(self.get_status_message(bee))
-        bee.metadata = {"status_message_id": status_message.id}
+
+        def dateformat(d: datetime):
+            return d.strftime("%A, %B ") + datesuffix(d.day)
+
+        sentiments = [
+            "and the Spelling Bee's gears are a-grinding.",
+            "for better or worse!",
+            "and tri-axle trucks are triangulating your location.",
+            "and today's quotidian bread is seeming a little more daily than usual.",
+            "and yet the world spins on.",
+            "and don't they know it.",
+            "and the sky is taking the day off today.",
+            "and the sky is looking a little bluer today.",
+            "despite our best efforts.",
+        ]
+        content = (
+            f"Good morning. It's {dateformat(datetime.now(tz=et))} in "
+            f"New York City, {random.choice(sentiments)} Reply to "
+            "this message with words that fit to help complete today's puzzle."
+        )
+        puzzle_message = None
+        if BeeBotConfig.reuse_puzzle_image:
+            if bee.day not in self.puzzle_image_urls:
+                # only one post uploads the image; the rest wait for its URL
+                async with self.image_upload_lock:
+                    if bee.day not in self.puzzle_image_urls:
+                        puzzle_message = await self.upload_puzzle_image(
+                            channel, bee, content
+                        )
+            if puzzle_message is None and bee.day in self.puzzle_image_urls:
+                try:
+                    puzzle_message = await self.send_to(
+                        channel,
+                        content,
+                        embed=discord.Embed().set_image(
+                            url=self.puzzle_image_urls[bee.day]
+                        ),
+                    )
+                except discord.HTTPException:
+                    internal_logger.exception(
+                        "unable to send puzzle image by URL; uploading it instead"
+                    )
+        if puzzle_message is None:
+            puzzle_message = await self.upload_puzzle_image(channel, bee, content)
         external_logger.info(
-            f"Outgoing status message:\n{get_message_log(status_message)}"
+            "outgoing puzzle message", extra={"data": get_message_log(puzzle_message)}
+        )
+
+    async def upload_puzzle_image(
+        self, channel, bee: CompactSession, content: str
+    ) -> discord.Message:
+        """
+        Sends a puzzle message with the puzzle's image attached, remembering the
+        URL that Discord serves the image from so that other posts of the same
+        puzzle can link to it instead of uploading it again.
+        """
+        puzzle_message = await self.send_to(
+            channel,
+            content,
+            file=discord.File(
+                BytesIO(bee.image),
+                filename="bee." + bee.image_file_type,
+                description=f"Spelling Bee Puzzle. Center Letter: {bee.center}. "
+                + f"Outside letters: {', '.join(bee.outside)}.",
+            ),
+        )
+        if puzzle_message.attachments:
+            self.puzzle_image_urls = {bee.day: puzzle_message.attachments[0].url}
+        return puzzle_message
+
+    async def send_followup_messages(
+        self, channel, bee: CompactSession, old_session_id: Optional[str]
+    ):
+        """
+        Sends the status message for a new session, storing its ID so it can be
+        updated later, and the message about the words that no one got in the
+        session before it, if any.
+        """
+        status_message = await self.send_to(channel, self.get_status_message(bee))
+        await self.sessions.set_metadata(bee, {"status_message_id": status_message.id})
+        external_logger.info(
+            "outgoing status message", extra={"data": get_message_log(status_message)}
         )
         if old_session_id:
-            old_session = SessionBee.retrieve_saved(old_session_id, bee_db)
+            old_session = await self.sessions.read(old_session_id)
             if old_session and old_session.day != self.get_current_date():
                 ungotten = old_session.get_unguessed_words()
                 if len(ungotten) >= 2:
@@ -354,41 +801,201 @@ class BeeBot(InteractionBot):
                 else:
                     yesterday_info = None
                 if yesterday_info is not None:
-                    yesterday_message = await channel.send(yesterday_info)
+                    yesterday_message = await self.send_to(channel, yesterday_info)
                     external_logger.info(
-                        f"Outgoing yesterday message:\n{get_message_log(yesterday_message)}"
+                        "outgoing yesterday message",
+                        extra={"data": get_message_log(yesterday_message)},
                     )
                 else:
-                    external_logger.info("No yesterday message needed")
+                    external_logger.info("no yesterday message needed")
+
+    async def send_scheduled_post(self, scheduled: ScheduledPost):
+        """
+        Starts a new session of the latest SpellingBee puzzle; persists it,
+        sends a message with its graphic, creates a status message, and
+        stores the ID of that so it can be updated later.
+        """
+        channel = await self.get_post_channel(scheduled)
+        if channel is None:
+            return
+        try:
+            async with channel.typing():
+                with self.metrics.time("puzzle_wait"):
+                    bee_base = await self.wait_for_todays_puzzle([(scheduled, channel)])
+                if bee_base is None:
+                    internal_logger.warning(
+                        f"skipping post to {channel}; today's puzzle never came out"
+                    )
+                    self.metrics.count_post(scheduled.timing, sent=False)
+                    return
+                with self.metrics.time("session_start"):
+                    [(bee, old_session_id)] = await self.storage.start_sessions(
+                        [scheduled], bee_base
+                    )
+                self.channel_sessions[(scheduled.guild_id, scheduled.channel_id)] = (
+                    bee.session_id
+                )
+                self.channel_days[(scheduled.guild_id, scheduled.channel_id)] = bee.day
+                await asyncio.sleep(1)
+                with self.metrics.time("puzzle_message"):
+                    await self.send_puzzle_message(channel, bee)
+            with self.metrics.time("followup_messages"):
+                await self.send_followup_messages(channel, bee, old_session_id)
+        except Exception:
+            self.metrics.count_post(scheduled.timing, sent=False)
+            raise
+        self.metrics.count_post(scheduled.timing, sent=True)
+
+    async def send_scheduled_batch(self, due: list[ScheduledPost]):
+        """
+        Sends a group of posts that are due at the same time. Today's puzzle is
+        loaded once for all of them, their sessions are all created before
+        anything is sent and the schedule changes are committed in one
+        transaction, and then the messages are sent by a fixed number of workers
+        that share the outgoing rate limit. Posts whose channels aren't cached
+        are sent individually, since finding those takes extra API calls.
+        """
+        batch = []
+        for scheduled in due:
+            channel = self.get_channel(scheduled.channel_id)
+            if channel is None:
+                asyncio.create_task(self.send_scheduled_post(scheduled))
+            else:
+                batch.append((scheduled, channel))
+        if not batch:
+            return
+        metrics = SlotMetrics(timing=due[0].timing, posts=len(batch))
+        self.slot_metrics.append(metrics)
+
+        with self.metrics.time("puzzle_wait"):
+            bee_base = await self.wait_for_todays_puzzle(batch)
+        if bee_base is None:
+            internal_logger.warning(
+                f"skipping {len(batch)} posts; today's puzzle never came out"
+            )
+            metrics.failed = len(batch)
+            for _ in batch:
+                self.metrics.count_post(metrics.timing, sent=False)
+            metrics.finish()
+            return
+        with self.metrics.time("session_start"):
+            started = await self.storage.start_sessions(
+                [scheduled for scheduled, _ in batch], bee_base
+            )
+        queue: asyncio.Queue = asyncio.Queue()
+        for (scheduled, channel), (bee, old_session_id) in zip(batch, started):
+            self.channel_sessions[(scheduled.guild_id, scheduled.channel_id)] = (
+                bee.session_id
+            )
+            self.channel_days[(scheduled.guild_id, scheduled.channel_id)] = bee.day
+            queue.put_nowait((channel, bee, old_session_id))
 
-    def add_to_cron(self, scheduled: ScheduledPost) -> aiocron.Cron:
-        hours = int(scheduled.timing)
-        minutes = int(scheduled.timing % 1 * 60)
-        seconds = int(scheduled.timing % 1 * 60 % 1 * 60)
+        async def worker():
+            while not queue.empty():
+                channel, bee, old_session_id = queue.get_nowait()
+                try:
+                    with self.metrics.time("puzzle_message"):
+                        await self.send_puzzle_message(channel, bee)
+                    metrics.record_sent()
+                    with self.metrics.time("followup_messages"):
+                        await self.send_followup_messages(channel, bee, old_session_id)
+                    self.metrics.count_post(metrics.timing, sent=True)
+                except Exception:
+                    metrics.failed += 1
+                    self.metrics.count_post(metrics.timing, sent=False)
+                    internal_logger.exception(f"failed to send post to {channel}")
+
+        worker_count = min(BeeBotConfig.dispatch_workers, queue.qsize())
+        await asyncio.gather(*(worker() for _ in range(worker_count)))
+        metrics.finish()
+        internal_logger.info(f"finished sending {metrics}")
+
+    async def catch_up(self, in_guilds: set[int]):
+        """
+        Sends the posts that were missed while the bot was offline: the ones
+        whose time has passed today but that don't have a session for today's
+        puzzle yet. They go out in batches behind their own rate limit, so
+        that restarting doesn't send a burst of thousands of posts at once.
+        """
+        now = hourable.now(tz=et).decimal_hours
+        missed = [
+            scheduled
+            for scheduled in await self.storage.get_missed_posts(
+                self.get_current_date(), now
+            )
+            if scheduled.guild_id in in_guilds
+        ]
+        if not missed:
+            return
+        internal_logger.warning(
+            f"catching up on {len(missed)} posts missed while offline; the"
+            f" earliest was due {now - missed[0].timing:.2f} hours ago"
+        )
+        size = BeeBotConfig.catch_up_batch_size
+        for start in range(0, len(missed), size):
+            for _ in missed[start : start + size]:
+                await self.catch_up_rate_limiter.acquire()
+            # the posts are looked up again in case they were changed, removed
+            # or sent by add_scheduled_post in the meantime
+            batch = await self.storage.get_missed_posts(
+                self.get_current_date(),
+                hourable.now(tz=et).decimal_hours,
+                [scheduled.guild_id for scheduled in missed[start : start + size]],
+            )
+            if batch:
+                await self.send_scheduled_batch(batch)
+            remaining = missed[start + size :]
+            if remaining:
+                behind = hourable.now(tz=et).decimal_hours - remaining[0].timing
+                internal_logger.info(
+                    f"{len(remaining)} missed posts left to catch up on; the"
+                    f" next one was due {behind:.2f} hours ago"
+                )
+        internal_logger.info(f"caught up on {len(missed)} missed posts")
+
+    def add_to_scheduler(self, scheduled: ScheduledPost) -> datetime:
+        next_time = self.scheduler.add(PostRow.from_post(scheduled))
         internal_logger.info(
-            f"using aiocron to schedule posting job "
+            f"scheduling posting job "
             f'for "{self.get_guild(scheduled.guild_id)}" '
-            f"at {hours:02}:{minutes:02}:{seconds:02} US/Eastern"
-        )
-        job = aiocron.crontab(
-            f"{minutes} {hours} * * * {seconds}",
-            tz=et,
-            func=self.send_scheduled_post,
-            args=(scheduled,),
+            f"at {next_time:%H:%M:%S} US/Eastern"
         )
-        self.scheduled_jobs[scheduled.guild_id] = job
-        return job
+        return next_time
+
+    def dispatch_scheduled_posts(self, due: list[PostRow]):
+        """Called by the scheduler with the posts that have just come due."""
+        asyncio.create_task(self.send_due_posts(due))
+
+    async def send_due_posts(self, due: list[PostRow]):
+        # the scheduler only holds PostRows; the ScheduledPosts themselves are
+        # only loaded when they're needed to start new sessions
+        posts = await self.storage.get_posts(row.guild_id for row in due)
+        if BeeBotConfig.batched_dispatch and len(posts) > 1:
+            await self.send_scheduled_batch(posts)
+        else:
+            for scheduled in posts:
+                asyncio.create_task(self.send_scheduled_post(scheduled))
+
+    def score_guesses(
+        self, bee: CompactSession, content: str, message_id: Optional[int] = None
+    ) -> list[str]:
+        """
+        Applies the guesses in a message to a session and returns the
+        reactions to them; called by the session's actor.
+        """
+        with self.metrics.time("scoring"):
+            guesses = self.get_puzzle_index(bee).find_guesses(content)
+            if not guesses:
+                return []
+            return bee.respond_to_guesses(" ".join(guesses), message_id)
 
     async def respond_to_guesses(self, message: discord.Message):
-        guild_id = message.guild.id
-        channel_id = message.channel.id
-        guessing_session_id = self.session.execute(
-            select(ScheduledPost.current_session).where(
-                ScheduledPost.guild_id == guild_id
-                and ScheduledPost.channel_id == channel_id
+        with self.metrics.time("session_lookup"):
+            guessing_session_id = self.channel_sessions.get(
+                (message.guild.id, message.channel.id)
             )
-        ).first()
-        if guessing_session_id is None or guessing_session_id[0] is None:
+            day = self.channel_days.get((message.guild.id, message.channel.id))
+        if guessing_session_id is None:
             internal_logger.warning(
                 f"tried to respond to message attached to no active session: "
                 f"guild {message.guild} ({message.guild.id}), "
@@ -396,37 +1003,57 @@ class BeeBot(InteractionBot):
                 f"message {message.content} ({message.id})"
             )
             return
-        bee = SessionBee.retrieve_saved(guessing_session_id[0], bee_db)
-        bee.persist_to(bee_db)
-        reactions = bee.respond_to_guesses(message.content)
-        for reaction in reactions:
-            await message.add_reaction(reaction)
-        status_message = await message.channel.fetch_message(
+        # messages without anything that could be an answer are dropped here,
+        # without loading their session or starting an actor for it
+        with self.metrics.time("guess_filter"):
+            guesses = await self.find_guesses(day, message.content)
+        if guesses is not None and not guesses:
+            return
+        # (this includes waiting for any guesses ahead of this message)
+        with self.metrics.time("session_actor"):
+            bee, reactions = await self.session_actors.submit(
+                guessing_session_id,
+                message.content if guesses is None else " ".join(guesses),
+                message.id,
+            )
+        if not reactions:
+            return
+        # (timed from the guess coming in to its last reaction)
+        with self.metrics.time("reactions"):
+            await asyncio.gather(
+                *(
+                    self.outbound.run(
+                        message.channel.id,
+                        "reaction",
+                        partial(message.add_reaction, reaction),
+                        FEEDBACK,
+                    )
+                    for reaction in reactions
+                )
+            )
+        status_message = message.channel.get_partial_message(
             bee.metadata["status_message_id"]
         )
-        await status_message.edit(content=self.get_status_message(bee))
+        with self.metrics.time("status_edit"):
+            await self.status_updater.update(
+                status_message, lambda: self.get_status_message(bee)
+            )
 
-    def remove_scheduled_post(self, guild_id: int) -> Optional[ScheduledPost]:
+    async def remove_scheduled_post(self, guild_id: int) -> Optional[ScheduledPost]:
         """
         Removes the scheduled post for this guild from the database if it
         exists; returns it, in that case (the current_session field may need to
         be copied to a new scheduled post for this channel.)
         """
-        if guild_id in self.scheduled_jobs:
+        if self.scheduler.remove(guild_id):
             internal_logger.info(
-                f'cancelling aiocron job for "{self.get_guild(guild_id)}"'
+                f'cancelling posting job for "{self.get_guild(guild_id)}"'
             )
-            self.scheduled_jobs[guild_id].stop()
-            del self.scheduled_jobs[guild_id]
-        existing = self.session.execute(
-            select(ScheduledPost).where(ScheduledPost.guild_id == guild_id)
-        ).fetchone()
+        existing = await self.storage.delete_post(guild_id)
         if existing is not None:
-            self.session.delete(existing[0])
-            self.session.flush()
-            self.session.commit()
-            return existing[0]
-        return None
+            self.channel_sessions.pop((existing.guild_id, existing.channel_id), None)
+            self.channel_days.pop((existing.guild_id, existing.channel_id), None)
+        return existing
 
     def init_responses(self):
 
@@ -452,15 +1079,15 @@ class BeeBot(InteractionBot):
                 f"starting to send bees to channel {ctx.channel.name} in {ctx.guild.name}"
             )
             external_logger.info(
-                "Incoming command: /start_puzzling\n"
-                + f'Responding to /start_puzzling with "{response}"'
+                "incoming command",
+                extra={"data": {"command": "/start_puzzling", "response": response}},
             )
             await ctx.response.send_message(response)
 
         @self.slash_command()
         async def stop_puzzling(ctx: ApplicationCommandInteraction):
             "Stop receiving Spelling Bees in this server!"
-            existed = self.remove_scheduled_post(ctx.guild_id) is not None
+            existed = await self.remove_scheduled_post(ctx.guild_id) is not None
             if not existed:
                 response = "This server was already not receiving Spelling Bee posts!"
             else:
@@ -468,31 +1095,29 @@ class BeeBot(InteractionBot):
                     "Okay! This server will no longer receive Spelling Bee posts."
                 )
             external_logger.info(
-                "Incoming command: /stop_puzzling\n"
-                + f'Responding to /start_puzzling with "{response}"'
+                "incoming command",
+                extra={"data": {"command": "/stop_puzzling", "response": response}},
             )
             await ctx.response.send_message(response)
 
         @self.slash_command()
         async def obtain_hint(ctx: ApplicationCommandInteraction):
             "Get an up-to-date Spelling Bee hint chart!"
-            scheduled: ScheduledPost = self.session.execute(
-                select(ScheduledPost).where(ScheduledPost.guild_id == ctx.guild_id)
-            ).first()
+            scheduled = await self.storage.get_post(ctx.guild_id)
             if not scheduled:
                 response = (
                     "Before using this slash command in this server, use "
                     "/start_puzzling to start getting puzzles!"
                 )
                 await ctx.response.send_message(response, ephemeral=True)
-            elif scheduled[0].channel_id != ctx.channel_id:
+            elif scheduled.channel_id != ctx.channel_id:
                 response = (
                     "This slash command is intended for the channel where "
-                    f"the Spelling Bees are posted (<#{scheduled[0].channel_id}>)!"
+                    f"the Spelling Bees are posted (<#{scheduled.channel_id}>)!"
                 )
                 await ctx.response.send_message(response, ephemeral=True)
             else:
-                bee = SessionBee.retrieve_saved(scheduled[0].current_session, bee_db)
+                bee = await self.sessions.get(scheduled.current_session)
                 if bee is None:
                     response = "Wait until a puzzle is posted here first!"
                     await ctx.response.send_message(response, ephemeral=True)
@@ -500,8 +1125,8 @@ class BeeBot(InteractionBot):
                     response = bee.get_unguessed_hints().format_all_for_discord()
                     await ctx.response.send_message(response)
             external_logger.info(
-                "Incoming command: /obtain_hint\n"
-                + f"Responding to /obtain_hint with:\n{response}"
+                "incoming command",
+                extra={"data": {"command": "/obtain_hint", "response": response}},
             )
 
         @self.slash_command()
@@ -509,17 +1134,17 @@ class BeeBot(InteractionBot):
             "Learn the rules of the Spelling Bee!"
             with open("rules-explanation.txt", encoding="utf-8") as explanation_file:
                 explanation = explanation_file.read()
-                scheduled: ScheduledPost = self.session.execute(
-                    select(ScheduledPost).where(ScheduledPost.guild_id == ctx.guild_id)
-                ).first()
-                if scheduled is not None and scheduled[0].channel_id != ctx.channel_id:
+                scheduled = await self.storage.get_post(ctx.guild_id)
+                if scheduled is not None and scheduled.channel_id != ctx.channel_id:
                     explanation += (
                         "\n(This server is already receiving Spelling Bee posts "
-                        f"in the <#{scheduled[0].channel_id}> channel!)"
+                        f"in the <#{scheduled.channel_id}> channel!)"
                     )
                 external_logger.info(
-                    "Incoming command: /explain_rules\n"
-                    + f"responding to /explain_rules with: \n{explanation}"
+                    "incoming command",
+                    extra={
+                        "data": {"command": "/explain_rules", "response": explanation}
+                    },
                 )
                 await ctx.response.send_message(explanation)
 
@@ -529,8 +1154,8 @@ class BeeBot(InteractionBot):
             with open("commands-explanation.txt", encoding="utf-8") as explanation_file:
                 help_message = explanation_file.read()
                 external_logger.info(
-                    "Incoming command: /help\n"
-                    + f"responding to /explain_rules with: \n{help_message}"
+                    "incoming command",
+                    extra={"data": {"command": "/help", "response": help_message}},
                 )
                 await ctx.response.send_message(help_message)
 
@@ -542,6 +1167,8 @@ class BeeBot(InteractionBot):
                 and message.guild.me.mentioned_in(message)
             ):
                 await self.respond_to_guesses(message)
-                external_logger.info("Incoming message:\n" + get_message_log(message))
+                external_logger.info(
+                    "incoming message", extra={"data": get_message_log(message)}
+                )
 
         self._schedule_app_command_preparation()
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+from bee_engine import SessionBee, SpellingBee
+
+from hint_chart import HintChart, UnguessedHints
+from puzzle_index import PuzzleIndex
+
+
+def score_word(word: str, pangram: bool) -> int:
+    # four-letter words are worth 1 point, longer ones 1 per letter, and
+    # pangrams 7 more
+    return (1 if len(word) == 4 else len(word)) + (7 if pangram else 0)
+
+
+def probe_rankings(
+    puzzle: SpellingBee, answers: Sequence[str], points: Sequence[int]
+) -> tuple[tuple[int, str], ...]:
+    """
+    Finds out the rankings that bee_engine gives sessions of a puzzle, as
+    (lowest score, ranking) pairs from the lowest score up. Each score that a
+    session can have is matched with a set of answers worth that much, and
+    throwaway sessions that have gotten those are asked for their ranking;
+    since rankings only go up with the score, that's only done for the scores
+    that are needed to narrow down where each ranking starts.
+    """
+    # a set of answers (as indexes) worth each possible score
+    subsets: dict[int, tuple[int, ...]] = {0: ()}
+    for i, word_points in enumerate(points):
+        for score, subset in list(subsets.items()):
+            subsets.setdefault(score + word_points, subset + (i,))
+    scores = sorted(subsets)
+    probed: dict[int, str] = {}
+
+    def ranking_at(k: int) -> str:
+        if k not in probed:
+            probe = SessionBee(puzzle)
+            if subsets[scores[k]]:
+                probe.respond_to_guesses(
+                    " ".join(answers[i] for i in subsets[scores[k]])
+                )
+            probed[k] = probe.get_ranking()
+        return probed[k]
+
+    starts = [(scores[0], ranking_at(0))]
+
+    def narrow(low: int, high: int):
+        # (the rankings at low and high differ)
+        if high - low == 1:
+            starts.append((scores[high], ranking_at(high)))
+            return
+        middle = (low + high) // 2
+        if ranking_at(middle) != ranking_at(low):
+            narrow(low, middle)
+        if ranking_at(middle) != ranking_at(high):
+            narrow(middle, high)
+
+    if ranking_at(0) != ranking_at(len(scores) - 1):
+        narrow(0, len(scores) - 1)
+    return tuple(sorted(starts))
+
+
+class Guess(NamedTuple):
+    """An answer being gotten in a session, as it's logged in guess_log."""
+
+    session_id: str
+    word: str
+    message_id: Optional[int]
+    guessed_at: float
+
+
+@dataclass(frozen=True, eq=False)
+class PuzzleRecord:
+    """
+    Everything about one day's puzzle that its sessions need, built once per
+    puzzle and shared by all of them: the SpellingBee itself, its answers in
+    the order that bee_engine lists unguessed words in (from least to most
+    common), which is the order of the bits in CompactSession.gotten, each
+    answer's points and the reactions that bee_engine gives it when it's
+    guessed for the first time and after that, the order that bee_engine
+    lists gotten words in (as indexes into answers) and the rankings that it
+    gives (see probe_rankings.)
+    """
+
+    puzzle: SpellingBee
+    answers: tuple[str, ...]
+    positions: dict[str, int]
+    points: tuple[int, ...]
+    new_reactions: tuple[tuple[str, ...], ...]
+    repeat_reactions: tuple[tuple[str, ...], ...]
+    listing: tuple[int, ...]
+    rankings: tuple[tuple[int, str], ...]
+
+    @classmethod
+    def from_puzzle(cls, puzzle: SpellingBee) -> PuzzleRecord:
+        # the orders, the reactions and the rankings are found out from
+        # throwaway sessions, so they're whatever bee_engine's are
+        probe = SessionBee(puzzle)
+        answers = tuple(word.lower() for word in probe.get_unguessed_words())
+        positions = {word: i for i, word in enumerate(answers)}
+        new_reactions = []
+        repeat_reactions = []
+        for word in answers:
+            new_reactions.append(tuple(probe.respond_to_guesses(word)))
+            repeat_reactions.append(tuple(probe.respond_to_guesses(word)))
+        # (enclosed in characters that can't be in a word, so that they can be
+        # picked out of the list)
+        listed = re.findall("\x00(.*?)\x01", probe.list_gotten_words(("\x00", "\x01")))
+        index = PuzzleIndex.from_bee(puzzle)
+        points = tuple(score_word(word, index.is_pangram(word)) for word in answers)
+        return cls(
+            puzzle,
+            answers,
+            positions,
+            points,
+            tuple(new_reactions),
+            tuple(repeat_reactions),
+            tuple(positions[word.lower()] for word in listed),
+            probe_rankings(puzzle, answers, points),
+        )
+
+    @property
+    def day(self) -> str:
+        return self.puzzle.day
+
+    @property
+    def total_points(self) -> int:
+        return sum(self.points)
+
+    @property
+    def bitset_size(self) -> int:
+        """Number of bytes that a session's bitset is stored in."""
+        return (len(self.answers) + 7) // 8
+
+    @cached_property
+    def hints(self) -> HintChart:
+        return HintChart(self.answers, self.format_hints)
+
+    def format_hints(self, gotten: int) -> str:
+        """
+        bee_engine's hint chart for a session that has gotten the answers whose
+        bits are set in gotten (from a throwaway session that has gotten them.)
+        """
+        probe = SessionBee(self.puzzle)
+        words = [word for i, word in enumerate(self.answers) if gotten >> i & 1]
+        if words:
+            probe.respond_to_guesses(" ".join(words))
+        return probe.get_unguessed_hints().format_all_for_discord()
+
+
+class CompactSession:
+    """
+    A session of a puzzle, stored as a bitset over its PuzzleRecord's answers
+    (with bit i set once answers[i] has been gotten) and the ID of its status
+    message instead of as a copy of the whole puzzle. It has the parts of
+    SessionBee's interface that the bot uses, answered from the bitset; the
+    puzzle's own attributes come from the shared SpellingBee.
+
+    Answers that are gotten are also kept as Guesses in unsaved until they're
+    taken to be appended to the guess log. Once a session's hints have been
+    asked for, it keeps a view of its puzzle's hint chart, and answers are
+    subtracted from that as they're gotten.
+    """
+
+    __slots__ = (
+        "session_id",
+        "record",
+        "gotten",
+        "status_message_id",
+        "unsaved",
+        "_hints",
+    )
+
+    def __init__(
+        self,
+        session_id: str,
+        record: PuzzleRecord,
+        gotten: int = 0,
+        status_message_id: Optional[int] = None,
+    ):
+        self.session_id = session_id
+        self.record = record
+        self.gotten = gotten
+        self.status_message_id = status_message_id
+        self.unsaved: list[Guess] = []
+        self._hints: Optional[UnguessedHints] = None
+
+    @classmethod
+    def new(cls, record: PuzzleRecord) -> CompactSession:
+        return cls(uuid.uuid4().hex, record)
+
+    @classmethod
+    def from_session_bee(cls, bee: SessionBee, record: PuzzleRecord) -> CompactSession:
+        """Converts a session that was saved by bee_engine."""
+        unguessed = set(word.lower() for word in bee.get_unguessed_words())
+        return cls(
+            bee.session_id,
+            record,
+            sum(
+                1 << i for i, word in enumerate(record.answers) if word not in unguessed
+            ),
+            bee.metadata.get("status_message_id"),
+        )
+
+    def __copy__(self) -> CompactSession:
+        copied = CompactSession(
+            self.session_id, self.record, self.gotten, self.status_message_id
+        )
+        copied.unsaved = list(self.unsaved)
+        # (the copy's hint view is built if it's asked for)
+        return copied
+
+    def __deepcopy__(self, memo: dict) -> CompactSession:
+        # (the record is immutable and shared)
+        return self.__copy__()
+
+    def gotten_bytes(self) -> bytes:
+        return self.gotten.to_bytes(self.record.bitset_size, "little")
+
+    @staticmethod
+    def gotten_from_bytes(gotten: bytes) -> int:
+        return int.from_bytes(gotten, "little")
+
+    # the puzzle
+
+    @property
+    def day(self) -> str:
+        return self.record.puzzle.day
+
+    @property
+    def answers(self):
+        return self.record.puzzle.answers
+
+    @property
+    def center(self) -> str:
+        return self.record.puzzle.center
+
+    @property
+    def outside(self) -> Sequence[str]:
+        return self.record.puzzle.outside
+
+    @property
+    def image(self) -> bytes:
+        return self.record.puzzle.image
+
+    @property
+    def image_file_type(self) -> str:
+        return self.record.puzzle.image_file_type
+
+    # progress
+
+    @property
+    def metadata(self) -> dict:
+        if self.status_message_id is None:
+            return {}
+        return {"status_message_id": self.status_message_id}
+
+    @metadata.setter
+    def metadata(self, metadata: dict):
+        self.status_message_id = metadata.get("status_message_id")
+
+    @property
+    def gotten_words(self) -> list[str]:
+        return [
+            word for i, word in enumerate(self.record.answers) if self.gotten >> i & 1
+        ]
+
+    @property
+    def score(self) -> int:
+        return sum(
+            points
+            for i, points in enumerate(self.record.points)
+            if self.gotten >> i & 1
+        )
+
+    def respond_to_guesses(
+        self, guesses: str, message_id: Optional[int] = None
+    ) -> list[str]:
+        """
+        Records the answers among the space-separated guesses as gotten and
+        returns the reactions to them.
+        """
+        record = self.record
+        reactions = []
+        now = time.time()
+        for word in guesses.lower().split():
+            i = record.positions.get(word)
+            if i is None:
+                continue
+            bit = 1 << i
+            if self.gotten & bit:
+                reactions.extend(record.repeat_reactions[i])
+            else:
+                self._mark_gotten(i)
+                self.unsaved.append(Guess(self.session_id, word, message_id, now))
+                reactions.extend(record.new_reactions[i])
+        return reactions
+
+    def _mark_gotten(self, i: int):
+        self.gotten |= 1 << i
+        if self._hints is not None:
+            self._hints.remove(i)
+
+    def take_unsaved(self) -> list[Guess]:
+        """Returns the guesses that haven't been saved and forgets them."""
+        unsaved, self.unsaved = self.unsaved, []
+        return unsaved
+
+    def replay(self, words: Iterable[str]):
+        """Marks logged answers as gotten, without keeping them as unsaved."""
+        positions = self.record.positions
+        for word in words:
+            i = positions.get(word)
+            if i is not None and not self.gotten >> i & 1:
+                self._mark_gotten(i)
+
+    def get_ranking(self) -> str:
+        score = self.score
+        rankings = self.record.rankings
+        ranking = rankings[0][1]
+        for lowest, name in rankings:
+            if score >= lowest:
+                ranking = name
+        return ranking
+
+    def list_gotten_words(self, enclose_with: Sequence[str] = ("", "")) -> str:
+        before, after = enclose_with
+        answers = self.record.answers
+        return ", ".join(
+            before + answers[i] + after
+            for i in self.record.listing
+            if self.gotten >> i & 1
+        )
+
+    def get_unguessed_words(self) -> list[str]:
+        """The answers that haven't been gotten, from least to most common."""
+        return [
+            word
+            for i, word in enumerate(self.record.answers)
+            if not self.gotten >> i & 1
+        ]
+
+    def get_unguessed_hints(self) -> UnguessedHints:
+        if self._hints is None:
+            self._hints = self.record.hints.unguessed(self.gotten)
+        return self._hints
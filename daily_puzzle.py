@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from datetime import datetime
+from logging import getLogger
+from typing import TYPE_CHECKING, Callable, Optional
+
+from fetching import FetchError, PuzzleFetcher
+from models import tz
+from rendering import PuzzleRenderer, RenderError
+
+if TYPE_CHECKING:
+    from bee_engine import SpellingBee
+
+    from storage import Storage
+
+internal_logger = getLogger("BeeBot.Internal")
+
+
+class PuzzlePipeline:
+    """
+    Gets a day's puzzle into the bee database: fetches it, saves it and renders
+    its graphic, and then calls on_puzzle with it. Fetching continues after a
+    failed round of retries until the puzzle is available or the day is over,
+    in which case FetchError is raised. on_puzzle is only ever called with the
+    day's own puzzle; if on_fallback is given, it's called with the latest saved
+    puzzle after the first failed round, so that the caller can tell people
+    that the day's puzzle is late.
+
+    Used by the bot itself, or by the shard coordinator when the bot is split
+    into several processes (see shards.py.)
+    """
+
+    def __init__(
+        self, storage: Storage, fetcher: PuzzleFetcher, renderer: PuzzleRenderer
+    ):
+        self.storage = storage
+        self.fetcher = fetcher
+        self.renderer = renderer
+
+    async def ensure(
+        self,
+        day: str,
+        on_puzzle: Callable[[SpellingBee], None],
+        on_fallback: Optional[Callable[[SpellingBee], None]] = None,
+    ):
+        existing = await self.storage.load_puzzle(day)
+        if existing is not None:
+            on_puzzle(existing)
+            return
+        internal_logger.info("retrieving new puzzle...")
+        used_fallback = False
+        while True:
+            try:
+                new_bee = await self.fetcher.fetch(day)
+                break
+            except FetchError:
+                internal_logger.exception("unable to retrieve puzzle from NYT")
+                if datetime.now(tz=tz).strftime("%Y-%m-%d") != day:
+                    raise FetchError(f"the puzzle for {day} never came out")
+                if on_fallback is not None and not used_fallback:
+                    used_fallback = True
+                    fallback = await self.storage.load_puzzle()
+                    if fallback is not None:
+                        internal_logger.error(
+                            f"the puzzle for {fallback.day} is the latest"
+                            f" available until the one for {day} comes out"
+                        )
+                        on_fallback(fallback)
+        internal_logger.info(
+            "retrieved puzzle from NYT in"
+            f" {self.fetcher.stats.last_latency:.2f}s ({self.fetcher.stats})"
+        )
+        await self.storage.save_puzzle(new_bee)
+        internal_logger.info("rendering graphic...")
+        try:
+            await self.renderer.render(new_bee.day, self.storage.bee_db)
+            internal_logger.info(
+                "rendered graphic for today's puzzle in"
+                f" {self.renderer.last_duration:.2f}s; max event loop lag"
+                f" was {self.renderer.last_max_lag*1000:.0f}ms"
+            )
+        except RenderError:
+            internal_logger.exception(
+                "unable to render graphic in a worker process; rendering it here"
+            )
+            await new_bee.render()
+            internal_logger.info("rendered graphic for today's puzzle")
+        # (reloaded to pick up the image saved by the renderer)
+        on_puzzle(await self.storage.load_puzzle(day))
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import TYPE_CHECKING, Any, Iterable, Optional, Protocol
+
+if TYPE_CHECKING:
+    from bee_engine import SpellingBee
+
+internal_logger = getLogger("BeeBot.Internal")
+
+
+class PuzzleSource(Protocol):
+
+    async def fetch(self) -> SpellingBee:
+        ...
+
+
+class NYTSource:
+    """Gets the current puzzle from the New York Times website."""
+
+    async def fetch(self) -> SpellingBee:
+        from bee_engine import SpellingBee
+
+        return await SpellingBee.fetch_from_nyt()
+
+
+class StubSource:
+    """
+    Stands in for the NYT when testing. Each call to fetch() returns the next
+    of the given results, or raises it if it's an exception; the last result
+    is repeated once the others have been used up. Each call takes `delay`
+    seconds.
+    """
+
+    def __init__(self, results: Iterable[Any], delay: float = 0):
+        self.results = list(results)
+        self.delay = delay
+        self.calls = 0
+
+    async def fetch(self) -> SpellingBee:
+        await asyncio.sleep(self.delay)
+        result = self.results[min(self.calls, len(self.results) - 1)]
+        self.calls += 1
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+
+class FetchError(Exception):
+    pass
+
+
+@dataclass
+class FetchStats:
+    """Counts of puzzle fetch attempts and how long the recent ones took."""
+
+    attempts: int = 0
+    failures: int = 0
+    latencies: deque[float] = field(default_factory=lambda: deque(maxlen=100))
+
+    def record(self, latency: float, succeeded: bool):
+        self.attempts += 1
+        if not succeeded:
+            self.failures += 1
+        self.latencies.append(latency)
+
+    @property
+    def last_latency(self) -> Optional[float]:
+        return self.latencies[-1] if self.latencies else None
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        return sum(self.latencies) / len(self.latencies)
+
+    def __str__(self):
+        mean = self.mean_latency
+        return (
+            f"{self.attempts} puzzle fetch attempts, {self.failures} failed"
+            + ("" if mean is None else f"; mean latency {mean:.2f}s")
+        )
+
+
+class PuzzleFetcher:
+    """
+    Gets a day's puzzle from a PuzzleSource, retrying with exponential backoff
+    and jitter: the nth retry waits somewhere between half of and the whole of
+    base_delay * 2^(n-1) seconds, capped at max_delay. A puzzle for a different
+    day (because the new one hasn't been posted yet) counts as a failure. After
+    max_attempts failures in a row, fetch() gives up and raises FetchError.
+    """
+
+    def __init__(
+        self,
+        source: PuzzleSource,
+        max_attempts: int = 8,
+        base_delay: float = 5,
+        max_delay: float = 300,
+        timeout: float = 30,
+    ):
+        self.source = source
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.stats = FetchStats()
+
+    def get_delay(self, attempt: int) -> float:
+        """Returns how long to wait after the given (1-based) failed attempt."""
+        delay = min(self.max_delay, self.base_delay * 2**(attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def fetch(self, day: str) -> SpellingBee:
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.perf_counter()
+            try:
+                bee = await asyncio.wait_for(self.source.fetch(), self.timeout)
+                if bee.day != day:
+                    raise FetchError(f"got puzzle for {bee.day} instead of {day}")
+            except Exception as e:
+                self.stats.record(time.perf_counter() - start, False)
+                internal_logger.warning(
+                    f"puzzle fetch attempt {attempt} of {self.max_attempts}"
+                    f" failed: {e!r}"
+                )
+                if attempt == self.max_attempts:
+                    raise FetchError(f"unable to fetch puzzle for {day}") from e
+                await asyncio.sleep(self.get_delay(attempt))
+            else:
+                self.stats.record(time.perf_counter() - start, True)
+                return bee
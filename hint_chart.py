@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from typing import Callable, Optional, Sequence
+
+
+class HintChart:
+    """
+    The official hint chart for one day's puzzle, shared by every session for
+    it: its answers (in PuzzleRecord order) and the chart's text for each set
+    of them that sessions have gotten. Sessions don't build their own charts;
+    they take an UnguessedHints view of this one and add the answers they get
+    to it.
+
+    The chart's text is bee_engine's: format_hints is given a bitset of the
+    answers that have been gotten (like CompactSession.gotten) and returns
+    bee_engine's chart for the rest. The text for each set of gotten answers
+    is kept, since many sessions have gotten the same ones (none, at first.)
+    """
+
+    cache_size = 1024
+    """Number of sets of gotten answers whose text is kept"""
+
+    def __init__(self, answers: Sequence[str], format_hints: Callable[[int], str]):
+        self.answers = tuple(answers)
+        self.format_hints = format_hints
+        self._formatted: dict[int, str] = {}
+
+    def format(self, gotten: int) -> str:
+        formatted = self._formatted.get(gotten)
+        if formatted is None:
+            formatted = self.format_hints(gotten)
+            if len(self._formatted) >= self.cache_size:
+                # (forgets the one that was formatted first)
+                del self._formatted[next(iter(self._formatted))]
+            self._formatted[gotten] = formatted
+        return formatted
+
+    def unguessed(self, gotten: int = 0) -> UnguessedHints:
+        """A view of the chart without the answers whose bits are set in gotten."""
+        hints = UnguessedHints(self)
+        hints.gotten = gotten
+        return hints
+
+
+class UnguessedHints:
+    """
+    A session's view of its puzzle's HintChart, leaving out the answers it has
+    gotten; remove is called with each answer's index as it's gotten. The
+    chart's text is looked up once per change to the view, so asking for it
+    again before anything else is gotten is just an attribute access.
+    """
+
+    __slots__ = ("chart", "gotten", "version", "_formatted")
+
+    def __init__(self, chart: HintChart):
+        self.chart = chart
+        self.gotten = 0
+        """Bitset of the answers that have been removed from the view"""
+        self.version = 0
+        """Number of times the view has changed"""
+        self._formatted: Optional[tuple[int, str]] = None
+
+    def remove(self, i: int):
+        self.gotten |= 1 << i
+        self.version += 1
+
+    def format_all_for_discord(self) -> str:
+        if self._formatted is None or self._formatted[0] != self.version:
+            self._formatted = (self.version, self.chart.format(self.gotten))
+        return self._formatted[1]
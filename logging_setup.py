@@ -0,0 +1,124 @@
+"""
+Logging for the bot. The loggers only put their records on a queue; a
+QueueListener thread formats them and writes them to rotating files and to
+stdout, so the event loop never waits for log output. The conversation log is
+written as one JSON object per line.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+from datetime import datetime
+from logging import Filter, Formatter, getLogger, StreamHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Optional
+
+
+class LoggingConfig:
+    log_dir = "logs"
+
+    # Log files are rotated when they reach this size, keeping this many old
+    # files around
+    max_bytes = 10 * 2**20
+    backup_count = 5
+
+    # The bot's own messages at this level and above are also printed to
+    # stdout (BeeBot.log gets all of them); for discord's, it's WARNING
+    stdout_level = logging.INFO
+
+    # sqlalchemy.engine logs each SQL statement at INFO and each result row at
+    # DEBUG; at WARNING, sql.log only gets errors
+    sql_level = logging.WARNING
+
+
+class JSONFormatter(Formatter):
+    """
+    Formats records as single lines of JSON. Fields passed to the logging call
+    as extra={"data": {...}} are included alongside the message.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created)
+            .astimezone()
+            .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "data", {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StdoutFilter(Filter):
+    def __init__(self, stdout_level: int):
+        super().__init__()
+        self.stdout_level = stdout_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.name.startswith("discord"):
+            return record.levelno >= logging.WARNING
+        return (
+            record.name.startswith("BeeBot.Internal")
+            and record.levelno >= self.stdout_level
+        )
+
+
+def setup_logging(
+    process_name: Optional[str] = None, config: type = LoggingConfig
+) -> QueueListener:
+    """
+    Routes the bot's loggers through a queue to their files and starts the
+    thread that writes them; the thread is stopped (after writing out what's
+    left in the queue) when the process exits. Processes other than the main
+    one pass a process_name, which is added to their log files' names, since
+    rotation can't be shared between processes.
+    """
+    suffix = "" if process_name is None else f".{process_name}"
+    Path(config.log_dir).mkdir(parents=True, exist_ok=True)
+    text_formatter = Formatter(
+        "%(asctime)s %(levelname)s %(message)s", "%Y-%m-%d %H:%M:%S"
+    )
+
+    def file_handler(name: str, logger_name: str, formatter: Formatter):
+        handler = RotatingFileHandler(
+            Path(config.log_dir) / f"{name}{suffix}.log",
+            maxBytes=config.max_bytes,
+            backupCount=config.backup_count,
+            encoding="utf-8",
+        )
+        handler.setFormatter(formatter)
+        handler.addFilter(Filter(logger_name))
+        return handler
+
+    stdout_handler = StreamHandler(sys.stdout)
+    stdout_handler.addFilter(StdoutFilter(config.stdout_level))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(
+        log_queue,
+        file_handler("discord", "discord", text_formatter),
+        file_handler("BeeBot", "BeeBot.Internal", text_formatter),
+        file_handler("communication", "BeeBot.External", JSONFormatter()),
+        file_handler("sql", "sqlalchemy.engine", text_formatter),
+        stdout_handler,
+    )
+    queue_handler = QueueHandler(log_queue)
+    levels = {
+        "discord": logging.DEBUG,
+        "BeeBot.Internal": logging.DEBUG,
+        "BeeBot.External": logging.DEBUG,
+        "sqlalchemy.engine": config.sql_level,
+    }
+    for logger_name, level in levels.items():
+        logger = getLogger(logger_name)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.setLevel(level)
+        logger.addHandler(queue_handler)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,370 @@
+"""
+Database maintenance: deletes the scheduled posts of guilds that the bot is no
+longer in and the sessions from before the retention window that are no longer
+in use, and compacts the puzzle database down to the puzzles and sessions
+that can still be used, archiving what's removed first (only the latest few
+archives are kept.) The bot runs this every night; it can also be run from the
+command line while the bot is stopped with:
+
+    python maintenance.py [--retention-days 7] [--archive-retention 7]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Optional
+
+import disnake as discord
+from bee_engine import SessionBee, SpellingBee
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from models import StorageProfile, create_db, default_profile, tz
+
+
+@dataclass
+class MaintenanceReport:
+    posts_deleted: int = 0
+    sessions_kept: int = 0
+    puzzles_kept: int = 0
+    rows_reclaimed: int = 0
+    bytes_reclaimed: int = 0
+    archive: Optional[str] = None
+    archives_deleted: int = 0
+    duration: float = 0
+
+    def __str__(self):
+        return (
+            f"deleted {self.posts_deleted} orphaned posts; kept"
+            f" {self.sessions_kept} sessions and {self.puzzles_kept} puzzles;"
+            f" reclaimed {self.rows_reclaimed} rows and"
+            f" {self.bytes_reclaimed / 2**20:.1f} MiB in {self.duration:.1f}s"
+            + (
+                ""
+                if self.archive is None
+                else f"; archived a copy of the old database to {self.archive}"
+            )
+            + (
+                ""
+                if not self.archives_deleted
+                else f"; deleted {self.archives_deleted} old archives"
+            )
+        )
+
+
+def count_rows(db_path: str) -> int:
+    """Returns the total number of rows in all of a database's tables."""
+    with sqlite3.connect(db_path) as db:
+        tables = [
+            row[0]
+            for row in db.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+                " AND name NOT LIKE 'sqlite_%'"
+            )
+        ]
+        total = sum(
+            db.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables
+        )
+    db.close()
+    return total
+
+
+def vacuum(db_path: str):
+    with sqlite3.connect(db_path, isolation_level=None) as db:
+        db.execute("VACUUM")
+        db.execute("PRAGMA optimize")
+    db.close()
+
+
+def delete_orphaned_posts(
+    engine: Engine, guild_ids: set[int], batch_size: int = 500
+) -> int:
+    """
+    Deletes the scheduled posts of guilds that aren't in guild_ids, a batch at
+    a time so that the write lock is only held briefly; returns how many
+    were deleted.
+    """
+    if not guild_ids:
+        # more likely to mean that the guilds haven't been loaded than that the
+        # bot was removed from every one of them
+        return 0
+    with engine.connect() as connection:
+        orphaned = [
+            row.id
+            for row in connection.execute(text("SELECT id, guild_id FROM schedule"))
+            if row.guild_id not in guild_ids
+        ]
+    for start in range(0, len(orphaned), batch_size):
+        batch = orphaned[start : start + batch_size]
+        with engine.begin() as connection:
+            connection.execute(
+                text(f"DELETE FROM schedule WHERE id IN ({','.join(map(str, batch))})")
+            )
+    return len(orphaned)
+
+
+def delete_stale_sessions(
+    engine: Engine, retention_days: int = 7, archive_dir: str = "data/archive"
+) -> int:
+    """
+    Deletes the sessions in the schedule database that aren't any post's
+    current session and whose puzzles are older than the last retention_days
+    days, along with their guess logs; returns how many sessions were deleted.
+    Their rows are copied into a new database in archive_dir first.
+    """
+    today = datetime.now(tz=tz).date()
+    cutoff = (today - timedelta(days=retention_days - 1)).strftime("%Y-%m-%d")
+    stale = (
+        "SELECT session_id FROM main.session_progress WHERE day < :cutoff"
+        " AND session_id NOT IN (SELECT current_session FROM main.schedule"
+        " WHERE current_session IS NOT NULL)"
+    )
+    with engine.connect() as connection:
+        if not connection.execute(text(stale), {"cutoff": cutoff}).first():
+            return 0
+        Path(archive_dir).mkdir(parents=True, exist_ok=True)
+        archive = str(Path(archive_dir) / f"sessions-{today}-{int(time.time())}.db")
+        connection.execute(
+            text("ATTACH DATABASE :archive AS archive"), {"archive": archive}
+        )
+        try:
+            connection.execute(
+                text(
+                    "CREATE TABLE archive.session_progress AS"
+                    f" SELECT * FROM main.session_progress WHERE session_id IN ({stale})"
+                ),
+                {"cutoff": cutoff},
+            )
+            connection.execute(
+                text(
+                    "CREATE TABLE archive.guess_log AS SELECT * FROM main.guess_log"
+                    " WHERE session_id IN"
+                    " (SELECT session_id FROM archive.session_progress)"
+                )
+            )
+            deleted = connection.execute(
+                text(
+                    "DELETE FROM main.session_progress WHERE session_id IN"
+                    " (SELECT session_id FROM archive.session_progress)"
+                )
+            ).rowcount
+            connection.execute(
+                text(
+                    "DELETE FROM main.guess_log WHERE session_id IN"
+                    " (SELECT session_id FROM archive.session_progress)"
+                )
+            )
+            connection.commit()
+        finally:
+            # (a database can't be detached while a transaction is open)
+            connection.rollback()
+            connection.execute(text("DETACH DATABASE archive"))
+            connection.commit()
+    return deleted
+
+
+def prune_archives(archive_dir: str, prefix: str, keep: int) -> int:
+    """
+    Deletes all but the latest keep archives in archive_dir whose names start
+    with prefix; returns how many were deleted. Archives are named with the
+    date and time that they were written, so their names sort by age.
+    """
+    archives = sorted(Path(archive_dir).glob(f"{prefix}-*.db"))
+    old = archives[: max(len(archives) - keep, 0)]
+    for archive in old:
+        archive.unlink()
+    return len(old)
+
+
+def compact_bee_db(
+    bee_db: str,
+    session_ids: Iterable[str],
+    retention_days: int,
+    archive_dir: str,
+    report: MaintenanceReport,
+    profile: StorageProfile = default_profile,
+    session_days: Iterable[str] = (),
+):
+    """
+    Copies the puzzles from the last retention_days days and from
+    session_days, and the sessions with the given IDs that bee_engine saved
+    (along with their puzzles), into a scratch database, writes a copy of
+    bee_db to archive_dir, and then overwrites bee_db's contents with the
+    scratch database's. Sessions that aren't anyone's current session can't be
+    guessed in or shown anymore, so this is what gets rid of them.
+
+    bee_db is written to in place, through SQLite's backup API, rather than
+    having a new file moved over it: connections that are open to it see the
+    new contents like any other write, and its WAL and shared memory files
+    stay paired with it. Only reads are done on it until then. The archive is
+    written with VACUUM INTO, so it's a consistent copy of the database that
+    includes whatever was in the WAL.
+    """
+    compacted = bee_db + ".compacting"
+    Path(compacted).unlink(missing_ok=True)
+    today = datetime.now(tz=tz).date()
+    days = [
+        (today - timedelta(days=n)).strftime("%Y-%m-%d") for n in range(retention_days)
+    ]
+
+    copied_days = set()
+
+    def copy_puzzle(day: str):
+        if day in copied_days:
+            return
+        copied_days.add(day)
+        puzzle = SpellingBee.retrieve_saved(day, bee_db)
+        if puzzle is not None:
+            puzzle.persist_to(compacted)
+            report.puzzles_kept += 1
+
+    for day in [*days, *session_days]:
+        copy_puzzle(day)
+    for session_id in session_ids:
+        session = SessionBee.retrieve_saved(session_id, bee_db)
+        if session is not None:
+            copy_puzzle(session.day)
+            session.persist_to(compacted)
+            report.sessions_kept += 1
+    if not os.path.exists(compacted):
+        # nothing to keep; leave the database as it is
+        return
+    rows = count_rows(bee_db)
+    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+    archive = str(Path(archive_dir) / f"bee-{today}-{int(time.time())}.db")
+    with sqlite3.connect(
+        bee_db, timeout=profile.busy_timeout, isolation_level=None
+    ) as db:
+        # (moves everything in the WAL into the database file, so that its
+        # size is the database's whole size)
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size = os.path.getsize(bee_db)
+        db.execute("VACUUM INTO ?", (archive,))
+        # a backup to a database in WAL mode can't change its page size
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        with sqlite3.connect(compacted, isolation_level=None) as source:
+            source.execute(f"PRAGMA page_size = {page_size}")
+            source.execute("VACUUM")
+            source.backup(db)
+        source.close()
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db.execute("PRAGMA optimize")
+    db.close()
+    Path(compacted).unlink()
+
+    report.rows_reclaimed += rows - count_rows(bee_db)
+    report.bytes_reclaimed += size - os.path.getsize(bee_db)
+    report.archive = archive
+
+
+def run_maintenance(
+    engine: Engine,
+    schedule_db: str,
+    bee_db: str,
+    guild_ids: set[int],
+    retention_days: int = 7,
+    archive_dir: str = "data/archive",
+    profile: StorageProfile = default_profile,
+    archive_retention: int = 7,
+) -> MaintenanceReport:
+    """
+    Deletes orphaned posts and old sessions, compacts the puzzle database,
+    keeping the latest archive_retention archives of each, and vacuums the
+    schedule database. This
+    does blocking database work, so in the bot it
+    runs on the storage thread (see Storage.run), where nothing else can use
+    the databases while it's rewriting them.
+    """
+    start = time.perf_counter()
+    report = MaintenanceReport()
+    report.posts_deleted = delete_orphaned_posts(engine, guild_ids)
+    report.rows_reclaimed += delete_stale_sessions(engine, retention_days, archive_dir)
+    with engine.connect() as connection:
+        session_ids = [
+            row[0]
+            for row in connection.execute(
+                text(
+                    "SELECT current_session FROM schedule"
+                    " WHERE current_session IS NOT NULL"
+                )
+            )
+        ]
+        # (the compact sessions' puzzles are still needed for them)
+        session_days = [
+            row[0]
+            for row in connection.execute(
+                text("SELECT DISTINCT day FROM session_progress")
+            )
+        ]
+        report.sessions_kept += connection.execute(
+            text("SELECT COUNT(*) FROM session_progress")
+        ).scalar()
+    compact_bee_db(
+        bee_db,
+        session_ids,
+        retention_days,
+        archive_dir,
+        report,
+        profile,
+        session_days,
+    )
+    for prefix in ("bee", "sessions"):
+        report.archives_deleted += prune_archives(
+            archive_dir, prefix, archive_retention
+        )
+    schedule_size = os.path.getsize(schedule_db)
+    vacuum(schedule_db)
+    report.bytes_reclaimed += schedule_size - os.path.getsize(schedule_db)
+    report.duration = time.perf_counter() - start
+    return report
+
+
+async def fetch_guild_ids(token: str) -> set[int]:
+    """Logs in as the bot just long enough to get the IDs of its guilds."""
+    client = discord.Client(intents=discord.Intents.none())
+    await client.login(token)
+    try:
+        return set([guild.id async for guild in client.fetch_guilds(limit=None)])
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--schedule-db", default="data/schedule.db")
+    parser.add_argument("--bee-db", default="data/bee.db")
+    parser.add_argument("--archive-dir", default="data/archive")
+    parser.add_argument(
+        "--retention-days",
+        type=int,
+        default=7,
+        help="keep the puzzles from this many days, including today",
+    )
+    parser.add_argument(
+        "--archive-retention",
+        type=int,
+        default=7,
+        help="keep this many of the latest archives of the puzzle database",
+    )
+    args = parser.parse_args()
+    with open("login_token.txt") as token_file:
+        token = token_file.read()
+    guild_ids = asyncio.run(fetch_guild_ids(token))
+    print(f"bot is in {len(guild_ids)} guilds")
+    engine = create_db(args.schedule_db)
+    report = run_maintenance(
+        engine,
+        args.schedule_db,
+        args.bee_db,
+        guild_ids,
+        args.retention_days,
+        args.archive_dir,
+        archive_retention=args.archive_retention,
+    )
+    engine.dispose()
+    print(report)
@@ -0,0 +1,363 @@
+import asyncio
+import bisect
+import importlib
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, ContextManager, Optional
+
+
+@dataclass
+class SlotMetrics:
+    """
+    Throughput of sending out one batch of scheduled posts that were all due
+    at the same time.
+    """
+
+    timing: float
+    posts: int
+    due: float = field(default_factory=time.time)
+    sent: int = 0
+    failed: int = 0
+    last_sent: Optional[float] = None
+    finished: Optional[float] = None
+
+    def record_sent(self):
+        self.sent += 1
+        self.last_sent = time.time()
+
+    def finish(self):
+        self.finished = time.time()
+
+    @property
+    def time_to_last_post(self) -> Optional[float]:
+        """Seconds from the slot coming due to the last guild getting its post."""
+        if self.last_sent is None:
+            return None
+        return self.last_sent - self.due
+
+    @property
+    def posts_per_second(self) -> Optional[float]:
+        if not self.time_to_last_post:
+            return None
+        return self.sent / self.time_to_last_post
+
+    def __str__(self):
+        summary = (
+            f"posts for {self.timing} hours: sent {self.sent} of {self.posts}"
+            f" ({self.failed} failed)"
+        )
+        if self.time_to_last_post is not None:
+            summary += (
+                f"; last post went out after {self.time_to_last_post:.1f}s"
+                f" ({self.posts_per_second:.1f} posts/sec)"
+            )
+        return summary
+
+
+@dataclass
+class StartupTimings:
+    """
+    How long the bot took to get going, in seconds from when main.py started
+    running: how long the heaviest imports took (timed one by one, before
+    anything else imports them), when on_ready finished and when the first
+    slash command was handled.
+    """
+
+    started: float = field(default_factory=time.perf_counter)
+    imports: dict[str, float] = field(default_factory=dict)
+    ready: Optional[float] = None
+    first_interaction: Optional[float] = None
+
+    def record_ready(self):
+        if self.ready is None:
+            self.ready = time.perf_counter() - self.started
+
+    def record_interaction(self) -> bool:
+        """Records an interaction being handled; returns whether it was the first."""
+        if self.first_interaction is not None:
+            return False
+        self.first_interaction = time.perf_counter() - self.started
+        return True
+
+    def __str__(self):
+        parts = []
+        if self.imports:
+            parts.append(
+                "imports: "
+                + ", ".join(
+                    f"{name} {took:.2f}s" for name, took in self.imports.items()
+                )
+            )
+        if self.ready is not None:
+            parts.append(f"ready after {self.ready:.2f}s")
+        if self.first_interaction is not None:
+            parts.append(
+                f"first interaction handled after {self.first_interaction:.2f}s"
+            )
+        return "; ".join(parts)
+
+
+def time_imports(modules: list[str]) -> dict[str, float]:
+    """Imports each module in turn and returns how long each one took."""
+    import_times = {}
+    for module in modules:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        import_times[module] = time.perf_counter() - start
+    return import_times
+
+
+class LagMonitor:
+    """
+    Measures how far behind the event loop is running by repeatedly sleeping
+    for a short interval and recording how late each wakeup is. Can be used as
+    an async context manager around the code being measured. If on_sample is
+    given, each sample is passed to it instead of being kept, so that the
+    monitor can run indefinitely.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.01,
+        on_sample: Optional[Callable[[float], None]] = None,
+    ):
+        self.interval = interval
+        self.on_sample = on_sample
+        self.samples: list[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def max_lag(self) -> float:
+        return max(self.samples, default=0.0)
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - before - self.interval)
+            if self.on_sample is None:
+                self.samples.append(lag)
+            else:
+                self.on_sample(lag)
+
+    async def __aenter__(self) -> "LagMonitor":
+        self.start()
+        # let the monitor take its first timestamp before the measured code runs
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.stop()
+
+
+default_buckets = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    300,
+)
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(
+                f"{self.name}{format_labels(self.label_names, labels)} {value}"
+            )
+        return lines
+
+
+class Gauge:
+    """
+    A value that's read from func whenever the metrics are collected; with
+    type "counter", a total that's kept elsewhere and only goes up.
+    """
+
+    def __init__(
+        self, name: str, help: str, func: Callable[[], float], type: str = "gauge"
+    ):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.type = type
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}",
+            f"{self.name} {self.func()}",
+        ]
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = default_buckets,
+    ):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        # for each set of labels: the count in each bucket (not cumulative,
+        # plus one for values above the last bucket), and the sum of values
+        self.counts: dict[tuple[str, ...], list[int]] = {}
+        self.sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+            self.sums[labels] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        for labels, counts in sorted(self.counts.items()):
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                total += count
+                lines.append(
+                    f"{self.name}_bucket{format_labels(names, (*labels, bound))}"
+                    f" {total}"
+                )
+            label_text = format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {self.sums[labels]}")
+            lines.append(f"{self.name}_count{label_text} {total}")
+        return lines
+
+
+class StageTimer:
+    def __init__(self, histogram: Histogram, stage: str):
+        self.histogram = histogram
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, self.stage)
+
+
+class BotMetrics:
+    """
+    The bot's instrumentation, collected in memory and served in Prometheus's
+    text format at /metrics. When it's disabled, nothing is recorded, the
+    timers are no-op context managers and no server or lag monitor is
+    started.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stages = Histogram(
+            "beebot_stage_seconds",
+            "Time spent in each stage of handling guesses, posts and puzzles",
+            ("stage",),
+        )
+        self.posts = Counter(
+            "beebot_posts_total",
+            "Scheduled posts sent or failed, by time slot",
+            ("timing", "result"),
+        )
+        self.loop_lag = Histogram(
+            "beebot_event_loop_lag_seconds", "How late the event loop wakes up"
+        )
+        self.gauges: list[Gauge] = []
+        self._lag_monitor = LagMonitor(0.1, lambda lag: self.loop_lag.observe(lag))
+        self._runner = None
+
+    def time(self, stage: str) -> ContextManager:
+        """Times the code in a with block as a stage."""
+        if not self.enabled:
+            return nullcontext()
+        return StageTimer(self.stages, stage)
+
+    def count_post(self, timing: float, sent: bool):
+        if self.enabled:
+            self.posts.inc(str(timing), "sent" if sent else "failed")
+
+    def add_gauge(self, name: str, help: str, func: Callable[[], float]):
+        self.gauges.append(Gauge(name, help, func))
+
+    def add_counter(self, name: str, help: str, func: Callable[[], float]):
+        """Adds a counter whose total is read from func."""
+        self.gauges.append(Gauge(name, help, func, "counter"))
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.stages, self.posts, self.loop_lag, *self.gauges):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    async def start(self, host: str, port: int):
+        """Starts the lag monitor and the HTTP server, if enabled."""
+        if not self.enabled or self._runner is not None:
+            return
+        # (imported here so that nothing is loaded while metrics are disabled)
+        from aiohttp import web
+
+        async def handle(_request):
+            return web.Response(text=self.render(), content_type="text/plain")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self._lag_monitor.start()
+
+    async def stop(self):
+        self._lag_monitor.stop()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -1,20 +1,24 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-import logging
-from typing import Optional
+import sqlite3
+from typing import NamedTuple, Optional, Sequence
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Float
+import numpy as np
+from sqlalchemy import (create_engine, event, inspect, text, Column, Index,
+                        Integer, BigInteger, String, Float, LargeBinary)
 from sqlalchemy.orm import registry
-
-sqlEngineLog = logging.getLogger('sqlalchemy.engine')
-sqlEngineLog.setLevel(logging.INFO)
-sqlEngineLog.addHandler(logging.FileHandler("logs/sql.log"))
+from sqlalchemy.pool import NullPool, QueuePool
 
 mapper_registry = registry()
 Base = mapper_registry.generate_base()
 
 tz = ZoneInfo("America/New_York")
 
+# how long connections wait for another process's write to finish before
+# giving up with "database is locked", in seconds
+busy_timeout = 30
+
 
 class hourable(datetime):
 
@@ -35,11 +39,18 @@ class hourable(datetime):
 
 class ScheduledPost(Base):
     __tablename__ = "schedule"
+    __table_args__ = (Index("ix_schedule_guild_channel", "guild_id",
+                            "channel_id"),
+                      Index("ix_schedule_session_day_timing", "session_day",
+                            "timing"))
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    guild_id = Column(BigInteger, nullable=False)
+    # each guild has at most one scheduled post
+    guild_id = Column(BigInteger, nullable=False, unique=True, index=True)
     channel_id = Column(BigInteger, nullable=False)
     current_session = Column(String)
+    # the day of the puzzle that current_session is for, as YYYY-MM-DD
+    session_day = Column(String)
     timing = Column(Float, nullable=False)
 
     def __repr__(self):
@@ -68,9 +79,220 @@ class ScheduledPost(Base):
                 base.astimezone(ZoneInfo("UTC"))).total_seconds()
 
 
-def create_db(db_path: str):
-    engine = create_engine("sqlite+pysqlite:///" + db_path, future=True)
+class SessionProgress(Base):
+    """
+    A snapshot of a session in compact form (see
+    compact_session.CompactSession); the puzzle itself is only stored once, in
+    the bee database. The session's current state is the snapshot plus the
+    guesses logged for it after snapshot_log_id.
+    """
+    __tablename__ = "session_progress"
+
+    session_id = Column(String, primary_key=True)
+    # the day of the session's puzzle, as YYYY-MM-DD
+    day = Column(String, nullable=False, index=True)
+    # bitset of the answers that had been gotten, little-endian
+    gotten = Column(LargeBinary, nullable=False)
+    status_message_id = Column(BigInteger)
+    # the ID of the last GuessLog row included in gotten (0 if none are)
+    snapshot_log_id = Column(Integer, default=0)
+
+
+class GuessLog(Base):
+    """An answer that was gotten in a session; rows are only ever appended."""
+    __tablename__ = "guess_log"
+    __table_args__ = (Index("ix_guess_log_session_id", "session_id", "id"), )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, nullable=False)
+    word = Column(String, nullable=False)
+    # the message that the guess was made in
+    message_id = Column(BigInteger)
+    # Unix timestamp
+    guessed_at = Column(Float, nullable=False)
+
+
+class PostRow(NamedTuple):
+    """
+    Read-only copy of the columns of a ScheduledPost that are needed to
+    schedule it and route guesses to it; much smaller than the ORM object, and
+    not tracked by a Session, for code that holds onto every post at once.
+    """
+    guild_id: int
+    channel_id: int
+    timing: float
+    current_session: Optional[str]
+
+    @classmethod
+    def from_post(cls, scheduled: ScheduledPost) -> "PostRow":
+        return cls(scheduled.guild_id, scheduled.channel_id, scheduled.timing,
+                   scheduled.current_session)
+
+
+def get_next_timestamps(
+        timings: Sequence[float] | np.ndarray,
+        starting_from: Optional[datetime] = None) -> np.ndarray:
+    """
+    Batch version of ScheduledPost.get_next_time: takes an array of timing
+    values and returns an array of the UTC timestamps of the next time each of
+    them will come around after starting_from (or now), with the same results
+    as calling get_next_time(starting_from).timestamp() for each of them.
+
+    Every result falls on either the starting day or the day after, so the UTC
+    offsets are looked up in a table of the offset at each hour of those two
+    days instead of being found for each timing separately. (This relies on
+    the time zone's DST transitions happening on the hour, as they do in
+    America/New_York.)
+    """
+    timings = np.asarray(timings, dtype=np.float64)
+    if starting_from is None:
+        base = hourable.now(tz=tz)
+    else:
+        base = hourable.fromtimestamp(starting_from.timestamp(), tz=tz)
+    days = [base.date(), base.date() + timedelta(days=1)]
+
+    # the local start of each day as if it were UTC, and the offset to
+    # subtract from that for each hour, all in microseconds
+    epoch = datetime(1970, 1, 1).date()
+    day_starts = np.array([(d - epoch).days * 86400 * 10**6 for d in days],
+                          dtype=np.int64)
+    offsets = np.array([[
+        datetime(d.year, d.month, d.day, hour, tzinfo=tz,
+                 fold=base.fold).utcoffset() // timedelta(microseconds=1)
+        for hour in range(24)
+    ] for d in days],
+                       dtype=np.int64)
+
+    # truncated to microseconds the same way as in
+    # hourable.replace_time_with_decimal_hours
+    hours = timings.astype(np.int64)
+    minutes = timings % 1 * 60
+    seconds = minutes % 1 * 60
+    microseconds = seconds % 1 * 1000000
+    local_times = (hours * 3600 * 10**6 +
+                   minutes.astype(np.int64) * 60 * 10**6 +
+                   seconds.astype(np.int64) * 10**6 +
+                   microseconds.astype(np.int64))
+
+    tomorrow = (base.decimal_hours >= timings).astype(np.int64)
+    utc_times = day_starts[tomorrow] + local_times - offsets[tomorrow, hours]
+    return utc_times / 10**6
+
+
+def add_columns(engine):
+    """
+    Adds any columns that are missing from tables that existed before the
+    columns were added to the models (they're all nullable, so SQLite can add
+    them without rebuilding the table.)
+    """
+    for table in (ScheduledPost.__table__, SessionProgress.__table__):
+        existing = set(x["name"]
+                       for x in inspect(engine).get_columns(table.name))
+        with engine.begin() as connection:
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(engine.dialect)
+                    connection.execute(
+                        text(f"ALTER TABLE {table.name} "
+                             f"ADD COLUMN {column.name} {column_type}"))
+
+
+def create_indexes(engine):
+    """
+    Creates any indexes that are missing from tables that existed before the
+    indexes were added to the models (create_all only creates the indexes for
+    new tables.)
+    """
+    table = ScheduledPost.__table__
+    existing = set(x["name"] for x in inspect(engine).get_indexes(table.name))
+    with engine.begin() as connection:
+        if "ix_schedule_guild_id" not in existing:
+            # older versions of the schedule table didn't enforce one post per
+            # guild; keep only the latest post for each so the unique index can
+            # be created
+            connection.execute(
+                text("DELETE FROM schedule WHERE id NOT IN "
+                     "(SELECT MAX(id) FROM schedule GROUP BY guild_id)"))
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+
+
+def shard_for(guild_id: int, shard_count: int) -> int:
+    """Returns the shard that Discord sends a guild's events to."""
+    return (guild_id >> 22) % shard_count
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """
+    SQLite settings for the bot's databases. The journal mode is stored in the
+    database file, so prepare() applies it to every connection to the file,
+    including the ones that bee_engine opens for the bee database; the other
+    pragmas only last for a connection, so they're set on each one that
+    create_db's engine opens.
+    """
+    journal_mode: str = "WAL"
+    # with WAL, NORMAL only syncs at checkpoints; a power loss can roll back
+    # the last few commits but can't corrupt the database
+    synchronous: str = "NORMAL"
+    # how much of the database file is read through memory-mapping, in bytes
+    mmap_size: int = 128 * 2**20
+    # the page cache of each connection (negative numbers are in KiB)
+    cache_size: int = -16 * 2**10
+    busy_timeout: float = busy_timeout
+    # how many connections the engine keeps open between transactions; 0 opens
+    # a new one for each transaction
+    pool_size: int = 2
+    # how many prepared statements each connection keeps for reuse
+    cached_statements: int = 256
+
+    def prepare(self, db_path: str):
+        """Sets the journal mode of a database, creating it if necessary."""
+        with sqlite3.connect(db_path, timeout=self.busy_timeout) as db:
+            db.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        db.close()
+
+    def configure(self, dbapi_connection, _connection_record=None):
+        """Sets the per-connection pragmas; used as a "connect" listener."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA synchronous={self.synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        cursor.execute(f"PRAGMA cache_size={self.cache_size}")
+        cursor.close()
+
+
+default_profile = StorageProfile()
+
+# SQLite's and SQLAlchemy's defaults, for comparison
+legacy_profile = StorageProfile(journal_mode="DELETE",
+                                synchronous="FULL",
+                                mmap_size=0,
+                                cache_size=-2000,
+                                pool_size=0,
+                                cached_statements=128)
+
+
+def create_db(db_path: str, profile: StorageProfile = default_profile):
+    if profile.pool_size == 0:
+        pooling = {"poolclass": NullPool}
+    else:
+        pooling = {"poolclass": QueuePool, "pool_size": profile.pool_size}
+    engine = create_engine(
+        "sqlite+pysqlite:///" + db_path,
+        future=True,
+        connect_args={
+            "timeout": profile.busy_timeout,
+            "cached_statements": profile.cached_statements,
+            # (the pool only lends a connection to one
+            # thread at a time)
+            "check_same_thread": False,
+        },
+        **pooling)
+    event.listen(engine, "connect", profile.configure)
     Base.metadata.create_all(engine)
+    add_columns(engine)
+    create_indexes(engine)
     return engine
 
 
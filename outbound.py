@@ -0,0 +1,200 @@
+import asyncio
+import heapq
+import itertools
+import math
+from logging import getLogger
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import disnake as discord
+
+from ratelimit import RateLimiter
+
+internal_logger = getLogger("BeeBot.Internal")
+
+T = TypeVar("T")
+
+# Priorities of outbound actions; lower numbers go first
+FEEDBACK = 0
+"""Reactions to guesses"""
+STATUS = 1
+"""Status message edits"""
+BACKGROUND = 2
+"""Everything else, like scheduled posts"""
+
+default_limits = {
+    # Discord's per-channel buckets: about one reaction every 0.25 seconds,
+    # and five messages or five message edits every 5 seconds
+    "reaction": (4, 1.0),
+    "message": (5, 5.0),
+    "edit": (5, 5.0),
+}
+
+
+def get_retry_after(error: discord.HTTPException) -> float:
+    headers = getattr(error.response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
+
+class ChannelQueue:
+    def __init__(self, limits: dict[str, tuple[float, float]], concurrency: int):
+        self.limiters = {
+            route: RateLimiter(rate, per) for route, (rate, per) in limits.items()
+        }
+        self.heap: list[list] = []
+        self.wakeup = asyncio.Event()
+        self.slots = asyncio.Semaphore(concurrency)
+        self.task: Optional[asyncio.Task] = None
+
+
+class OutboundQueue:
+    """
+    Schedules the API calls that the bot makes in each channel. Every channel
+    gets a worker task that starts queued actions in order of priority as
+    soon as the token bucket for their route (see default_limits) allows,
+    running up to `concurrency` of them at once; so the reactions to a
+    message with several guesses are added concurrently instead of one after
+    another, and reactions go ahead of status edits and posts that are
+    waiting in the same channel.
+
+    The buckets keep the bot under Discord's limits ahead of time, since
+    disnake's HTTP client handles the rate limit headers itself without
+    exposing them; if a 429 still makes it through, the route is paused for
+    its Retry-After and the action is tried again. Workers exit after their
+    channel has been idle for idle_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, float]] = default_limits,
+        concurrency: int = 5,
+        idle_timeout: float = 10,
+    ):
+        self.limits = limits
+        self.concurrency = concurrency
+        self.idle_timeout = idle_timeout
+        self.rate_limited = 0
+        """Number of 429 responses that the actions got"""
+        self._channels: dict[int, ChannelQueue] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        """Number of actions that are waiting to start."""
+        return sum(len(queue.heap) for queue in self._channels.values())
+
+    async def run(
+        self,
+        channel_id: int,
+        route: str,
+        action: Callable[[], Awaitable[T]],
+        priority: int = BACKGROUND,
+    ) -> T:
+        """
+        Queues action (a function that makes one API call on the given route)
+        for the channel and returns its result once it has run.
+        """
+        queue = self._channels.get(channel_id)
+        if queue is None:
+            queue = self._channels[channel_id] = ChannelQueue(
+                self.limits, self.concurrency
+            )
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            queue.heap, [priority, next(self._counter), route, action, future]
+        )
+        queue.wakeup.set()
+        if queue.task is None:
+            queue.task = asyncio.create_task(self._work(channel_id, queue))
+        return await future
+
+    def _next_ready(self, queue: ChannelQueue) -> tuple[Optional[list], float]:
+        """
+        Takes the most urgent action whose route has a token available off the
+        queue; if there isn't one, returns how long until one should be.
+        """
+        wait = float("inf")
+        for entry in sorted(queue.heap):
+            if entry[-1].done():
+                # (the caller was cancelled)
+                queue.heap.remove(entry)
+                continue
+            limiter = queue.limiters.get(entry[2])
+            delay = 0.0 if limiter is None else limiter.try_acquire()
+            if delay == 0:
+                queue.heap.remove(entry)
+                heapq.heapify(queue.heap)
+                return entry, 0.0
+            wait = min(wait, delay)
+        heapq.heapify(queue.heap)
+        return None, wait
+
+    async def _work(self, channel_id: int, queue: ChannelQueue):
+        running: set[asyncio.Task] = set()
+        try:
+            while True:
+                queue.wakeup.clear()
+                if not queue.heap:
+                    try:
+                        await asyncio.wait_for(queue.wakeup.wait(), self.idle_timeout)
+                    except asyncio.TimeoutError:
+                        if not queue.heap and not running:
+                            return
+                    continue
+                await queue.slots.acquire()
+                entry, wait = self._next_ready(queue)
+                if entry is None:
+                    queue.slots.release()
+                    try:
+                        await asyncio.wait_for(
+                            queue.wakeup.wait(), None if math.isinf(wait) else wait
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                task = asyncio.create_task(self._perform(queue, entry))
+                running.add(task)
+                task.add_done_callback(running.discard)
+        finally:
+            del self._channels[channel_id]
+            for task in running:
+                task.cancel()
+            for entry in queue.heap:
+                entry[-1].cancel()
+
+    async def _perform(self, queue: ChannelQueue, entry: list):
+        _, _, route, action, future = entry
+        try:
+            result = await action()
+        except discord.HTTPException as e:
+            if e.status == 429 and route in queue.limiters:
+                self.rate_limited += 1
+                retry_after = get_retry_after(e)
+                internal_logger.warning(
+                    f"rate limited on {route}; pausing it for {retry_after}s"
+                )
+                queue.limiters[route].pause(retry_after)
+                heapq.heappush(queue.heap, entry)
+                queue.wakeup.set()
+            elif not future.done():
+                future.set_exception(e)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            queue.slots.release()
+            queue.wakeup.set()
+
+    async def close(self):
+        """Stops the workers; actions that haven't started are cancelled."""
+        tasks = [queue.task for queue in self._channels.values() if queue.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,55 @@
+import re
+from typing import Iterable
+
+
+class PuzzleIndex:
+    """
+    Everything needed to pick the possible guesses out of a message for one
+    day's puzzle, built once per puzzle: the answers as a frozenset, which of
+    them are pangrams, and a compiled pattern that only matches whole words
+    that are long enough and made up of the puzzle's letters. Finding the
+    guesses in a message then only takes one pass of the pattern over it plus
+    a check for the center letter per matching word, and messages without
+    anything that could be an answer in them can be ignored before anything
+    about the session they're for is looked at.
+    """
+
+    min_length = 4
+
+    def __init__(
+        self, day: str, center: str, outside: Iterable[str], answers: Iterable[str]
+    ):
+        self.day = day
+        self.center = center.lower()
+        self.letters = frozenset(self.center + "".join(outside).lower())
+        self.answers = frozenset(answer.lower() for answer in answers)
+        self.pangrams = frozenset(
+            answer for answer in self.answers if self.letters <= set(answer)
+        )
+        letter_class = "".join(sorted(self.letters))
+        self._candidates = re.compile(
+            rf"\b[{letter_class}]{{{self.min_length},}}\b", re.IGNORECASE
+        )
+
+    @classmethod
+    def from_bee(cls, bee) -> "PuzzleIndex":
+        """Builds the index for a SpellingBee (or a SessionBee.)"""
+        return cls(bee.day, bee.center, bee.outside, bee.answers)
+
+    def is_pangram(self, word: str) -> bool:
+        return word.lower() in self.pangrams
+
+    def find_guesses(self, text: str) -> list[str]:
+        """
+        Returns the words in text that could be answers to the puzzle (long
+        enough, only using its letters and using its center letter), in the
+        order they appear and including repeats, so that the session can react
+        to each of them the way it would to the whole message.
+        """
+        return [
+            word
+            for word in (
+                candidate.lower() for candidate in self._candidates.findall(text)
+            )
+            if self.center in word
+        ]
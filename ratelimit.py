@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket that allows `rate` acquisitions per `per` seconds on average
+    and bursts of up to `rate` at once; used to keep outgoing API calls under
+    Discord's limits instead of relying on 429 responses.
+    """
+
+    def __init__(self, rate: float, per: float = 1.0):
+        self.rate = rate
+        self.per = per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.rate, self._tokens + (now - self._updated) * self.rate / self.per
+        )
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) * self.per / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def try_acquire(self) -> float:
+        """
+        Takes a token if one is available and returns 0; otherwise, returns how
+        many seconds it'll be until one is, without waiting.
+        """
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) * self.per / self.rate
+
+    def pause(self, seconds: float):
+        """Empties the bucket so that no tokens are available for `seconds`."""
+        self._refill()
+        self._tokens = min(self._tokens, 1 - seconds * self.rate / self.per)
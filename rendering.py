@@ -0,0 +1,148 @@
+import asyncio
+import multiprocessing
+import time
+from logging import getLogger
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Callable, Optional
+
+from metrics import LagMonitor
+
+internal_logger = getLogger("BeeBot.Internal")
+
+
+def render_saved_puzzle(day: str, db_path: str) -> float:
+    """
+    Renders the graphic for the saved puzzle for a day and saves it along with
+    the puzzle; returns how long that took. Runs in a worker process.
+    """
+    # (imported here so that only the worker processes need to load it)
+    from bee_engine import SpellingBee
+
+    start = time.perf_counter()
+    bee = SpellingBee.retrieve_saved(day, db_path)
+    asyncio.run(bee.render())
+    bee.persist_to(db_path)
+    return time.perf_counter() - start
+
+
+def run_render(
+    render_func: Callable[[str, str], float], day: str, db_path: str, conn: Connection
+):
+    """
+    Entry point of a worker process: sends back (True, duration) if the render
+    succeeds, or (False, a description of the error) if it doesn't.
+    """
+    try:
+        conn.send((True, render_func(day, db_path)))
+    except Exception as e:
+        conn.send((False, repr(e)))
+    finally:
+        conn.close()
+
+
+class RenderError(Exception):
+    pass
+
+
+class PuzzleRenderer:
+    """
+    Renders puzzle graphics in a separate process, so that the CPU-bound work
+    can't hold up the event loop (and with it the gateway heartbeats and every
+    other guild's posts.) Each attempt gets its own worker process, which is
+    given `timeout` seconds before it's terminated and the render is retried,
+    up to `attempts` times.
+
+    The duration of the last successful render and the largest event loop lag
+    seen while waiting for it are kept in last_duration and last_max_lag.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 120,
+        attempts: int = 3,
+        retry_delay: float = 5,
+        render_func: Callable[[str, str], float] = render_saved_puzzle,
+    ):
+        self.timeout = timeout
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self.render_func = render_func
+        self.last_duration: Optional[float] = None
+        self.last_max_lag: Optional[float] = None
+        # a fresh interpreter instead of a fork of this one, which has an
+        # event loop and a database thread running
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: set[BaseProcess] = set()
+        """The worker processes of the attempts that are running, which can
+        belong to overlapping renders"""
+
+    async def _receive(self, conn: Connection):
+        """Waits for the worker's answer without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        loop.add_reader(
+            conn.fileno(), lambda: readable.done() or readable.set_result(None)
+        )
+        try:
+            await readable
+        finally:
+            loop.remove_reader(conn.fileno())
+        # (if the worker died without answering, this raises EOFError)
+        return conn.recv()
+
+    async def _attempt(self, day: str, db_path: str) -> float:
+        conn, worker_conn = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=run_render,
+            args=(self.render_func, day, db_path, worker_conn),
+            name=f"BeeBot render {day}",
+            daemon=True,
+        )
+        process.start()
+        self._processes.add(process)
+        # (the worker's end is closed here so that the pipe reports EOF if the
+        # worker exits)
+        worker_conn.close()
+        try:
+            succeeded, result = await asyncio.wait_for(
+                self._receive(conn), self.timeout
+            )
+        finally:
+            conn.close()
+            self._stop_process(process)
+        if not succeeded:
+            raise RuntimeError(result)
+        return result
+
+    def _stop_process(self, process: BaseProcess):
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        self._processes.discard(process)
+
+    async def render(self, day: str, db_path: str) -> float:
+        """
+        Renders and saves the graphic for the saved puzzle for the given day;
+        returns how long the render took, or raises RenderError if every
+        attempt failed.
+        """
+        for attempt in range(1, self.attempts + 1):
+            try:
+                async with LagMonitor() as monitor:
+                    duration = await self._attempt(day, db_path)
+            except Exception as e:
+                internal_logger.warning(
+                    f"render attempt {attempt} of {self.attempts} failed: {e!r}"
+                )
+                if attempt == self.attempts:
+                    raise RenderError(f"unable to render puzzle for {day}") from e
+                await asyncio.sleep(self.retry_delay * attempt)
+            else:
+                self.last_duration = duration
+                self.last_max_lag = monitor.max_lag
+                return duration
+
+    def close(self):
+        for process in list(self._processes):
+            self._stop_process(process)
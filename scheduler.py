@@ -0,0 +1,186 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime
+from logging import getLogger
+from typing import Callable, Iterable, Optional, Union
+
+from models import PostRow, ScheduledPost, get_next_timestamps, tz
+
+Schedulable = Union[PostRow, ScheduledPost]
+
+internal_logger = getLogger("BeeBot.Internal")
+
+
+class PostScheduler:
+    """
+    Keeps every post (a PostRow, or anything else with a guild_id and a
+    timing) in a single heap ordered by the next time it's due and runs one
+    task that sleeps until the earliest of them, instead of having a separate
+    cron job with its own timer for each guild. Posts that come due at the
+    same moment are handed to the callback together.
+
+    Removing a post just marks its heap entry as dead (entries are
+    [timestamp, tiebreaker, post] lists, with the post set to None when it's
+    removed); dead entries are skipped when they reach the top of the heap and
+    the heap is rebuilt if they ever make up more than half of it, so adding,
+    replacing and removing posts are all O(log n) amortized.
+    """
+
+    max_sleep = 60
+    """Upper bound on a single sleep in seconds, so that the wall clock is
+    checked regularly even if the process is suspended or the clock jumps."""
+
+    def __init__(self, callback: Callable[[list[Schedulable]], None]):
+        self.callback = callback
+        self._heap: list[list] = []
+        self._entries: dict[int, list] = {}
+        self._counter = itertools.count()
+        self._dead = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._entries
+
+    def get(self, guild_id: int) -> Optional[Schedulable]:
+        """Returns the post that's scheduled for this guild, if any."""
+        entry = self._entries.get(guild_id)
+        return None if entry is None else entry[-1]
+
+    def next_time(self, guild_id: int) -> Optional[datetime]:
+        """Returns the next time that the post for this guild will be due."""
+        entry = self._entries.get(guild_id)
+        if entry is None:
+            return None
+        return datetime.fromtimestamp(entry[0], tz=tz)
+
+    def add(
+        self, scheduled: Schedulable, starting_from: Optional[datetime] = None
+    ) -> datetime:
+        """
+        Schedules a post, replacing any post that was already scheduled for the
+        same guild. Returns the time that it will next be due.
+        """
+        self._discard(scheduled.guild_id)
+        [when] = get_next_timestamps([scheduled.timing], starting_from).tolist()
+        self._push(when, scheduled)
+        return datetime.fromtimestamp(when, tz=tz)
+
+    def load(self, posts: Iterable[Schedulable]):
+        """
+        Schedules many posts at once; their next times are computed together
+        and the heap is built in one pass at the end instead of being pushed to
+        once per post.
+        """
+        posts = list(posts)
+        timestamps = get_next_timestamps([scheduled.timing for scheduled in posts])
+        for scheduled, when in zip(posts, timestamps.tolist()):
+            self._discard(scheduled.guild_id)
+            entry = [when, next(self._counter), scheduled]
+            self._entries[scheduled.guild_id] = entry
+            self._heap.append(entry)
+        self._compact()
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+        self.start()
+
+    def remove(self, guild_id: int) -> bool:
+        """Unschedules the post for a guild; returns whether there was one."""
+        existed = self._discard(guild_id)
+        if existed:
+            self._compact()
+        return existed
+
+    def start(self):
+        """
+        Starts the task that sends out due posts, if it isn't already running.
+        This is called whenever posts are added, but only does anything once
+        there's a running event loop to create the task in.
+        """
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _push(self, when: float, scheduled: Schedulable):
+        entry = [when, next(self._counter), scheduled]
+        self._entries[scheduled.guild_id] = entry
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._wakeup.set()
+        self.start()
+
+    def _discard(self, guild_id: int) -> bool:
+        entry = self._entries.pop(guild_id, None)
+        if entry is None:
+            return False
+        entry[-1] = None
+        self._dead += 1
+        return True
+
+    def _compact(self):
+        if self._dead > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[-1] is not None]
+            heapq.heapify(self._heap)
+            self._dead = 0
+
+    def _pop_due(self, now: float) -> list[Schedulable]:
+        due: list[tuple[float, Schedulable]] = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, scheduled = heapq.heappop(self._heap)
+            if scheduled is None:
+                self._dead -= 1
+            else:
+                del self._entries[scheduled.guild_id]
+                due.append((when, scheduled))
+        # posts that were due at the same time are rescheduled together; the
+        # next post is always about a day later, so starting a second after
+        # this one avoids rounding errors landing on the same time
+        by_time: dict[float, list[Schedulable]] = {}
+        for when, scheduled in due:
+            by_time.setdefault(when, []).append(scheduled)
+        for when, group in by_time.items():
+            next_times = get_next_timestamps(
+                [scheduled.timing for scheduled in group],
+                datetime.fromtimestamp(when + 1, tz=tz),
+            )
+            for scheduled, next_time in zip(group, next_times.tolist()):
+                self._push(next_time, scheduled)
+        return [scheduled for _, scheduled in due]
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            while self._heap and self._heap[0][-1] is None:
+                heapq.heappop(self._heap)
+                self._dead -= 1
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), min(delay, self.max_sleep)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due = self._pop_due(time.time())
+            try:
+                self.callback(due)
+            except Exception:
+                internal_logger.exception("failed to dispatch scheduled posts")
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+from logging import getLogger
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from compact_session import CompactSession
+    from session_cache import SessionCache
+
+internal_logger = getLogger("BeeBot.Internal")
+
+GuessResult = tuple[Optional["CompactSession"], list[str]]
+
+
+class SessionActors:
+    """
+    Gives every session that's being guessed in an actor: a task that owns
+    the session and applies the guesses sent to it through a queue, one
+    message at a time and in the order they came in, so concurrent guesses
+    can't interleave. Messages that queue up while the actor is busy are
+    applied together as a batch, with the session looked up in the
+    SessionCache once and marked as dirty (to be saved) once per batch; each
+    sender gets back the reactions to its own message.
+
+    respond is called with the session and the text and ID of a message and
+    returns the reactions to it, changing the session as needed. Actors exit once
+    their session has gone idle_timeout seconds without guesses.
+    """
+
+    def __init__(
+        self,
+        sessions: SessionCache,
+        respond: Callable[[CompactSession, str, Optional[int]], list[str]],
+        idle_timeout: float = 60,
+    ):
+        self.sessions = sessions
+        self.respond = respond
+        self.idle_timeout = idle_timeout
+        self.batches = 0
+        """Number of batches of messages that have been applied"""
+        self.messages = 0
+        """Number of messages that have been applied"""
+        self._inboxes: dict[str, asyncio.Queue] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        """Number of sessions that currently have an actor."""
+        return len(self._tasks)
+
+    async def submit(
+        self, session_id: str, content: str, message_id: Optional[int] = None
+    ) -> GuessResult:
+        """
+        Has the actor for the session apply the guesses in content; returns
+        the session (None if it doesn't exist) and the reactions to them.
+        """
+        inbox = self._inboxes.get(session_id)
+        if inbox is None:
+            inbox = self._inboxes[session_id] = asyncio.Queue()
+            self._tasks[session_id] = asyncio.create_task(self._run(session_id, inbox))
+        future = asyncio.get_running_loop().create_future()
+        inbox.put_nowait((content, message_id, future))
+        return await future
+
+    async def _run(self, session_id: str, inbox: asyncio.Queue):
+        batch = []
+        try:
+            while True:
+                try:
+                    batch = [await asyncio.wait_for(inbox.get(), self.idle_timeout)]
+                except asyncio.TimeoutError:
+                    if inbox.empty():
+                        return
+                    continue
+                try:
+                    bee = await self.sessions.get(session_id)
+                except Exception as e:
+                    internal_logger.exception(f"unable to load session {session_id}")
+                    for *_, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                # (anything that came in while the session was being looked up
+                # goes in this batch too)
+                while not inbox.empty():
+                    batch.append(inbox.get_nowait())
+                self._apply(bee, batch)
+        finally:
+            del self._inboxes[session_id]
+            del self._tasks[session_id]
+            while not inbox.empty():
+                batch.append(inbox.get_nowait())
+            for *_, future in batch:
+                future.cancel()
+
+    def _apply(self, bee: Optional[CompactSession], batch: list[tuple]):
+        changed = False
+        for content, message_id, future in batch:
+            if future.done():
+                # (the sender was cancelled)
+                continue
+            if bee is None:
+                future.set_result((None, []))
+                continue
+            try:
+                reactions = self.respond(bee, content, message_id)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            changed = changed or bool(reactions)
+            future.set_result((bee, reactions))
+        if changed:
+            self.sessions.mark_dirty(bee)
+        self.batches += 1
+        self.messages += len(batch)
+
+    async def close(self):
+        """Stops the actors; messages that haven't been applied are cancelled."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
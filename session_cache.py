@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from logging import getLogger
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from compact_session import CompactSession, Guess
+    from storage import Storage
+
+internal_logger = getLogger("BeeBot.Internal")
+
+
+class SessionCache:
+    """
+    LRU cache of live CompactSessions, keyed by session ID. The cached sessions
+    aren't attached to the database, so guesses are applied to them in memory;
+    sessions that have been changed are marked as dirty, and the answers
+    gotten in them are appended to the guess log in batches every
+    flush_interval seconds, as well as when the cache is closed. Changes to
+    their metadata are written through straight away.
+
+    The cache holds at most max_size sessions, and sessions that haven't been
+    used for idle_timeout seconds are dropped, but dirty sessions are only ever
+    dropped after their guesses have been written.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        max_size: int = 1000,
+        idle_timeout: float = 3600,
+        flush_interval: float = 10,
+    ):
+        self.storage = storage
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.flush_interval = flush_interval
+        self._sessions: OrderedDict[str, CompactSession] = OrderedDict()
+        self._last_used: dict[str, float] = {}
+        self._dirty: set[str] = set()
+        self._flushing: Counter[str] = Counter()
+        """Sessions whose guesses are being written, by how many flushes are
+        writing them; these can't be evicted either"""
+        self._unsaved: list[Guess] = []
+        self._pending_metadata: dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    async def get(self, session_id: str) -> Optional[CompactSession]:
+        """Returns the session with this ID, loading it into the cache if needed."""
+        self.start()
+        bee = self._sessions.get(session_id)
+        if bee is None:
+            loaded = await self.storage.read_session(session_id)
+            # (another caller may have loaded it while this one was waiting)
+            bee = self._sessions.get(session_id)
+            if bee is None:
+                if loaded is None:
+                    return None
+                bee = loaded
+                if session_id in self._pending_metadata:
+                    bee.metadata = self._pending_metadata[session_id]
+                self._sessions[session_id] = bee
+        self._sessions.move_to_end(session_id)
+        self._last_used[session_id] = time.monotonic()
+        self._evict()
+        return bee
+
+    async def read(self, session_id: str) -> Optional[CompactSession]:
+        """
+        Returns the session with this ID without adding it to the cache; for
+        sessions that are only being looked at, like yesterday's.
+        """
+        if session_id in self._sessions:
+            return self._sessions[session_id]
+        return await self.storage.read_session(session_id)
+
+    def mark_dirty(self, bee: CompactSession):
+        """Records that a cached session has changed and needs to be saved."""
+        self._dirty.add(bee.session_id)
+
+    async def set_metadata(self, bee: CompactSession, metadata: dict):
+        """
+        Sets the metadata of a session, which might be one that was just
+        created rather than one from the cache.
+        """
+        cached = self._sessions.get(bee.session_id)
+        if cached is not None:
+            await self.storage.set_session_metadata(cached, metadata)
+        else:
+            # if the session is loaded into the cache while this is being
+            # written, the copy in the cache still needs the new metadata
+            self._pending_metadata[bee.session_id] = metadata
+            try:
+                await self.storage.set_session_metadata(bee, metadata)
+            finally:
+                del self._pending_metadata[bee.session_id]
+
+    async def flush(self):
+        """Logs the unsaved guesses of every dirty session in one batch."""
+        # the guesses are taken from the sessions before they're written, so
+        # guesses made while they're being written on the database thread go
+        # in the next flush; if the write fails, they're kept to be retried
+        # (and their sessions stay dirty, so they aren't evicted and reloaded
+        # without them)
+        dirty = list(self._dirty)
+        for session_id in dirty:
+            self._unsaved.extend(self._sessions[session_id].take_unsaved())
+        self._dirty.clear()
+        if not self._unsaved:
+            return
+        guesses, self._unsaved = self._unsaved, []
+        self._flushing.update(dirty)
+        try:
+            await self.storage.log_guesses(guesses)
+        except:
+            self._unsaved[:0] = guesses
+            self._dirty.update(dirty)
+            raise
+        finally:
+            self._flushing.subtract(dirty)
+            # (drops the sessions that are down to zero)
+            self._flushing += Counter()
+
+    def _evict(self):
+        stale = time.monotonic() - self.idle_timeout
+        excess = len(self._sessions) - self.max_size
+        evicted = []
+        # sessions are kept in order from least to most recently used
+        for session_id in self._sessions:
+            if excess <= 0 and self._last_used[session_id] > stale:
+                break
+            if session_id not in self._dirty and session_id not in self._flushing:
+                evicted.append(session_id)
+                excess -= 1
+        for session_id in evicted:
+            del self._sessions[session_id]
+            del self._last_used[session_id]
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                internal_logger.exception("failed to flush cached sessions")
+            self._evict()
+
+    async def close(self):
+        """Stops the periodic flushes and saves any remaining changes."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
@@ -0,0 +1,244 @@
+"""
+Runs the bot as several processes, each connected to Discord as one shard and
+only responsible for the guilds in that shard, plus a coordinator process that
+fetches and renders the daily puzzle once for all of them and looks after the
+databases. Started with:
+
+    python main.py --shards N
+"""
+
+import asyncio
+import multiprocessing
+import threading
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Optional
+
+import aiocron
+
+from bot import BeeBot, BeeBotConfig, bee_db, et, internal_logger, schedule_db
+from logging_setup import setup_logging
+from maintenance import fetch_guild_ids, run_maintenance
+from storage import Storage
+
+
+class ShardBot(BeeBot):
+    """
+    A BeeBot that is one of several shards. Instead of getting the daily puzzle
+    itself, it waits for the coordinator to send (day, puzzle day) pairs
+    through conn. When the puzzle day is the day, its puzzle has been saved to
+    the bee database and posts for the day can use it; an earlier puzzle day
+    means that the day's puzzle is late and that puzzle is the latest one
+    available (see BeeBotConfig.late_notices), and None means that the day's
+    puzzle never came out. Scheduled posts for guilds in other shards are
+    ignored, and maintenance and guess log compaction, which cover every
+    shard's sessions, are left to the coordinator.
+    """
+
+    def __init__(self, conn: Connection, **kwargs):
+        super().__init__(**kwargs)
+        self.conn = conn
+        self.announced: dict[str, Optional[str]] = {}
+        """The latest puzzle day that the coordinator has sent for each day"""
+
+    async def start(self, *args, **kwargs):
+        threading.Thread(
+            target=self._listen,
+            args=(asyncio.get_running_loop(),),
+            name="BeeBot.ShardLink",
+            daemon=True,
+        ).start()
+        await super().start(*args, **kwargs)
+
+    def _listen(self, loop: asyncio.AbstractEventLoop):
+        while True:
+            try:
+                day, puzzle_day = self.conn.recv()
+            except (EOFError, OSError):
+                internal_logger.error(
+                    f"shard {self.shard_id} lost its connection to the coordinator"
+                )
+                return
+            loop.call_soon_threadsafe(self.on_puzzle_announced, day, puzzle_day)
+
+    def on_puzzle_announced(self, day: str, puzzle_day: Optional[str]):
+        self.announced[day] = puzzle_day
+        for old_day in sorted(self.announced)[:-3]:
+            del self.announced[old_day]
+        asyncio.create_task(self.load_announced_puzzle(day, puzzle_day))
+
+    async def load_announced_puzzle(self, day: str, puzzle_day: Optional[str]):
+        if puzzle_day is None:
+            self.resolve_puzzle(day, None)
+            return
+        bee = await self.storage.load_puzzle(puzzle_day)
+        if puzzle_day != day:
+            self.resolve_late_puzzle(day, bee)
+            return
+        self.get_puzzle_index(bee)
+        self.resolve_puzzle(day, bee)
+
+    async def ensure_todays_puzzle(self):
+        # the puzzle arrives through on_puzzle_announced; posts wait for it on
+        # the day's puzzle Future in the meantime
+        self.get_puzzle_future(self.get_current_date())
+
+    async def run_maintenance(self):
+        pass
+
+    async def compact_guess_log(self):
+        pass
+
+
+def run_shard(token: str, shard_id: int, shard_count: int, conn: Connection):
+    """Entry point of a shard process."""
+    setup_logging(f"shard{shard_id}")
+    bot = ShardBot(
+        conn,
+        shard_id=shard_id,
+        shard_count=shard_count,
+    )
+    bot.run(token=token)
+
+
+class Coordinator:
+    """
+    Starts a process for each shard and restarts the ones that exit. Owns the
+    writes of puzzles to the bee database: the daily puzzle is fetched and
+    rendered here, and the shards are told about it once it's saved. Each
+    shard only writes the schedule rows and sessions of its own guilds, and
+    both databases are put in WAL mode so that the shards' writes don't block
+    each other's reads.
+    """
+
+    check_interval = 10
+    """How often to check that the shard processes are still running"""
+
+    def __init__(self, token: str, shard_count: int):
+        self.token = token
+        self.shard_count = shard_count
+        self.context = multiprocessing.get_context("spawn")
+        self.shards: dict[int, tuple[BaseProcess, Connection]] = {}
+        self.announced: dict[str, Optional[str]] = {}
+        self.publishing: dict[str, asyncio.Task] = {}
+        """The Tasks that got the last few days' puzzles"""
+
+    def start_shard(self, shard_id: int):
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=run_shard,
+            args=(self.token, shard_id, self.shard_count, child_conn),
+            name=f"BeeBot shard {shard_id}",
+        )
+        process.start()
+        child_conn.close()
+        self.shards[shard_id] = (process, parent_conn)
+        # bring shards that were (re)started after a puzzle came out up to date
+        for day, puzzle_day in self.announced.items():
+            parent_conn.send((day, puzzle_day))
+        internal_logger.info(f"started shard {shard_id} in process {process.pid}")
+
+    def announce(self, day: str, puzzle_day: Optional[str]):
+        self.announced[day] = puzzle_day
+        for old_day in sorted(self.announced)[:-3]:
+            del self.announced[old_day]
+        for shard_id, (_, conn) in self.shards.items():
+            try:
+                conn.send((day, puzzle_day))
+            except OSError:
+                internal_logger.warning(
+                    f"unable to tell shard {shard_id} about the puzzle for {day}"
+                )
+
+    async def start_publishing(self):
+        """
+        Starts getting and announcing today's puzzle, unless the Task that was
+        started for it earlier is still running.
+        """
+        day = BeeBot.get_current_date()
+        running = self.publishing.get(day)
+        if running is not None and not running.done():
+            internal_logger.info(f"already getting the puzzle for {day}")
+            return
+        self.publishing[day] = asyncio.create_task(self.publish_puzzle(day))
+        for old_day in sorted(self.publishing)[:-3]:
+            del self.publishing[old_day]
+
+    async def publish_puzzle(self, day: str):
+        try:
+            await self.pipeline.ensure(
+                day,
+                lambda bee: self.announce(day, bee.day),
+                (
+                    (lambda bee: self.announce(day, bee.day))
+                    if BeeBotConfig.late_notices
+                    else None
+                ),
+            )
+        except Exception:
+            internal_logger.exception(f"unable to get the puzzle for {day}")
+            self.announce(day, None)
+
+    async def run_maintenance(self):
+        """
+        Database maintenance for every shard (see maintenance.run_maintenance),
+        with the guilds that the bot is in fetched from Discord. Guesses that
+        the shards haven't flushed yet are in current sessions, which are kept.
+        """
+        guild_ids = await fetch_guild_ids(self.token)
+        report = await self.storage.run(
+            run_maintenance,
+            self.storage.engine,
+            schedule_db,
+            bee_db,
+            guild_ids,
+            BeeBotConfig.puzzle_retention_days,
+            BeeBotConfig.archive_dir,
+            BeeBotConfig.storage_profile,
+            BeeBotConfig.archive_retention,
+        )
+        internal_logger.info(f"database maintenance: {report}")
+
+    async def compact_guess_log(self):
+        """Writes new snapshots of every shard's sessions with long guess logs."""
+        snapshots = await self.storage.compact_guess_log(
+            BeeBotConfig.guess_log_snapshot_after
+        )
+        internal_logger.info(f"wrote {snapshots} session snapshots")
+
+    async def watch_shards(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for shard_id, (process, conn) in list(self.shards.items()):
+                if not process.is_alive():
+                    internal_logger.error(
+                        f"shard {shard_id} exited with code {process.exitcode};"
+                        " restarting it"
+                    )
+                    conn.close()
+                    self.start_shard(shard_id)
+
+    async def run(self):
+        # (creating the Storage switches both databases to WAL mode and
+        # migrates the schedule database, which needs to happen before the
+        # shards start using them)
+        self.storage = Storage(schedule_db, bee_db, BeeBotConfig.storage_profile)
+        self.pipeline = BeeBotConfig.get_puzzle_pipeline(self.storage)
+        for shard_id in range(self.shard_count):
+            self.start_shard(shard_id)
+        aiocron.crontab("0 3 * * *", tz=et, func=self.start_publishing)
+        aiocron.crontab(BeeBotConfig.maintenance_cron, tz=et, func=self.run_maintenance)
+        aiocron.crontab(
+            BeeBotConfig.guess_log_compaction_cron, tz=et, func=self.compact_guess_log
+        )
+        await self.start_publishing()
+        try:
+            await self.watch_shards()
+        finally:
+            for publishing in self.publishing.values():
+                publishing.cancel()
+            for process, conn in self.shards.values():
+                process.terminate()
+                conn.close()
+            self.pipeline.renderer.close()
+            self.storage.close()
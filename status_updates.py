@@ -0,0 +1,100 @@
+import asyncio
+import time
+from logging import getLogger
+from typing import Callable, Optional
+
+import disnake as discord
+
+from outbound import STATUS, OutboundQueue
+
+internal_logger = getLogger("BeeBot.Internal")
+
+
+class StatusUpdater:
+    """
+    Keeps the status messages of sessions up to date while coalescing bursts
+    of updates to the same message. The first update after a quiet period is
+    edited in right away; any more that come in less than `window` seconds
+    after an edit are merged into one edit at the end of the window, which
+    shows whatever the text is at that point.
+
+    Messages are edited through the Message or PartialMessage objects passed
+    in, so they don't have to be fetched first. If an OutboundQueue is given,
+    the edits go through it, behind any reactions waiting in the channel; the
+    text is rendered when the edit is actually made.
+    """
+
+    def __init__(self, window: float = 2, outbound: Optional[OutboundQueue] = None):
+        self.window = window
+        self.outbound = outbound
+        self.requested = 0
+        """Number of updates that have been asked for"""
+        self.edits = 0
+        """Number of edits that have actually been made"""
+        self._last_edit: dict[int, float] = {}
+        self._pending: dict[int, tuple[discord.PartialMessage, Callable[[], str]]] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    @property
+    def edits_saved(self) -> int:
+        """Number of updates that were merged into other edits."""
+        return self.requested - self.edits - len(self._pending)
+
+    async def update(self, message: discord.PartialMessage, render: Callable[[], str]):
+        """
+        Makes sure that message will be edited to show the result of render();
+        this only waits for the edit if it's made right away.
+        """
+        self.requested += 1
+        key = message.id
+        if key in self._tasks:
+            self._pending[key] = (message, render)
+            return
+        last_edit = self._last_edit.get(key)
+        if last_edit is None or time.monotonic() - last_edit >= self.window:
+            await self._edit(key, message, render)
+        else:
+            self._pending[key] = (message, render)
+            self._tasks[key] = asyncio.create_task(self._edit_later(key, last_edit))
+
+    async def _edit(
+        self, key: int, message: discord.PartialMessage, render: Callable[[], str]
+    ):
+        edited = time.monotonic()
+        self._last_edit[key] = edited
+        # forget about the edit once it can no longer delay the next one
+        asyncio.get_running_loop().call_later(self.window, self._forget, key, edited)
+        self.edits += 1
+        try:
+            if self.outbound is None:
+                await message.edit(content=render())
+            else:
+                await self.outbound.run(
+                    message.channel.id,
+                    "edit",
+                    lambda: message.edit(content=render()),
+                    STATUS,
+                )
+        except discord.HTTPException:
+            internal_logger.exception(f"unable to edit status message {key}")
+
+    def _forget(self, key: int, edited: float):
+        if self._last_edit.get(key) == edited:
+            del self._last_edit[key]
+
+    async def _edit_later(self, key: int, last_edit: float):
+        await asyncio.sleep(last_edit + self.window - time.monotonic())
+        del self._tasks[key]
+        message, render = self._pending.pop(key)
+        await self._edit(key, message, render)
+
+    async def close(self):
+        """Makes any edits that are still waiting for their window to pass."""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        pending = list(self._pending.items())
+        self._pending.clear()
+        await asyncio.gather(
+            *(self._edit(key, message, render) for key, (message, render) in pending)
+        )
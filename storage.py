@@ -0,0 +1,471 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+from bee_engine import SessionBee, SpellingBee
+from sqlalchemy import bindparam, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from compact_session import CompactSession, Guess, PuzzleRecord
+from models import (
+    GuessLog,
+    PostRow,
+    ScheduledPost,
+    SessionProgress,
+    StorageProfile,
+    create_db,
+    default_profile,
+)
+
+T = TypeVar("T")
+
+
+class Storage:
+    """
+    Owns the schedule database session and every read and write of the bee
+    database, and runs all of them on one dedicated thread so that the event
+    loop never blocks on SQLite. Because only that thread ever touches the
+    databases, the SQLAlchemy session needs no locking and writes can't
+    interleave with each other.
+
+    Sessions are created with expire_on_commit=False so that ScheduledPosts
+    can be read from the event loop after being returned from here without
+    triggering lazy loads; they should only be modified through the methods
+    below, though.
+
+    Both databases are set up according to the given StorageProfile; see
+    models.StorageProfile for what it can and can't change about bee_engine's
+    connections.
+
+    Puzzles are stored in the bee database by bee_engine, once per day.
+    Sessions are CompactSessions, stored in the schedule database as a
+    snapshot (a bitset of the answers gotten) plus an append-only log of the
+    answers gotten since, so saving a guess is one insert however far along
+    the session is; compact_guess_log writes new snapshots now and then to
+    keep the logs that have to be replayed short. Each session shares its
+    puzzle's PuzzleRecord, which is built the first time it's needed and kept
+    for the last few puzzles. Sessions that bee_engine saved in the bee
+    database before this are converted the first time they're read.
+    """
+
+    def __init__(
+        self, schedule_db: str, bee_db: str, profile: StorageProfile = default_profile
+    ):
+        self.bee_db = bee_db
+        self.profile = profile
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="BeeBot.Storage"
+        )
+        self.call_sync(profile.prepare, schedule_db)
+        self.call_sync(profile.prepare, bee_db)
+        self.engine = self.call_sync(create_db, schedule_db, profile)
+        self.session = Session(self.engine, expire_on_commit=False)
+        self._records: dict[str, PuzzleRecord] = {}
+        self.call_sync(self._backfill_session_days)
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Runs func(*args) on the database thread."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(func, *args)
+        )
+
+    def call_sync(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Runs func(*args) on the database thread and blocks until it's done;
+        for use outside of the event loop (or in tests.)
+        """
+        return self._executor.submit(func, *args).result()
+
+    def close(self):
+        self.call_sync(self.session.close)
+        self.call_sync(self.engine.dispose)
+        self._executor.shutdown()
+
+    # schedule database
+
+    def _get_schedule(self) -> list[ScheduledPost]:
+        return list(x[0] for x in self.session.execute(select(ScheduledPost)))
+
+    def _get_post(self, guild_id: int) -> Optional[ScheduledPost]:
+        existing = self.session.execute(
+            select(ScheduledPost).where(ScheduledPost.guild_id == guild_id)
+        ).first()
+        return None if existing is None else existing[0]
+
+    def _get_posts(self, guild_ids: list[int]) -> list[ScheduledPost]:
+        posts = []
+        # (in chunks to stay under SQLite's limit on query parameters)
+        for start in range(0, len(guild_ids), 500):
+            posts.extend(
+                x[0]
+                for x in self.session.execute(
+                    select(ScheduledPost).where(
+                        ScheduledPost.guild_id.in_(guild_ids[start : start + 500])
+                    )
+                )
+            )
+        return posts
+
+    def _get_post_rows(self, after_id: int, limit: int) -> list[tuple]:
+        return self.session.execute(
+            select(
+                ScheduledPost.id,
+                ScheduledPost.guild_id,
+                ScheduledPost.channel_id,
+                ScheduledPost.timing,
+                ScheduledPost.current_session,
+            )
+            .where(ScheduledPost.id > after_id)
+            .order_by(ScheduledPost.id)
+            .limit(limit)
+        ).all()
+
+    def _add_posts(self, *posts: ScheduledPost):
+        self.session.add_all(posts)
+        self.session.commit()
+
+    def _delete_post(self, guild_id: int) -> Optional[ScheduledPost]:
+        existing = self._get_post(guild_id)
+        if existing is not None:
+            self.session.delete(existing)
+            self.session.commit()
+        return existing
+
+    def _get_session_id(self, guild_id: int, channel_id: int) -> Optional[str]:
+        result = self.session.execute(
+            select(ScheduledPost.current_session).where(
+                ScheduledPost.guild_id == guild_id,
+                ScheduledPost.channel_id == channel_id,
+            )
+        ).first()
+        return None if result is None else result[0]
+
+    def _backfill_session_days(self) -> int:
+        """
+        Fills in session_day for posts saved before it was added, from the day
+        of their current session; returns how many were filled in. Posts whose
+        session can't be found are left without one.
+        """
+        posts = (
+            self.session.execute(
+                select(ScheduledPost).where(
+                    ScheduledPost.session_day.is_(None),
+                    ScheduledPost.current_session.is_not(None),
+                )
+            )
+            .scalars()
+            .all()
+        )
+        filled = 0
+        for scheduled in posts:
+            day = self.session.execute(
+                select(SessionProgress.day).where(
+                    SessionProgress.session_id == scheduled.current_session
+                )
+            ).scalar()
+            if day is None:
+                # (sessions from before CompactSessions are in the bee database)
+                bee = SessionBee.retrieve_saved(scheduled.current_session, self.bee_db)
+                day = None if bee is None else bee.day
+            if day is not None:
+                scheduled.session_day = day
+                filled += 1
+        self.session.commit()
+        return filled
+
+    def _get_missed_posts(
+        self, day: str, hours: float, guild_ids: Optional[list[int]] = None
+    ) -> list[ScheduledPost]:
+        # posts without a session_day either have never been sent or have a
+        # session that no longer exists (see _backfill_session_days), so it
+        # can't be today's
+        query = select(ScheduledPost).where(
+            or_(
+                ScheduledPost.session_day < day,
+                ScheduledPost.session_day.is_(None),
+            ),
+            ScheduledPost.timing <= hours,
+        )
+        if guild_ids is not None:
+            query = query.where(ScheduledPost.guild_id.in_(guild_ids))
+        return list(
+            x[0] for x in self.session.execute(query.order_by(ScheduledPost.timing))
+        )
+
+    def _start_sessions(
+        self, posts: list[ScheduledPost], bee_base: SpellingBee
+    ) -> list[tuple[CompactSession, Optional[str]]]:
+        record = self._get_record(bee_base.day, bee_base)
+        started = []
+        for scheduled in posts:
+            bee = CompactSession.new(record)
+            self.session.add(
+                SessionProgress(
+                    session_id=bee.session_id,
+                    day=bee.day,
+                    gotten=bee.gotten_bytes(),
+                )
+            )
+            started.append((bee, scheduled.current_session))
+            scheduled.current_session = bee.session_id
+            scheduled.session_day = bee_base.day
+        self._add_posts(*posts)
+        return started
+
+    def _get_record(
+        self, day: str, puzzle: Optional[SpellingBee] = None
+    ) -> Optional[PuzzleRecord]:
+        """
+        Returns the PuzzleRecord for the given day's puzzle, building it from
+        puzzle or the saved puzzle if it isn't cached.
+        """
+        record = self._records.get(day)
+        if record is None:
+            if puzzle is None:
+                puzzle = SpellingBee.retrieve_saved(day, self.bee_db)
+                if puzzle is None:
+                    return None
+            record = self._records[day] = PuzzleRecord.from_puzzle(puzzle)
+            # only the last few days' puzzles can still have active sessions
+            for old_day in sorted(self._records)[:-3]:
+                del self._records[old_day]
+        return record
+
+    def _load_session(self, session_id: str) -> Optional[tuple[CompactSession, int]]:
+        """
+        Rebuilds a session from its snapshot and the guesses logged after it;
+        returns it along with the ID of the last of those guesses (or of the
+        snapshot's, if there are none.)
+        """
+        row = self.session.execute(
+            select(
+                SessionProgress.day,
+                SessionProgress.gotten,
+                SessionProgress.status_message_id,
+                SessionProgress.snapshot_log_id,
+            ).where(SessionProgress.session_id == session_id)
+        ).first()
+        if row is None:
+            return None
+        record = self._get_record(row.day)
+        if record is None:
+            return None
+        bee = CompactSession(
+            session_id,
+            record,
+            CompactSession.gotten_from_bytes(row.gotten),
+            row.status_message_id,
+        )
+        last_id = row.snapshot_log_id or 0
+        tail = self.session.execute(
+            select(GuessLog.id, GuessLog.word)
+            .where(GuessLog.session_id == session_id, GuessLog.id > last_id)
+            .order_by(GuessLog.id)
+        ).all()
+        if tail:
+            bee.replay(word for _, word in tail)
+            last_id = tail[-1].id
+        return bee, last_id
+
+    def _read_session(self, session_id: str) -> Optional[CompactSession]:
+        loaded = self._load_session(session_id)
+        if loaded is None:
+            return self._convert_session(session_id)
+        return loaded[0]
+
+    def _convert_session(self, session_id: str) -> Optional[CompactSession]:
+        bee = SessionBee.retrieve_saved(session_id, self.bee_db)
+        if bee is None:
+            return None
+        record = self._get_record(bee.day)
+        if record is None:
+            return None
+        converted = CompactSession.from_session_bee(bee, record)
+        self.session.add(
+            SessionProgress(
+                session_id=session_id,
+                day=converted.day,
+                gotten=converted.gotten_bytes(),
+                status_message_id=converted.status_message_id,
+            )
+        )
+        self.session.commit()
+        return converted
+
+    def _log_guesses(self, guesses: list[Guess]):
+        if not guesses:
+            return
+        self.session.connection().execute(
+            insert(GuessLog.__table__), [guess._asdict() for guess in guesses]
+        )
+        self.session.commit()
+
+    def _set_status_message(self, bee: CompactSession):
+        self.session.connection().execute(
+            update(SessionProgress.__table__)
+            .where(SessionProgress.session_id == bee.session_id)
+            .values(status_message_id=bee.status_message_id)
+        )
+        self.session.commit()
+
+    def _compact_guess_log(self, min_tail: int) -> int:
+        session_ids = (
+            self.session.execute(
+                select(GuessLog.session_id)
+                .join(
+                    SessionProgress, SessionProgress.session_id == GuessLog.session_id
+                )
+                .where(GuessLog.id > func.coalesce(SessionProgress.snapshot_log_id, 0))
+                .group_by(GuessLog.session_id)
+                .having(func.count() >= min_tail)
+            )
+            .scalars()
+            .all()
+        )
+        snapshots = []
+        for session_id in session_ids:
+            loaded = self._load_session(session_id)
+            if loaded is not None:
+                bee, last_id = loaded
+                snapshots.append(
+                    {
+                        "b_session_id": session_id,
+                        "b_gotten": bee.gotten_bytes(),
+                        "b_snapshot_log_id": last_id,
+                    }
+                )
+        if snapshots:
+            self.session.connection().execute(
+                update(SessionProgress.__table__)
+                .where(SessionProgress.session_id == bindparam("b_session_id"))
+                .values(
+                    gotten=bindparam("b_gotten"),
+                    snapshot_log_id=bindparam("b_snapshot_log_id"),
+                ),
+                snapshots,
+            )
+            self.session.commit()
+        return len(snapshots)
+
+    def _get_guesses(self, session_id: str) -> list[Guess]:
+        return [
+            Guess(*row)
+            for row in self.session.execute(
+                select(
+                    GuessLog.session_id,
+                    GuessLog.word,
+                    GuessLog.message_id,
+                    GuessLog.guessed_at,
+                )
+                .where(GuessLog.session_id == session_id)
+                .order_by(GuessLog.id)
+            )
+        ]
+
+    async def get_schedule(self) -> list[ScheduledPost]:
+        return await self.run(self._get_schedule)
+
+    async def get_post(self, guild_id: int) -> Optional[ScheduledPost]:
+        return await self.run(self._get_post, guild_id)
+
+    async def get_posts(self, guild_ids: Iterable[int]) -> list[ScheduledPost]:
+        """Returns the posts for the given guilds, for the ones that have one."""
+        return await self.run(self._get_posts, list(guild_ids))
+
+    async def stream_schedule(self, chunk_size: int = 1000) -> AsyncIterator[PostRow]:
+        """
+        Yields a PostRow for every scheduled post without loading the whole
+        table or any ORM objects at once. The rows are read a chunk at a time
+        on the database thread, each chunk picking up after the last id of the
+        previous one, so no cursor is held open in between.
+        """
+        after_id = -1
+        while True:
+            rows = await self.run(self._get_post_rows, after_id, chunk_size)
+            if not rows:
+                return
+            after_id = rows[-1].id
+            for row in rows:
+                yield PostRow(*row[1:])
+
+    async def add_post(self, post: ScheduledPost):
+        await self.run(self._add_posts, post)
+
+    async def delete_post(self, guild_id: int) -> Optional[ScheduledPost]:
+        """Deletes the post for a guild, returning it if it existed."""
+        return await self.run(self._delete_post, guild_id)
+
+    async def get_session_id(self, guild_id: int, channel_id: int) -> Optional[str]:
+        return await self.run(self._get_session_id, guild_id, channel_id)
+
+    async def get_missed_posts(
+        self, day: str, hours: float, guild_ids: Optional[Iterable[int]] = None
+    ) -> list[ScheduledPost]:
+        """
+        Returns the posts whose time of day has passed (hours is the current
+        time of day) but that don't have a session for the given day yet,
+        earliest first; optionally, only the ones for the given guilds.
+        """
+        return await self.run(
+            self._get_missed_posts,
+            day,
+            hours,
+            None if guild_ids is None else list(guild_ids),
+        )
+
+    async def start_sessions(
+        self, posts: list[ScheduledPost], bee_base: SpellingBee
+    ) -> list[tuple[CompactSession, Optional[str]]]:
+        """
+        Creates a new session of bee_base for each of the given posts and makes
+        it the post's current session, committing the new sessions and the
+        changes to the posts in one transaction. Returns each new session along
+        with the ID of the session that it replaced.
+        """
+        return await self.run(self._start_sessions, posts, bee_base)
+
+    # puzzles and sessions
+
+    async def load_puzzle(self, day: Optional[str] = None) -> Optional[SpellingBee]:
+        """Loads the puzzle for the given day, or the latest one if it's None."""
+        if day is None:
+            return await self.run(
+                partial(SpellingBee.retrieve_saved, db_path=self.bee_db)
+            )
+        return await self.run(SpellingBee.retrieve_saved, day, self.bee_db)
+
+    async def save_puzzle(self, bee: SpellingBee):
+        await self.run(bee.persist_to, self.bee_db)
+
+    async def read_session(self, session_id: str) -> Optional[CompactSession]:
+        """
+        Loads a session from its latest snapshot and the guesses logged after
+        it; guesses made in it aren't saved until they're logged.
+        """
+        return await self.run(self._read_session, session_id)
+
+    async def log_guesses(self, guesses: list[Guess]):
+        """Appends guesses (from any number of sessions) to the guess log."""
+        await self.run(self._log_guesses, guesses)
+
+    async def save_sessions(self, bees: list[CompactSession]):
+        """Logs the unsaved guesses of each session in the list in one batch."""
+        await self.log_guesses([guess for bee in bees for guess in bee.take_unsaved()])
+
+    async def set_session_metadata(self, bee: CompactSession, metadata: dict):
+        bee.metadata = metadata
+        await self.run(self._set_status_message, bee)
+
+    async def compact_guess_log(self, min_tail: int = 1) -> int:
+        """
+        Writes a new snapshot of every session that has at least min_tail
+        guesses logged after its current one; returns how many were written.
+        The log itself is kept, for replaying or auditing sessions, until
+        maintenance deletes the sessions.
+        """
+        return await self.run(self._compact_guess_log, min_tail)
+
+    async def get_guesses(self, session_id: str) -> list[Guess]:
+        """Every answer that has been logged for a session, in order."""
+        return await self.run(self._get_guesses, session_id)
@@ -0,0 +1,244 @@
+"""
+A simulated Discord for running BeeBot without connecting to anything: fake
+guilds, channels and messages that go through a FakeAPI, which can add latency
+to every request and answer with 429s once a rate limit is exceeded. Used by
+the bot's tests and by benchmarks/bench_day.py.
+"""
+
+import asyncio
+import itertools
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Optional
+from unittest.mock import patch
+
+import disnake as discord
+
+
+class FakeAPI:
+    """
+    Stands in for Discord's HTTP API. Each request waits for latency seconds
+    (give or take jitter); if rate_limit is set and more than that many
+    requests were made in the last second, the request gets a 429 and, like
+    disnake's HTTP client does, waits for the window to free up and tries
+    again, unless raise_on_429 is set, in which case the 429 is raised as an
+    HTTPException.
+    """
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 rate_limit: Optional[int] = None,
+                 raise_on_429: bool = False):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.raise_on_429 = raise_on_429
+        self.requests: dict[str, int] = {}
+        self.rate_limited = 0
+        self._recent: deque[float] = deque()
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    async def request(self, route: str):
+        while True:
+            if self.latency or self.jitter:
+                await asyncio.sleep(
+                    max(0, self.latency + random.uniform(-1, 1) * self.jitter))
+            if self.rate_limit is None:
+                break
+            now = time.monotonic()
+            while self._recent and self._recent[0] <= now - 1:
+                self._recent.popleft()
+            if len(self._recent) < self.rate_limit:
+                self._recent.append(now)
+                break
+            self.rate_limited += 1
+            if self.raise_on_429:
+                raise discord.HTTPException(
+                    SimpleNamespace(status=429, reason="Too Many Requests"),
+                    "You are being rate limited.")
+            await asyncio.sleep(self._recent[0] + 1 - now)
+        self.requests[route] = self.requests.get(route, 0) + 1
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+
+@dataclass(eq=False)
+class FakeGuild:
+    id: int
+    name: str
+    channels: list["FakeChannel"] = field(default_factory=list)
+
+    def __str__(self):
+        return self.name
+
+
+@dataclass(eq=False)
+class FakeAttachment:
+    url: str
+
+
+@dataclass(eq=False)
+class FakeMessage:
+    api: FakeAPI
+    id: int
+    channel: "FakeChannel"
+    content: Optional[str] = None
+    file: Optional[discord.File] = None
+    embed: Optional[discord.Embed] = None
+    attachments: list[FakeAttachment] = field(default_factory=list)
+    reactions: list[str] = field(default_factory=list)
+    edits: int = 0
+    author: SimpleNamespace = field(
+        default_factory=lambda: SimpleNamespace(bot=False))
+    mention_everyone: bool = False
+
+    @property
+    def guild(self) -> FakeGuild:
+        return self.channel.guild
+
+    async def add_reaction(self, emoji: str):
+        await self.api.request("add_reaction")
+        self.reactions.append(emoji)
+
+    async def edit(self, content: Optional[str] = None, **kwargs):
+        await self.api.request("edit_message")
+        self.content = content
+        self.edits += 1
+
+
+class FakeTyping:
+
+    def __init__(self, channel: "FakeChannel"):
+        self.channel = channel
+
+    async def __aenter__(self):
+        await self.channel.api.request("typing")
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+@dataclass(eq=False)
+class FakeChannel:
+    api: FakeAPI
+    id: int
+    guild: FakeGuild
+    name: str = "spelling-bee"
+    sent: list[FakeMessage] = field(default_factory=list)
+    messages: dict[int, FakeMessage] = field(default_factory=dict)
+
+    def __str__(self):
+        return self.name
+
+    async def send(self,
+                   content: Optional[str] = None,
+                   *,
+                   file: Optional[discord.File] = None,
+                   embed: Optional[discord.Embed] = None,
+                   **kwargs) -> FakeMessage:
+        await self.api.request("send_message")
+        message = FakeMessage(self.api,
+                              self.api.next_id(),
+                              self,
+                              content,
+                              file=file,
+                              embed=embed)
+        if file is not None:
+            message.attachments.append(
+                FakeAttachment(f"https://cdn.discordapp.com/attachments/"
+                               f"{self.id}/{message.id}/{file.filename}"))
+        self.sent.append(message)
+        self.messages[message.id] = message
+        return message
+
+    def typing(self) -> FakeTyping:
+        return FakeTyping(self)
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        # (like the real thing, this doesn't make a request)
+        message = self.messages.get(message_id)
+        if message is None:
+            message = FakeMessage(self.api, message_id, self)
+        return message
+
+    def make_message(self, content: str) -> FakeMessage:
+        """A message from a user in this channel, as the bot would receive it."""
+        return FakeMessage(self.api, self.api.next_id(), self, content)
+
+
+class FakeDiscord:
+    """
+    A set of fake guilds, each with one channel, sharing one FakeAPI. install
+    makes a bot see them as its guilds and channels.
+    """
+
+    def __init__(self, guild_count: int = 0, api: Optional[FakeAPI] = None):
+        self.api = api if api is not None else FakeAPI()
+        self.guilds: dict[int, FakeGuild] = {}
+        self.channels: dict[int, FakeChannel] = {}
+        self.commands: list = []
+        """The application commands most recently registered"""
+        for _ in range(guild_count):
+            self.add_guild()
+
+    def add_guild(self,
+                  guild_id: Optional[int] = None,
+                  channel_id: Optional[int] = None) -> FakeGuild:
+        guild_id = self.api.next_id() if guild_id is None else guild_id
+        channel_id = self.api.next_id() if channel_id is None else channel_id
+        guild = FakeGuild(guild_id, f"Guild {guild_id}")
+        channel = FakeChannel(self.api, channel_id, guild)
+        guild.channels.append(channel)
+        self.guilds[guild.id] = guild
+        self.channels[channel.id] = channel
+        return guild
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channels.get(channel_id)
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return self.guilds.get(guild_id)
+
+    async def fetch_channel(self, channel_id: int) -> FakeChannel:
+        await self.api.request("get_channel")
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            raise discord.NotFound(
+                SimpleNamespace(status=404, reason="Not Found"),
+                "Unknown Channel")
+        return channel
+
+    async def bulk_overwrite_global_commands(self, commands: list) -> list:
+        await self.api.request("bulk_overwrite_global_commands")
+        self.commands = list(commands)
+        return self.commands
+
+    @property
+    def sent(self) -> list[FakeMessage]:
+        return [m for channel in self.channels.values() for m in channel.sent]
+
+    @contextmanager
+    def install(self, bot: discord.Client):
+        """
+        Routes the bot's guild and channel lookups and its command
+        registration here for the duration of the with block.
+        """
+        bot.get_channel = self.get_channel
+        bot.get_guild = self.get_guild
+        bot.fetch_channel = self.fetch_channel
+        bot.bulk_overwrite_global_commands = self.bulk_overwrite_global_commands
+        with patch.object(type(bot), "guilds",
+                          property(lambda _: list(self.guilds.values()))):
+            yield self
+        del (bot.get_channel, bot.get_guild, bot.fetch_channel,
+             bot.bulk_overwrite_global_commands)
@@ -3,14 +3,20 @@ from datetime import datetime, timedelta
 from unittest import IsolatedAsyncioTestCase
 from unittest.mock import Mock, AsyncMock, patch
 from pathlib import Path
-from bot import BeeBot, SpellingBee, et
+import shutil
+from bot import BeeBot, BeeBotConfig, SpellingBee, et
 import bot
+from bee_engine import SessionBee
 from disnake.ext.commands import InteractionBot
 from freezegun import freeze_time
 
-from models import ScheduledPost, hourable
+from maintenance import MaintenanceReport, compact_bee_db
+from models import PostRow, ScheduledPost, SessionProgress, hourable
+from test.fake_discord import FakeChannel, FakeDiscord
 
 test_post_data = {"guild_id": -1, "channel_id": -1}
+# (seconds to wait for the day's puzzle before failing instead of hanging)
+puzzle_timeout = 60
 
 
 class SimpleBotTest(IsolatedAsyncioTestCase):
@@ -21,10 +27,12 @@ class SimpleBotTest(IsolatedAsyncioTestCase):
 
     @freeze_time(datetime(2022, 1, 1, 2, 59, 59, tzinfo=et), tick=True)
     async def test_morning_fetch(self):
-        BeeBot.get_new_puzzle = AsyncMock()
-        freshbot = BeeBot()
-        await asyncio.sleep(2)
-        BeeBot.get_new_puzzle.assert_awaited_once()
+        with patch.object(BeeBot, "get_new_puzzle",
+                          AsyncMock()) as get_new_puzzle:
+            freshbot = BeeBot()
+            await asyncio.sleep(2)
+            get_new_puzzle.assert_awaited_once()
+        freshbot.storage.close()
 
 
 class BotTest(IsolatedAsyncioTestCase):
@@ -38,29 +46,24 @@ class BotTest(IsolatedAsyncioTestCase):
     def setUp(self):
         bot.bee_db = "data/mock_puzzles.db"
         bot.schedule_db = "data/mock_schedule.db"
+        bot.command_hash_file = "data/mock_command_hash.txt"
         self.bot = BeeBot()
         InteractionBot.on_connect = AsyncMock(name="Bot.on_connect")
-        InteractionBot.get_guild = Mock(name="get_guild")
-        typing_manager = Mock(name="Channel.typing() result")
-        typing_manager.__aenter__ = AsyncMock()
-        typing_manager.__aexit__ = AsyncMock()
-        channel = Mock(name="Channel")
-        channel.typing = Mock(name="Channel.typing()",
-                              return_value=typing_manager)
-        message = Mock()
-        message.id = -1
-        channel.send = AsyncMock(name="Channel.send", return_value=message)
-        InteractionBot.get_channel = Mock(name="Bot.get_channel",
-                                       return_value=channel)
+        self.discord = FakeDiscord()
+        for i in range(1, 4):
+            self.discord.add_guild(-i, -i)
+        installed = self.discord.install(self.bot)
+        installed.__enter__()
+        self.addCleanup(installed.__exit__, None, None, None)
 
     async def asyncSetUp(self) -> None:
         await self.bot.on_ready()
 
     def tearDown(self) -> None:
-        self.bot.session.close()
-        self.bot.db_engine.dispose()
+        self.bot.storage.close()
         Path("data/mock_puzzles.db").unlink(missing_ok=True)
         Path("data/mock_schedule.db").unlink(missing_ok=True)
+        Path("data/mock_command_hash.txt").unlink(missing_ok=True)
 
     async def test_date_string(self):
         with patch("bot.datetime") as mock_datetime:
@@ -69,15 +72,36 @@ class BotTest(IsolatedAsyncioTestCase):
 
     async def test_ensure_puzzle(self):
         self.assertIsNone(SpellingBee.retrieve_saved(db_path=bot.bee_db))
-        await self.bot.todays_puzzle_ready
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
         created = SpellingBee.retrieve_saved(db_path=bot.bee_db)
         self.assertIsNotNone(created)
         self.assertIsInstance(created.image, bytes)
         self.assertEqual(created.day, BeeBot.get_current_date())
         self.bot.ensure_todays_puzzle = Mock()
-        await self.bot.todays_puzzle_ready
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
         self.bot.ensure_todays_puzzle.assert_not_called()
 
+    async def test_one_puzzle_task_per_day(self):
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
+        release = asyncio.Event()
+        with patch.object(self.bot, "ensure_todays_puzzle",
+                          AsyncMock(side_effect=release.wait)) as ensure:
+            # (the first one is done, so this starts another)
+            await self.bot.get_new_puzzle()
+            running = self.bot.todays_puzzle_ready
+            await self.bot.get_new_puzzle()
+            self.assertIs(self.bot.todays_puzzle_ready, running)
+            release.set()
+            await asyncio.wait_for(running, puzzle_timeout)
+        ensure.assert_awaited_once()
+
+    async def test_wait_for_puzzle(self):
+        waiting = asyncio.create_task(self.bot.wait_for_todays_puzzle())
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
+        bee = await asyncio.wait_for(waiting, puzzle_timeout)
+        self.assertEqual(bee.day, BeeBot.get_current_date())
+        self.assertIsInstance(bee.image, bytes)
+
     async def test_cron_fires(self):
         test_post = self.get_future_post(seconds=1)
         self.bot.send_scheduled_post = AsyncMock()
@@ -90,8 +114,8 @@ class BotTest(IsolatedAsyncioTestCase):
         test_post = self.get_future_post(seconds=1)
         self.bot.send_scheduled_post = AsyncMock()
         await self.bot.add_scheduled_post(test_post)
-        self.bot.remove_scheduled_post(test_post.guild_id)
-        await self.bot.todays_puzzle_ready
+        await self.bot.remove_scheduled_post(test_post.guild_id)
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
         await asyncio.sleep(2)
         self.bot.send_scheduled_post.assert_not_called()
         self.bot.send_scheduled_post.assert_not_awaited()
@@ -101,29 +125,194 @@ class BotTest(IsolatedAsyncioTestCase):
         await self.bot.add_scheduled_post(other_test_post)
         replacement = self.get_future_post(hours=1)
         await self.bot.add_scheduled_post(replacement)
-        await self.bot.todays_puzzle_ready
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
         await asyncio.sleep(2)
         self.bot.send_scheduled_post.assert_not_called()
         self.bot.send_scheduled_post.assert_not_awaited()
 
+    async def test_batched_dispatch(self):
+        posts = [
+            ScheduledPost(guild_id=-i, channel_id=-i, timing=0)
+            for i in range(1, 4)
+        ]
+        await self.bot.send_scheduled_batch(posts)
+        for post in posts:
+            self.assertIsNotNone(post.current_session)
+        self.assertEqual(len(set(p.current_session for p in posts)), 3)
+        # a puzzle message and a status message for each post
+        self.assertEqual(len(self.discord.sent), 6)
+        metrics = self.bot.slot_metrics[-1]
+        self.assertEqual(metrics.sent, 3)
+        self.assertEqual(metrics.failed, 0)
+        self.assertIsNotNone(metrics.posts_per_second)
+
+    async def test_stream_schedule(self):
+        posts = [
+            ScheduledPost(guild_id=-i, channel_id=-i, timing=7)
+            for i in range(1, 2501)
+        ]
+        await self.bot.storage.run(self.bot.storage._add_posts, *posts)
+        rows = [row async for row in self.bot.storage.stream_schedule(1000)]
+        self.assertEqual(sorted(row.guild_id for row in rows),
+                         sorted(post.guild_id for post in posts))
+        self.assertIsInstance(rows[0], PostRow)
+
+    async def test_catch_up(self):
+        timing = max(0, hourable.now(tz=et).decimal_hours - 0.01)
+        missed = ScheduledPost(guild_id=-1, channel_id=-1, timing=timing)
+        sent_today = ScheduledPost(guild_id=-2,
+                                   channel_id=-2,
+                                   timing=timing,
+                                   current_session="existing",
+                                   session_day=BeeBot.get_current_date())
+        other_guild = ScheduledPost(guild_id=-3, channel_id=-3, timing=timing)
+        for post in (missed, sent_today, other_guild):
+            await self.bot.storage.add_post(post)
+            self.bot.scheduler.add(post)
+        self.bot.send_scheduled_batch = AsyncMock()
+        await self.bot.catch_up({-1, -2})
+        self.bot.send_scheduled_batch.assert_awaited_once_with([missed])
+
+    async def test_catch_up_legacy_posts(self):
+        # posts saved before session_day was added only have a current_session
+        # (which bee_engine saved in the bee database before CompactSessions)
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
+        timing = max(0, hourable.now(tz=et).decimal_hours - 0.01)
+        todays = SessionBee(SpellingBee.retrieve_saved(db_path=bot.bee_db))
+        todays.persist_to(bot.bee_db)
+        sent_today = ScheduledPost(guild_id=-1,
+                                   channel_id=-1,
+                                   timing=timing,
+                                   current_session=todays.session_id)
+        missed = ScheduledPost(guild_id=-2,
+                               channel_id=-2,
+                               timing=timing,
+                               current_session="old")
+        gone = ScheduledPost(guild_id=-3,
+                             channel_id=-3,
+                             timing=timing,
+                             current_session="deleted")
+        for post in (sent_today, missed, gone):
+            await self.bot.storage.add_post(post)
+        await self.bot.storage.run(
+            self.bot.storage.session.add,
+            SessionProgress(session_id="old",
+                            day="2022-01-01",
+                            gotten=b"\x00"))
+        self.assertEqual(
+            await self.bot.storage.run(
+                self.bot.storage._backfill_session_days), 2)
+        self.bot.send_scheduled_batch = AsyncMock()
+        await self.bot.catch_up({-1, -2, -3})
+        self.bot.send_scheduled_batch.assert_awaited_once()
+        batch = self.bot.send_scheduled_batch.await_args.args[0]
+        self.assertEqual(sorted(post.guild_id for post in batch), [-3, -2])
+
+    async def test_late_puzzle(self):
+        bee = await asyncio.wait_for(self.bot.wait_for_todays_puzzle(),
+                                     puzzle_timeout)
+        day = BeeBot.get_current_date()
+        # as if the day's puzzle hadn't come out yet
+        del self.bot.puzzle_futures[day]
+        posts = [
+            ScheduledPost(guild_id=-i, channel_id=-i, timing=0)
+            for i in range(1, 4)
+        ]
+        with patch.object(BeeBotConfig, "late_notices", True):
+            sending = asyncio.create_task(self.bot.send_scheduled_batch(posts))
+            self.bot.resolve_late_puzzle(day, bee)
+            await asyncio.sleep(0.5)
+            self.assertFalse(sending.done())
+            self.assertEqual(len(self.discord.sent), 3)
+            for post in posts:
+                self.assertIsNone(post.current_session)
+            self.bot.resolve_puzzle(day, bee)
+            await asyncio.wait_for(sending, puzzle_timeout)
+        # then a puzzle message and a status message for each post
+        self.assertEqual(len(self.discord.sent), 9)
+        for post in posts:
+            self.assertIsNotNone(post.current_session)
+
+    async def test_puzzle_never_came_out(self):
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
+        day = BeeBot.get_current_date()
+        del self.bot.puzzle_futures[day]
+        posts = [ScheduledPost(guild_id=-1, channel_id=-1, timing=0)]
+        sending = asyncio.create_task(self.bot.send_scheduled_batch(posts))
+        self.bot.resolve_puzzle(day, None)
+        await asyncio.wait_for(sending, puzzle_timeout)
+        self.assertEqual(self.discord.sent, [])
+        self.assertIsNone(posts[0].current_session)
+        self.assertEqual(self.bot.slot_metrics[-1].failed, 1)
+
+    async def test_reuses_uploaded_image(self):
+        posts = [
+            ScheduledPost(guild_id=-i, channel_id=-i, timing=0)
+            for i in range(1, 4)
+        ]
+        await self.bot.send_scheduled_batch(posts)
+        puzzle_messages = [
+            message for message in self.discord.sent
+            if message.file is not None or message.embed is not None
+        ]
+        self.assertEqual(len(puzzle_messages), 3)
+        [upload] = [m for m in puzzle_messages if m.file is not None]
+        for message in puzzle_messages:
+            if message.embed is not None:
+                self.assertEqual(message.embed.image.url,
+                                 upload.attachments[0].url)
+
     async def test_responds(self):
         await self.bot.send_scheduled_post(self.get_future_post(seconds=1))
-        await self.bot.todays_puzzle_ready
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
         await asyncio.sleep(1)
-        message = Mock()
-        message.guild.id = -1
-        message.channel.id = -1
-        message.add_reaction = AsyncMock()
-        status_message = Mock()
-        status_message.edit = AsyncMock()
-        message.channel.fetch_message = AsyncMock(return_value=status_message)
+        channel = self.discord.channels[-1]
+        [_, status_message] = channel.sent
         guess = list(SpellingBee.retrieve_saved(db_path=bot.bee_db).answers)[0]
-        message.content = f"my guess is {guess}!"
+        message = channel.make_message(f"my guess is {guess}!")
         await self.bot.respond_to_guesses(message)
-        message.add_reaction.assert_awaited_with("👍")
-        status_message.edit.assert_awaited()
+        self.assertEqual(message.reactions, ["👍"])
+        self.assertEqual(status_message.edits, 1)
         await self.bot.respond_to_guesses(message)
-        message.add_reaction.assert_awaited_with("🤝")
+        self.assertEqual(message.reactions, ["👍", "🤝"])
+
+    async def test_ignores_messages_without_guesses(self):
+        await self.bot.send_scheduled_post(self.get_future_post(seconds=1))
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
+        await asyncio.sleep(1)
+        channel = self.discord.channels[-1]
+        message = channel.make_message("ok, 1234 :)")
+        with patch.object(self.bot.sessions, "get") as get:
+            await self.bot.respond_to_guesses(message)
+        get.assert_not_called()
+        self.assertEqual(len(self.bot.session_actors), 0)
+        self.assertEqual(message.reactions, [])
+
+    async def test_concurrent_guesses(self):
+        await self.bot.send_scheduled_post(self.get_future_post(seconds=1))
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
+        await asyncio.sleep(1)
+        channel = self.discord.channels[-1]
+        answers = list(
+            SpellingBee.retrieve_saved(db_path=bot.bee_db).answers)[:5]
+        messages = [channel.make_message(answer) for answer in answers * 2]
+        await asyncio.gather(*map(self.bot.respond_to_guesses, messages))
+        self.assertEqual([m.reactions for m in messages],
+                         [["👍"]] * len(answers) + [["🤝"]] * len(answers))
+        bee = await self.bot.sessions.get(self.bot.channel_sessions[(-1, -1)])
+        self.assertFalse(set(answers) & set(bee.get_unguessed_words()))
+
+    async def test_ignores_unscheduled_channel(self):
+        await self.bot.send_scheduled_post(self.get_future_post(seconds=1))
+        other_channel = FakeChannel(self.discord.api, -2,
+                                    self.discord.guilds[-1])
+        guess = list(SpellingBee.retrieve_saved(db_path=bot.bee_db).answers)[0]
+        message = other_channel.make_message(f"my guess is {guess}!")
+        await self.bot.respond_to_guesses(message)
+        self.assertEqual(message.reactions, [])
+        self.assertIn((-1, -1), self.bot.channel_sessions)
+        await self.bot.remove_scheduled_post(-1)
+        self.assertNotIn((-1, -1), self.bot.channel_sessions)
 
     async def test_schedule_attr(self):
         test_post = ScheduledPost(**test_post_data, timing=0)
@@ -134,5 +323,56 @@ class BotTest(IsolatedAsyncioTestCase):
         self.assertEqual(test_post.guild_id, retrieved.guild_id)
         self.assertEqual(test_post.channel_id, retrieved.channel_id)
         self.assertEqual(test_post.timing, test_post.timing)
-        self.bot.remove_scheduled_post(test_post.guild_id)
+        await self.bot.remove_scheduled_post(test_post.guild_id)
         self.assertEqual(len(self.bot.schedule), 0)
+
+    async def test_command_sync(self):
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
+        # (there was no saved hash, so on_ready registered the commands)
+        requests = self.discord.api.requests
+        self.assertEqual(requests["bulk_overwrite_global_commands"], 1)
+        self.assertEqual(len(self.discord.commands),
+                         len(self.bot.application_commands))
+        command_hash = self.bot.get_command_hash()
+        self.assertEqual(Path(bot.command_hash_file).read_text(), command_hash)
+        await self.bot.sync_commands()
+        self.assertEqual(requests["bulk_overwrite_global_commands"], 1)
+        # a change to the timing choices is a change to the commands
+        with patch.dict(BeeBotConfig.timing_choices, {"Midnight": 0}):
+            changed = BeeBot()
+            changed.init_responses()
+        self.addCleanup(changed.storage.close)
+        self.assertNotEqual(changed.get_command_hash(), command_hash)
+
+    async def test_compact_bee_db(self):
+        bee = await asyncio.wait_for(self.bot.wait_for_todays_puzzle(),
+                                     puzzle_timeout)
+        stale = SessionBee(bee)
+        stale.persist_to(bot.bee_db)
+        kept = SessionBee(bee)
+        kept.persist_to(bot.bee_db)
+        self.addCleanup(shutil.rmtree, "data/mock_archive", True)
+        report = MaintenanceReport()
+        # (while the bot's storage has the database open)
+        await self.bot.storage.run(compact_bee_db, bot.bee_db,
+                                   [kept.session_id], 1, "data/mock_archive",
+                                   report)
+        self.assertEqual(report.sessions_kept, 1)
+        self.assertIsNone(
+            SessionBee.retrieve_saved(stale.session_id, bot.bee_db))
+        self.assertIsNotNone(
+            SessionBee.retrieve_saved(kept.session_id, bot.bee_db))
+        self.assertIsNotNone(await self.bot.storage.load_puzzle(bee.day))
+        self.assertIsNotNone(
+            SessionBee.retrieve_saved(stale.session_id, report.archive))
+        self.assertFalse(Path(bot.bee_db + ".compacting").exists())
+
+    async def test_startup_timings(self):
+        await asyncio.wait_for(self.bot.todays_puzzle_ready, puzzle_timeout)
+        self.assertIsNotNone(self.bot.startup.ready)
+        self.assertIsNone(self.bot.startup.first_interaction)
+        await self.bot.on_slash_command_completion(Mock())
+        first = self.bot.startup.first_interaction
+        self.assertGreaterEqual(first, self.bot.startup.ready)
+        await self.bot.on_slash_command_completion(Mock())
+        self.assertEqual(self.bot.startup.first_interaction, first)
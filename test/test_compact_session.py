@@ -0,0 +1,308 @@
+import asyncio
+import copy
+import dataclasses
+from pathlib import Path
+import tempfile
+import time
+import random
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from bee_engine import SessionBee, SpellingBee
+
+from compact_session import (CompactSession, PuzzleRecord, probe_rankings,
+                             score_word)
+from models import ScheduledPost
+from storage import Storage
+
+# least to most common, as bee_engine lists them
+answers = ("replant", "planter", "alert", "later", "planet", "plan")
+# the NYT's rankings and the fraction of the puzzle's points that each takes
+nyt_rankings = (("Beginner", 0), ("Good Start", 0.02), ("Moving Up", 0.05),
+                ("Good", 0.08), ("Solid", 0.15), ("Nice", 0.25),
+                ("Great", 0.4), ("Amazing", 0.5), ("Genius", 0.7),
+                ("Queen Bee", 1))
+
+
+def nyt_ranking(score: int, total: int) -> str:
+    return [
+        name for name, fraction in nyt_rankings
+        if score >= round(total * fraction)
+    ][-1]
+
+
+class RankingSession:
+    """Stands in for SessionBee in probe_rankings, ranking like the NYT."""
+    probes = 0
+
+    def __init__(self, puzzle):
+        RankingSession.probes += 1
+        self.score = 0
+
+    def respond_to_guesses(self, guesses: str):
+        points = dict(zip(answers, make_record().points))
+        self.score += sum(points[word] for word in guesses.split())
+
+    def get_ranking(self) -> str:
+        return nyt_ranking(self.score, 45)
+
+
+def make_record(day: str = "2022-01-01") -> PuzzleRecord:
+    puzzle = SimpleNamespace(day=day,
+                             answers=set(answers),
+                             center="a",
+                             outside=["l", "e", "r", "t", "n", "p"],
+                             image=b"\x89PNG",
+                             image_file_type="png")
+    return PuzzleRecord(
+        puzzle, answers, {word: i
+                          for i, word in enumerate(answers)},
+        tuple(score_word(word, len(set(word)) == 7) for word in answers),
+        (("🍳", ), ("🍳", ), ("👍", ), ("👍", ), ("👍", ), ("👍", )),
+        (("🤝", ), ) * len(answers),
+        tuple(sorted(range(len(answers)), key=lambda i: answers[i])),
+        tuple((round(45 * fraction), name) for name, fraction in nyt_rankings))
+
+
+class CompactSessionTest(TestCase):
+
+    def setUp(self):
+        self.record = make_record()
+        self.session = CompactSession("session", self.record)
+
+    def test_points(self):
+        self.assertEqual(self.record.points, (14, 14, 5, 5, 6, 1))
+        self.assertEqual(self.record.total_points, 45)
+
+    def test_respond_to_guesses(self):
+        self.assertEqual(self.session.respond_to_guesses("plan Planter"),
+                         ["👍", "🍳"])
+        self.assertEqual(self.session.respond_to_guesses("plan pelt plan"),
+                         ["🤝", "🤝"])
+        self.assertEqual(self.session.gotten, 0b100010)
+        self.assertEqual(self.session.gotten_words, ["planter", "plan"])
+        self.assertEqual(self.session.score, 15)
+
+    def test_unguessed_words(self):
+        self.session.respond_to_guesses("alert planet")
+        self.assertEqual(self.session.get_unguessed_words(),
+                         ["replant", "planter", "later", "plan"])
+
+    def test_list_gotten_words(self):
+        self.assertEqual(self.session.list_gotten_words(), "")
+        self.session.respond_to_guesses("plan alert")
+        self.assertEqual(self.session.list_gotten_words(("||", "||")),
+                         "||alert||, ||plan||")
+
+    def test_ranking(self):
+        self.assertEqual(self.session.get_ranking(), "Beginner")
+        self.session.respond_to_guesses("plan")
+        self.assertEqual(self.session.get_ranking(), "Good Start")
+        self.session.respond_to_guesses("replant")
+        self.assertEqual(self.session.get_ranking(), "Nice")
+        self.session.respond_to_guesses(" ".join(answers[1:]))
+        self.assertEqual(self.session.get_ranking(), "Queen Bee")
+
+    def test_probe_rankings(self):
+        RankingSession.probes = 0
+        with patch("compact_session.SessionBee", RankingSession):
+            rankings = probe_rankings(None, answers, self.record.points)
+        probed = dataclasses.replace(self.record, rankings=rankings)
+        # every set of answers ranks the same as with the NYT's thresholds
+        for gotten in range(1 << len(answers)):
+            session = CompactSession("session", probed, gotten)
+            self.assertEqual(session.get_ranking(),
+                             nyt_ranking(session.score, 45))
+        # fewer sessions are probed than there are possible scores
+        self.assertLess(RankingSession.probes, 30)
+
+    def test_bytes(self):
+        self.session.respond_to_guesses(" ".join(answers))
+        self.assertEqual(self.session.gotten_bytes(), b"\x3f")
+        self.assertEqual(
+            CompactSession.gotten_from_bytes(self.session.gotten_bytes()),
+            self.session.gotten)
+
+    def test_metadata(self):
+        self.assertEqual(self.session.metadata, {})
+        self.session.metadata = {"status_message_id": 1234}
+        self.assertEqual(self.session.status_message_id, 1234)
+        self.assertEqual(self.session.metadata, {"status_message_id": 1234})
+
+    def test_unsaved(self):
+        self.session.respond_to_guesses("plan alert plan", 10)
+        self.session.respond_to_guesses("alert later", 11)
+        self.assertEqual([(g.word, g.message_id)
+                          for g in self.session.take_unsaved()],
+                         [("plan", 10), ("alert", 10), ("later", 11)])
+        self.assertEqual(self.session.take_unsaved(), [])
+        self.session.replay(["replant", "unknown"])
+        self.assertEqual(self.session.gotten_words,
+                         ["replant", "alert", "later", "plan"])
+        self.assertEqual(self.session.unsaved, [])
+
+    def test_hints(self):
+        self.session.respond_to_guesses("plan")
+        hints = self.session.get_unguessed_hints()
+        self.assertEqual(hints.gotten, self.session.gotten)
+        # the view is kept, and updated as answers are gotten
+        self.session.respond_to_guesses("alert plan")
+        self.session.replay(["later"])
+        self.assertIs(self.session.get_unguessed_hints(), hints)
+        self.assertEqual(hints.gotten, self.session.gotten)
+        self.assertIs(self.record.hints, hints.chart)
+
+    def test_copy_shares_record(self):
+        snapshot = copy.deepcopy(self.session)
+        self.session.respond_to_guesses("plan")
+        self.assertIs(snapshot.record, self.record)
+        self.assertEqual(snapshot.gotten, 0)
+        self.assertEqual(snapshot.day, "2022-01-01")
+
+
+class BeeEngineParityTest(IsolatedAsyncioTestCase):
+    """Checks CompactSession against a SessionBee of the current NYT puzzle."""
+
+    async def asyncSetUp(self):
+        self.puzzle = await SpellingBee.fetch_from_nyt()
+        self.record = PuzzleRecord.from_puzzle(self.puzzle)
+
+    async def test_guesses(self):
+        rng = random.Random(0)
+        for _ in range(5):
+            bee = SessionBee(self.puzzle)
+            session = CompactSession.new(self.record)
+            order = rng.sample(self.record.answers, len(self.record.answers))
+            # (with some of them guessed again at the end)
+            for word in order + order[:3]:
+                self.assertEqual(session.respond_to_guesses(word),
+                                 bee.respond_to_guesses(word))
+                self.assertEqual(session.get_ranking(), bee.get_ranking())
+                self.assertEqual(session.list_gotten_words(("||", "||")),
+                                 bee.list_gotten_words(("||", "||")))
+                self.assertEqual(
+                    session.get_unguessed_words(),
+                    [word.lower() for word in bee.get_unguessed_words()])
+
+    async def test_hints(self):
+        bee = SessionBee(self.puzzle)
+        session = CompactSession.new(self.record)
+        for word in self.record.answers[:5]:
+            bee.respond_to_guesses(word)
+            session.respond_to_guesses(word)
+            self.assertEqual(
+                session.get_unguessed_hints().format_all_for_discord(),
+                bee.get_unguessed_hints().format_all_for_discord())
+
+    async def test_from_session_bee(self):
+        bee = SessionBee(self.puzzle)
+        bee.respond_to_guesses(" ".join(self.record.answers[::2]))
+        session = CompactSession.from_session_bee(bee, self.record)
+        self.assertEqual(session.get_ranking(), bee.get_ranking())
+        self.assertEqual(session.list_gotten_words(),
+                         bee.list_gotten_words())
+
+
+class CompactStorageTest(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.storage = Storage(str(Path(self.tempdir.name) / "schedule.db"),
+                               str(Path(self.tempdir.name) / "bee.db"))
+        self.record = make_record()
+        self.storage._records[self.record.day] = self.record
+
+    def tearDown(self):
+        self.storage.close()
+        self.tempdir.cleanup()
+
+    async def test_round_trip(self):
+        posts = [
+            ScheduledPost(guild_id=-i, channel_id=-i, timing=7)
+            for i in range(1, 4)
+        ]
+        started = await self.storage.start_sessions(posts,
+                                                    self.record.puzzle)
+        self.assertEqual([old for _, old in started], [None] * 3)
+        bee, _ = started[0]
+        self.assertEqual(posts[0].current_session, bee.session_id)
+        bee.respond_to_guesses("planet alert")
+        await self.storage.set_session_metadata(bee,
+                                                {"status_message_id": 5})
+        # (setting the metadata doesn't save guesses)
+        loaded = await self.storage.read_session(bee.session_id)
+        self.assertEqual(loaded.gotten, 0)
+        self.assertEqual(loaded.status_message_id, 5)
+        await self.storage.save_sessions([bee])
+        loaded = await self.storage.read_session(bee.session_id)
+        self.assertIs(loaded.record, self.record)
+        self.assertEqual(loaded.gotten, bee.gotten)
+        self.assertEqual(loaded.status_message_id, 5)
+
+        others = [
+            await self.storage.read_session(s.session_id) for s, _ in started
+        ]
+        for other in others:
+            other.respond_to_guesses("plan")
+        await self.storage.save_sessions(others)
+        reloaded = await asyncio.gather(
+            *(self.storage.read_session(s.session_id) for s, _ in started))
+        self.assertEqual([s.gotten_words for s in reloaded],
+                         [["alert", "planet", "plan"], ["plan"], ["plan"]])
+
+    async def test_missing_session(self):
+        self.assertIsNone(await self.storage.read_session("missing"))
+
+    async def start(self) -> CompactSession:
+        post = ScheduledPost(guild_id=-1, channel_id=-1, timing=7)
+        (bee, _), = await self.storage.start_sessions([post],
+                                                      self.record.puzzle)
+        return bee
+
+    async def test_compaction(self):
+        bee = await self.start()
+        bee.respond_to_guesses("plan alert", 1)
+        await self.storage.save_sessions([bee])
+        self.assertEqual(await self.storage.compact_guess_log(3), 0)
+        bee.respond_to_guesses("later", 2)
+        await self.storage.save_sessions([bee])
+        self.assertEqual(await self.storage.compact_guess_log(3), 1)
+        # the snapshot has everything logged so far, so there's nothing left
+        # to compact
+        self.assertEqual(await self.storage.compact_guess_log(1), 0)
+        bee.respond_to_guesses("planet", 3)
+        await self.storage.save_sessions([bee])
+        loaded = await self.storage.read_session(bee.session_id)
+        self.assertEqual(loaded.gotten, bee.gotten)
+        # the log is still all there
+        guesses = await self.storage.get_guesses(bee.session_id)
+        self.assertEqual([(g.word, g.message_id) for g in guesses],
+                         [("plan", 1), ("alert", 1), ("later", 2),
+                          ("planet", 3)])
+
+    async def test_recovery(self):
+        bees = []
+        for i in range(1, 201):
+            post = ScheduledPost(guild_id=-i, channel_id=-i, timing=7)
+            (bee, _), = await self.storage.start_sessions([post],
+                                                          self.record.puzzle)
+            bees.append(bee)
+        for word in answers:
+            for bee in bees:
+                bee.respond_to_guesses(word)
+            await self.storage.save_sessions(bees)
+        # (a restarted process, with nothing but the database)
+        restarted = Storage(str(Path(self.tempdir.name) / "schedule.db"),
+                            str(Path(self.tempdir.name) / "bee.db"))
+        restarted._records[self.record.day] = self.record
+        try:
+            started = time.perf_counter()
+            loaded = [
+                await restarted.read_session(bee.session_id) for bee in bees
+            ]
+            elapsed = time.perf_counter() - started
+        finally:
+            restarted.close()
+        self.assertTrue(all(x.gotten == 0b111111 for x in loaded))
+        self.assertLess(elapsed, 10)
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase
+
+from daily_puzzle import PuzzlePipeline
+from fetching import FetchError, PuzzleFetcher, StubSource
+from models import tz
+
+
+class MemoryStorage:
+    """Keeps puzzles the way Storage keeps them in the bee database."""
+    bee_db = "bee.db"
+
+    def __init__(self, *puzzles):
+        self.puzzles = {puzzle.day: puzzle for puzzle in puzzles}
+
+    async def load_puzzle(self, day=None):
+        if day is None:
+            return self.puzzles[max(self.puzzles)] if self.puzzles else None
+        return self.puzzles.get(day)
+
+    async def save_puzzle(self, bee):
+        self.puzzles[bee.day] = bee
+
+
+class RecordingRenderer:
+    last_duration = 0
+    last_max_lag = 0
+
+    def __init__(self):
+        self.rendered = []
+
+    async def render(self, day, db_path):
+        self.rendered.append(day)
+
+
+class PuzzlePipelineTest(IsolatedAsyncioTestCase):
+
+    def make_pipeline(self, results, *saved):
+        self.storage = MemoryStorage(*saved)
+        self.renderer = RecordingRenderer()
+        fetcher = PuzzleFetcher(StubSource(results), max_attempts=2,
+                                base_delay=0.01)
+        return PuzzlePipeline(self.storage, fetcher, self.renderer)
+
+    async def test_late_puzzle(self):
+        day = datetime.now(tz=tz).strftime("%Y-%m-%d")
+        today = SimpleNamespace(day=day)
+        yesterday = SimpleNamespace(day="2022-08-01")
+        pipeline = self.make_pipeline(
+            [ConnectionError(), yesterday, today], yesterday)
+        ready = asyncio.get_running_loop().create_future()
+        late = []
+
+        def on_fallback(bee):
+            # the day's posts are still waiting for the real puzzle
+            self.assertFalse(ready.done())
+            late.append(bee)
+
+        await asyncio.wait_for(
+            pipeline.ensure(day, ready.set_result, on_fallback), 5)
+        self.assertEqual(late, [yesterday])
+        self.assertIs(await asyncio.wait_for(ready, 1), today)
+        self.assertIs(self.storage.puzzles[day], today)
+        self.assertEqual(self.renderer.rendered, [day])
+
+    async def test_no_fallback_without_callback(self):
+        day = datetime.now(tz=tz).strftime("%Y-%m-%d")
+        today = SimpleNamespace(day=day)
+        pipeline = self.make_pipeline([ConnectionError(), ConnectionError(),
+                                       today],
+                                      SimpleNamespace(day="2022-08-01"))
+        puzzles = []
+        await asyncio.wait_for(pipeline.ensure(day, puzzles.append), 5)
+        self.assertEqual(puzzles, [today])
+
+    async def test_day_over(self):
+        pipeline = self.make_pipeline([ConnectionError()],
+                                      SimpleNamespace(day="2022-08-01"))
+        puzzles = []
+        with self.assertRaises(FetchError):
+            await asyncio.wait_for(
+                pipeline.ensure("2022-08-02", puzzles.append, puzzles.append),
+                5)
+        self.assertEqual(puzzles, [])
+        self.assertEqual(self.renderer.rendered, [])
+
+    async def test_existing_puzzle(self):
+        today = SimpleNamespace(day="2022-08-02")
+        pipeline = self.make_pipeline([ConnectionError()], today)
+        puzzles = []
+        await pipeline.ensure(today.day, puzzles.append)
+        self.assertEqual(puzzles, [today])
+        self.assertEqual(pipeline.fetcher.source.calls, 0)
@@ -0,0 +1,58 @@
+import asyncio
+from io import BytesIO
+import time
+from unittest import IsolatedAsyncioTestCase
+
+import disnake as discord
+
+from test.fake_discord import FakeAPI, FakeDiscord
+
+
+class FakeDiscordTest(IsolatedAsyncioTestCase):
+
+    async def test_latency(self):
+        fake = FakeDiscord(1, FakeAPI(latency=0.05))
+        [channel] = fake.channels.values()
+        start = time.perf_counter()
+        message = await channel.send("hello")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.assertIs(channel.get_partial_message(message.id), message)
+        self.assertEqual(fake.api.requests, {"send_message": 1})
+
+    async def test_rate_limit_waits(self):
+        fake = FakeDiscord(1, FakeAPI(rate_limit=5))
+        [channel] = fake.channels.values()
+        start = time.perf_counter()
+        await asyncio.gather(*(channel.send(str(i)) for i in range(8)))
+        self.assertGreaterEqual(time.perf_counter() - start, 0.9)
+        self.assertEqual(len(channel.sent), 8)
+        self.assertGreaterEqual(fake.api.rate_limited, 3)
+
+    async def test_rate_limit_raises(self):
+        fake = FakeDiscord(1, FakeAPI(rate_limit=1, raise_on_429=True))
+        [channel] = fake.channels.values()
+        await channel.send("first")
+        with self.assertRaises(discord.HTTPException) as raised:
+            await channel.send("second")
+        self.assertEqual(raised.exception.status, 429)
+
+    async def test_upload_attachment(self):
+        fake = FakeDiscord(1)
+        [channel] = fake.channels.values()
+        message = await channel.send("puzzle",
+                                     file=discord.File(BytesIO(b"\x89PNG"),
+                                                       filename="bee.png"))
+        self.assertTrue(message.attachments[0].url.endswith("/bee.png"))
+
+    async def test_install(self):
+        fake = FakeDiscord(2)
+        client = discord.Client()
+        with fake.install(client):
+            self.assertEqual(len(client.guilds), 2)
+            [channel_id, _] = fake.channels
+            self.assertIs(client.get_channel(channel_id),
+                          fake.channels[channel_id])
+            with self.assertRaises(discord.NotFound):
+                await client.fetch_channel(-5)
+        self.assertEqual(client.guilds, [])
+        await client.close()
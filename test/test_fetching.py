@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from fetching import FetchError, PuzzleFetcher, StubSource
+
+today = SimpleNamespace(day="2022-08-02")
+yesterday = SimpleNamespace(day="2022-08-01")
+
+
+class PuzzleFetcherTest(IsolatedAsyncioTestCase):
+
+    async def test_retries(self):
+        source = StubSource([ConnectionError(), yesterday, today])
+        fetcher = PuzzleFetcher(source, base_delay=0.01)
+        self.assertIs(await fetcher.fetch(today.day), today)
+        self.assertEqual(source.calls, 3)
+        self.assertEqual(fetcher.stats.attempts, 3)
+        self.assertEqual(fetcher.stats.failures, 2)
+        self.assertEqual(len(fetcher.stats.latencies), 3)
+
+    async def test_gives_up(self):
+        source = StubSource([ConnectionError()])
+        fetcher = PuzzleFetcher(source, max_attempts=3, base_delay=0.01)
+        with self.assertRaises(FetchError):
+            await fetcher.fetch(today.day)
+        self.assertEqual(source.calls, 3)
+        self.assertEqual(fetcher.stats.failures, 3)
+
+    async def test_timeout(self):
+        source = StubSource([today], delay=1)
+        fetcher = PuzzleFetcher(source, max_attempts=2, base_delay=0.01, timeout=0.05)
+        with self.assertRaises(FetchError):
+            await fetcher.fetch(today.day)
+        self.assertLess(fetcher.stats.mean_latency, 0.5)
+
+
+class BackoffTest(TestCase):
+
+    def test_delays(self):
+        fetcher = PuzzleFetcher(StubSource([today]), base_delay=5, max_delay=60)
+        for attempt, ceiling in [(1, 5), (2, 10), (3, 20), (4, 40), (5, 60), (9, 60)]:
+            delay = fetcher.get_delay(attempt)
+            self.assertGreaterEqual(delay, ceiling / 2)
+            self.assertLessEqual(delay, ceiling)
@@ -0,0 +1,58 @@
+from unittest import TestCase
+
+from hint_chart import HintChart
+
+answers = ("replant", "planter", "alert", "later", "planet", "plan")
+
+
+class HintChartTest(TestCase):
+
+    def setUp(self):
+        self.formatted = []
+        self.chart = HintChart(answers, self.format_hints)
+
+    def format_hints(self, gotten: int) -> str:
+        # (stands in for bee_engine's chart)
+        self.formatted.append(gotten)
+        return f"hints without {gotten:06b}"
+
+    def test_unguessed(self):
+        hints = self.chart.unguessed(0b000011)
+        hints.remove(answers.index("plan"))
+        self.assertEqual(hints.gotten, 0b100011)
+        # the same as a view built from scratch
+        rebuilt = self.chart.unguessed(0b100011)
+        self.assertEqual(hints.format_all_for_discord(),
+                         rebuilt.format_all_for_discord())
+        self.assertEqual(self.formatted, [0b100011])
+
+    def test_format(self):
+        self.assertEqual(
+            self.chart.unguessed(0b000001).format_all_for_discord(),
+            "hints without 000001")
+        self.assertEqual(self.formatted, [0b000001])
+
+    def test_formatted_once_per_version(self):
+        hints = self.chart.unguessed()
+        first = hints.format_all_for_discord()
+        self.assertIs(hints.format_all_for_discord(), first)
+        hints.remove(0)
+        self.assertEqual(hints.format_all_for_discord(), "hints without 000001")
+        self.assertEqual(self.formatted, [0, 0b000001])
+
+    def test_shared_between_views(self):
+        # views that have gotten the same answers share the chart's text
+        first = self.chart.unguessed(0b000101)
+        second = self.chart.unguessed(0b000100)
+        second.remove(0)
+        self.assertIs(first.format_all_for_discord(),
+                      second.format_all_for_discord())
+        self.assertEqual(self.formatted, [0b000101])
+
+    def test_cache_size(self):
+        self.chart.cache_size = 2
+        for gotten in (1, 2, 3, 1):
+            self.chart.format(gotten)
+        self.assertEqual(self.formatted, [1, 2, 3, 1])
+        self.chart.format(3)
+        self.assertEqual(len(self.formatted), 4)
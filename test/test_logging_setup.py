@@ -0,0 +1,95 @@
+import atexit
+import json
+import logging
+from logging import getLogger
+from pathlib import Path
+import tempfile
+from unittest import TestCase
+
+from logging_setup import JSONFormatter, LoggingConfig, setup_logging
+
+
+class JSONFormatterTest(TestCase):
+
+    def test_includes_data(self):
+        record = logging.LogRecord("BeeBot.External", logging.INFO, __file__,
+                                   1, "incoming %s", ("message", ), None)
+        record.data = {"guild": "Bees", "content": "<@1> ✨ pickle"}
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry["message"], "incoming message")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["guild"], "Bees")
+        self.assertEqual(entry["content"], "<@1> ✨ pickle")
+        self.assertIn("time", entry)
+
+
+class SetupLoggingTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.logger_names = ("discord", "BeeBot.Internal", "BeeBot.External",
+                             "sqlalchemy.engine")
+        self.saved = {
+            name: (getLogger(name).level, list(getLogger(name).handlers))
+            for name in self.logger_names
+        }
+
+        class Config(LoggingConfig):
+            log_dir = self.tempdir.name
+            max_bytes = 2000
+            backup_count = 2
+            stdout_level = logging.CRITICAL
+
+        self.listener = setup_logging("test", Config)
+
+    def tearDown(self):
+        self.listener.stop()
+        atexit.unregister(self.listener.stop)
+        for handler in self.listener.handlers:
+            handler.close()
+        for name, (level, handlers) in self.saved.items():
+            logger = getLogger(name)
+            logger.setLevel(level)
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+            for handler in handlers:
+                logger.addHandler(handler)
+        self.tempdir.cleanup()
+
+    def read_log(self, name: str) -> str:
+        self.listener.stop()
+        atexit.unregister(self.listener.stop)
+        self.listener.start()
+        return (Path(self.tempdir.name) / f"{name}.test.log").read_text()
+
+    def test_routes_records(self):
+        getLogger("BeeBot.Internal").info("internal")
+        getLogger("BeeBot.External").info("external",
+                                          extra={"data": {
+                                              "guild": "Bees"
+                                          }})
+        getLogger("discord.gateway").debug("gateway")
+        internal_log = self.read_log("BeeBot")
+        self.assertIn("INFO internal", internal_log)
+        self.assertNotIn("external", internal_log)
+        [line] = self.read_log("communication").splitlines()
+        self.assertEqual(json.loads(line)["guild"], "Bees")
+        self.assertIn("gateway", self.read_log("discord"))
+
+    def test_sql_level(self):
+        # (LoggingConfig.sql_level leaves out the INFO statement log)
+        getLogger("sqlalchemy.engine.Engine").info("SELECT 1")
+        getLogger("sqlalchemy.engine.Engine").warning("locked")
+        sql_log = self.read_log("sql")
+        self.assertNotIn("SELECT 1", sql_log)
+        self.assertIn("locked", sql_log)
+
+    def test_rotation(self):
+        for i in range(100):
+            getLogger("BeeBot.Internal").info(f"message number {i}")
+        self.read_log("BeeBot")
+        rotated = sorted(
+            x.name for x in Path(self.tempdir.name).glob("BeeBot.test.log*"))
+        self.assertEqual(
+            rotated,
+            ["BeeBot.test.log", "BeeBot.test.log.1", "BeeBot.test.log.2"])
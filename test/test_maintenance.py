@@ -0,0 +1,98 @@
+from datetime import datetime
+from pathlib import Path
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from sqlalchemy.orm import Session
+
+from maintenance import (count_rows, delete_orphaned_posts,
+                         delete_stale_sessions, prune_archives, vacuum)
+from models import GuessLog, ScheduledPost, SessionProgress, create_db, tz
+
+
+class MaintenanceTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tempdir.name) / "schedule.db")
+        self.engine = create_db(self.db_path)
+        with Session(self.engine) as session:
+            session.add_all(
+                ScheduledPost(guild_id=i, channel_id=i, timing=7)
+                for i in range(1, 1001)
+            )
+            session.commit()
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tempdir.cleanup()
+
+    def test_delete_orphaned_posts(self):
+        current_guilds = set(range(1, 11))
+        deleted = delete_orphaned_posts(self.engine, current_guilds, batch_size=100)
+        self.assertEqual(deleted, 990)
+        self.assertEqual(count_rows(self.db_path), 10)
+        with Session(self.engine) as session:
+            remaining = set(x.guild_id for x in session.query(ScheduledPost))
+        self.assertEqual(remaining, current_guilds)
+
+    def test_no_guilds(self):
+        # an empty guild list isn't trusted
+        self.assertEqual(delete_orphaned_posts(self.engine, set()), 0)
+        self.assertEqual(count_rows(self.db_path), 1000)
+
+    def test_vacuum(self):
+        delete_orphaned_posts(self.engine, {1})
+        size = Path(self.db_path).stat().st_size
+        vacuum(self.db_path)
+        self.assertLess(Path(self.db_path).stat().st_size, size)
+
+    def test_delete_stale_sessions(self):
+        today = datetime.now(tz=tz).strftime("%Y-%m-%d")
+        days = {"current": "2022-01-01", "recent": today,
+                "old": "2022-01-01", "older": "2022-01-01"}
+        with Session(self.engine) as session:
+            session.query(ScheduledPost).filter(
+                ScheduledPost.guild_id == 1).one().current_session = "current"
+            session.add_all(
+                SessionProgress(session_id=session_id, day=day, gotten=b"\x00")
+                for session_id, day in days.items())
+            session.add_all(
+                GuessLog(session_id=session_id, word="plan", guessed_at=0)
+                for session_id in ("current", "recent", "old"))
+            session.commit()
+        archive_dir = Path(self.tempdir.name) / "archive"
+        self.assertEqual(
+            delete_stale_sessions(self.engine, 7, str(archive_dir)), 2)
+        with Session(self.engine) as session:
+            remaining = [x.session_id for x in session.query(SessionProgress)]
+            logged = [x.session_id for x in session.query(GuessLog)]
+        self.assertEqual(sorted(remaining), ["current", "recent"])
+        self.assertEqual(sorted(logged), ["current", "recent"])
+        # the deleted rows are in the archive
+        [archive] = archive_dir.iterdir()
+        with sqlite3.connect(archive) as db:
+            archived = db.execute(
+                "SELECT session_id FROM session_progress").fetchall()
+            archived_log = db.execute(
+                "SELECT session_id FROM guess_log").fetchall()
+        db.close()
+        self.assertEqual(sorted(archived), [("old", ), ("older", )])
+        self.assertEqual(archived_log, [("old", )])
+        # and nothing is written when there's nothing to delete
+        self.assertEqual(
+            delete_stale_sessions(self.engine, 7, str(archive_dir)), 0)
+        self.assertEqual(len(list(archive_dir.iterdir())), 1)
+
+    def test_prune_archives(self):
+        archive_dir = Path(self.tempdir.name) / "archive"
+        archive_dir.mkdir()
+        names = [f"bee-2022-08-0{day}-{1659000000 + day}.db"
+                 for day in range(1, 6)]
+        for name in [*names, "notes.txt"]:
+            (archive_dir / name).touch()
+        self.assertEqual(prune_archives(str(archive_dir), "bee", 2), 3)
+        self.assertEqual(sorted(x.name for x in archive_dir.iterdir()),
+                         [*names[-2:], "notes.txt"])
+        self.assertEqual(prune_archives(str(archive_dir), "bee", 2), 0)
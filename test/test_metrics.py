@@ -0,0 +1,107 @@
+import asyncio
+import socket
+import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+import aiohttp
+
+from metrics import (BotMetrics, Histogram, LagMonitor, SlotMetrics,
+                     StartupTimings, time_imports)
+
+
+class SlotMetricsTest(TestCase):
+
+    def test_throughput(self):
+        metrics = SlotMetrics(timing=7, posts=3, due=time.time() - 2)
+        self.assertIsNone(metrics.time_to_last_post)
+        self.assertIsNone(metrics.posts_per_second)
+        for _ in range(3):
+            metrics.record_sent()
+        self.assertAlmostEqual(metrics.time_to_last_post, 2, delta=0.1)
+        self.assertAlmostEqual(metrics.posts_per_second, 1.5, delta=0.1)
+        self.assertIn("sent 3 of 3", str(metrics))
+
+
+class StartupTimingsTest(TestCase):
+
+    def test_timings(self):
+        timings = StartupTimings(time.perf_counter() - 1,
+                                 time_imports(["json", "csv"]))
+        self.assertEqual(list(timings.imports), ["json", "csv"])
+        timings.record_ready()
+        self.assertTrue(timings.record_interaction())
+        self.assertFalse(timings.record_interaction())
+        self.assertGreaterEqual(timings.first_interaction, timings.ready)
+        self.assertGreaterEqual(timings.ready, 1)
+        self.assertIn("imports: json", str(timings))
+        self.assertIn("first interaction handled after", str(timings))
+
+
+class LagMonitorTest(IsolatedAsyncioTestCase):
+
+    async def test_detects_blocking(self):
+        async with LagMonitor(interval=0.005) as monitor:
+            await asyncio.sleep(0.05)
+            time.sleep(0.1)
+            await asyncio.sleep(0.05)
+        self.assertGreaterEqual(monitor.max_lag, 0.05)
+        self.assertLess(monitor.percentile(50), 0.05)
+
+
+class HistogramTest(TestCase):
+
+    def test_buckets(self):
+        histogram = Histogram("test_seconds",
+                              "Test", ("stage", ),
+                              buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value, "scoring")
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{stage="scoring",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{stage="scoring",le="1"} 3', lines)
+        self.assertIn('test_seconds_bucket{stage="scoring",le="+Inf"} 4',
+                      lines)
+        self.assertIn('test_seconds_count{stage="scoring"} 4', lines)
+        self.assertIn('test_seconds_sum{stage="scoring"} 2.65', lines)
+
+
+class BotMetricsTest(IsolatedAsyncioTestCase):
+
+    async def test_disabled(self):
+        metrics = BotMetrics(enabled=False)
+        with metrics.time("scoring"):
+            pass
+        metrics.count_post(7, sent=True)
+        await metrics.start("127.0.0.1", 0)
+        self.assertEqual(metrics.stages.counts, {})
+        self.assertEqual(metrics.posts.values, {})
+        self.assertIsNone(metrics._runner)
+        await metrics.stop()
+
+    async def test_endpoint(self):
+        metrics = BotMetrics(enabled=True)
+        metrics.add_gauge("test_sessions", "Sessions", lambda: 3)
+        metrics.add_counter("test_edits_saved_total", "Edits saved", lambda: 5)
+        with metrics.time("scoring"):
+            pass
+        metrics.count_post(7, sent=True)
+        metrics.count_post(7, sent=False)
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        await metrics.start("127.0.0.1", port)
+        try:
+            await asyncio.sleep(0.15)
+            async with aiohttp.ClientSession() as session:
+                async with session.get(
+                        f"http://127.0.0.1:{port}/metrics") as response:
+                    text = await response.text()
+        finally:
+            await metrics.stop()
+        self.assertIn('beebot_stage_seconds_count{stage="scoring"} 1', text)
+        self.assertIn('beebot_posts_total{timing="7",result="sent"} 1', text)
+        self.assertIn('beebot_posts_total{timing="7",result="failed"} 1', text)
+        self.assertIn("test_sessions 3", text)
+        self.assertIn("# TYPE test_edits_saved_total counter", text)
+        self.assertIn("test_edits_saved_total 5", text)
+        self.assertIn("beebot_event_loop_lag_seconds_count", text)
@@ -1,5 +1,12 @@
-from datetime import timedelta
-from models import hourable, ScheduledPost, tz
+from datetime import datetime, timedelta
+from pathlib import Path
+import random
+import sqlite3
+import tempfile
+from models import (create_db, get_next_timestamps, hourable, legacy_profile,
+                    PostRow, ScheduledPost, shard_for, StorageProfile, tz)
+from sqlalchemy import inspect
+from sqlalchemy.pool import NullPool, QueuePool
 import unittest
 from unittest import TestCase
 
@@ -87,5 +94,157 @@ class ScheduledPostTest(TestCase):
             prev = next
 
 
+class PostRowTest(TestCase):
+
+    def test_from_post(self):
+        post = ScheduledPost(guild_id=1,
+                             channel_id=2,
+                             timing=7,
+                             current_session="abc")
+        row = PostRow.from_post(post)
+        self.assertEqual(row, (1, 2, 7, "abc"))
+        self.assertEqual(row.timing, 7)
+        with self.assertRaises(AttributeError):
+            row.__dict__
+
+
+class ShardTest(TestCase):
+
+    def test_shard_for(self):
+        # only the timestamp part of the ID (above the lowest 22 bits) counts
+        self.assertEqual(shard_for((5 << 22) + 12345, 4), 1)
+        guild_ids = [(n << 22) + n for n in range(100)]
+        shards = [shard_for(guild_id, 4) for guild_id in guild_ids]
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+
+
+class NextTimestampsTest(TestCase):
+
+    def assertMatchesPosts(self, timings, starting_from=None):
+        timestamps = get_next_timestamps(timings, starting_from)
+        self.assertEqual(len(timestamps), len(timings))
+        for timing, timestamp in zip(timings, timestamps):
+            post = ScheduledPost(guild_id=-1, channel_id=-1, timing=timing)
+            self.assertEqual(
+                post.get_next_time(starting_from).timestamp(), timestamp)
+
+    def test_matches_get_next_time(self):
+        random.seed(0)
+        timings = [random.uniform(0, 24) for _ in range(100)]
+        timings += [0, 1, 1.5, 2, 2.5, 3, 3.5, 7, 12, 16, 20, 23.999]
+        for starting_from in [
+                hourable(2022, 1, 1, 0, 0, tzinfo=tz),
+                hourable(2022, 3, 13, 1, 59, tzinfo=tz),
+                hourable(2022, 3, 13, 3, 0, tzinfo=tz),
+                hourable(2022, 11, 6, 1, 30, tzinfo=tz),
+                hourable(2022, 11, 6, 1, 30, fold=1, tzinfo=tz),
+                hourable(2022, 11, 5, 23, 59, 59, tzinfo=tz),
+        ]:
+            self.assertMatchesPosts(timings, starting_from)
+
+    def test_now(self):
+        now = datetime.now(tz=tz).timestamp()
+        for timestamp in get_next_timestamps([3.5, 7, 12, 16, 20]):
+            self.assertGreater(timestamp, now)
+            self.assertLessEqual(timestamp, now + 25 * 60 * 60)
+
+    def test_dst(self):
+        before_leap_ahead = hourable(2022, 3, 12, 3, 30, tzinfo=tz)
+        before_fall_back = hourable(2022, 11, 5, 3, 30, tzinfo=tz)
+        self.assertEqual(
+            get_next_timestamps([3.5], before_leap_ahead)[0] -
+            before_leap_ahead.timestamp(), 23 * 60 * 60)
+        self.assertEqual(
+            get_next_timestamps([3.5], before_fall_back)[0] -
+            before_fall_back.timestamp(), 25 * 60 * 60)
+
+        # one result for each day over a whole year and then some, including
+        # for 1am, which happens twice on November 6th 2022
+        prev = hourable(2022, 1, 1, 3, tzinfo=tz).timestamp()
+        for _ in range(400):
+            [next] = get_next_timestamps([1], datetime.fromtimestamp(prev, tz))
+            self.assertEqual(
+                (datetime.fromtimestamp(prev, tz) + timedelta(days=1)).day,
+                datetime.fromtimestamp(next, tz).day)
+            prev = next
+
+
+class CreateDBTest(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.db_path = str(Path(self.tempdir.name) / "schedule.db")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_indexes(self):
+        engine = create_db(self.db_path)
+        indexes = {
+            x["name"]: x
+            for x in inspect(engine).get_indexes("schedule")
+        }
+        self.assertTrue(indexes["ix_schedule_guild_id"]["unique"])
+        self.assertEqual(indexes["ix_schedule_guild_channel"]["column_names"],
+                         ["guild_id", "channel_id"])
+        engine.dispose()
+
+    def get_pragma(self, engine, name):
+        with engine.connect() as connection:
+            return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+    def test_storage_profile(self):
+        profile = StorageProfile(mmap_size=2**20, cache_size=-4096)
+        profile.prepare(self.db_path)
+        engine = create_db(self.db_path, profile)
+        self.assertEqual(self.get_pragma(engine, "journal_mode"), "wal")
+        # 1 is NORMAL
+        self.assertEqual(self.get_pragma(engine, "synchronous"), 1)
+        self.assertEqual(self.get_pragma(engine, "mmap_size"), 2**20)
+        self.assertEqual(self.get_pragma(engine, "cache_size"), -4096)
+        self.assertIsInstance(engine.pool, QueuePool)
+        # the pragmas apply to connections besides the first one, too
+        with engine.connect() as first, engine.connect() as second:
+            for connection in (first, second):
+                self.assertEqual(
+                    connection.exec_driver_sql("PRAGMA synchronous").scalar(),
+                    1)
+        engine.dispose()
+
+    def test_legacy_profile(self):
+        legacy_profile.prepare(self.db_path)
+        engine = create_db(self.db_path, legacy_profile)
+        self.assertEqual(self.get_pragma(engine, "journal_mode"), "delete")
+        # 2 is FULL
+        self.assertEqual(self.get_pragma(engine, "synchronous"), 2)
+        self.assertIsInstance(engine.pool, NullPool)
+        engine.dispose()
+
+    def test_migrates_old_table(self):
+        with sqlite3.connect(self.db_path) as db:
+            db.execute("CREATE TABLE schedule (id INTEGER PRIMARY KEY, "
+                       "guild_id BIGINT NOT NULL, channel_id BIGINT NOT NULL, "
+                       "current_session VARCHAR, timing FLOAT NOT NULL)")
+            db.executemany(
+                "INSERT INTO schedule (guild_id, channel_id, timing) "
+                "VALUES (?, ?, ?)", [(1, 1, 7), (1, 2, 12), (2, 3, 3)])
+        db.close()
+        engine = create_db(self.db_path)
+        index_names = set(x["name"]
+                          for x in inspect(engine).get_indexes("schedule"))
+        self.assertIn("ix_schedule_guild_id", index_names)
+        self.assertIn("ix_schedule_guild_channel", index_names)
+        self.assertIn("ix_schedule_session_day_timing", index_names)
+        column_names = set(x["name"]
+                           for x in inspect(engine).get_columns("schedule"))
+        self.assertIn("session_day", column_names)
+        with engine.connect() as connection:
+            rows = connection.exec_driver_sql(
+                "SELECT guild_id, channel_id FROM schedule ORDER BY guild_id"
+            ).fetchall()
+        self.assertEqual([tuple(x) for x in rows], [(1, 2), (2, 3)])
+        engine.dispose()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase
+
+import disnake as discord
+
+from outbound import BACKGROUND, FEEDBACK, STATUS, OutboundQueue
+from test.fake_discord import FakeAPI, FakeDiscord
+
+
+class OutboundQueueTest(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.queue = OutboundQueue()
+        self.fake = FakeDiscord(1, FakeAPI(latency=0.05))
+        [self.channel] = self.fake.channels.values()
+
+    async def asyncTearDown(self):
+        await self.queue.close()
+
+    async def test_reactions_run_concurrently(self):
+        message = self.channel.make_message("abcd efgh ijkl")
+        start = time.perf_counter()
+        await asyncio.gather(*(self.queue.run(
+            self.channel.id, "reaction", lambda r=r: message.add_reaction(r),
+            FEEDBACK) for r in "🐝👍👏"))
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertCountEqual(message.reactions, "🐝👍👏")
+
+    async def test_returns_result(self):
+        message = await self.queue.run(self.channel.id, "message",
+                                       lambda: self.channel.send("hello"))
+        self.assertIs(self.channel.sent[0], message)
+
+    async def test_feedback_goes_first(self):
+        queue = OutboundQueue({"message": (1, 60), "reaction": (1, 60)},
+                              concurrency=1)
+        self.addAsyncCleanup(queue.close)
+        order = []
+
+        async def action(name):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+        blocker = asyncio.create_task(
+            queue.run(1, "edit", lambda: action("edit"), STATUS))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.create_task(
+                queue.run(1, "message", lambda: action("message"), BACKGROUND)),
+            asyncio.create_task(
+                queue.run(1, "reaction", lambda: action("reaction"),
+                          FEEDBACK))
+        ]
+        await asyncio.gather(blocker, *queued)
+        self.assertEqual(order, ["edit", "reaction", "message"])
+
+    async def test_limits_pace_route(self):
+        queue = OutboundQueue({"reaction": (2, 0.2)})
+        self.addAsyncCleanup(queue.close)
+        times = []
+
+        async def action():
+            times.append(time.perf_counter())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(queue.run(1, "reaction", action)
+                               for _ in range(4)))
+        self.assertLess(times[1] - start, 0.05)
+        self.assertGreaterEqual(times[-1] - start, 0.15)
+
+    async def test_429_pauses_and_retries(self):
+        attempts = []
+
+        async def action():
+            attempts.append(time.perf_counter())
+            if len(attempts) == 1:
+                raise discord.HTTPException(
+                    SimpleNamespace(status=429,
+                                    reason="Too Many Requests",
+                                    headers={"Retry-After": "0.2"}),
+                    "You are being rate limited.")
+            return "done"
+
+        self.assertEqual(
+            await self.queue.run(self.channel.id, "reaction", action), "done")
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.15)
+        self.assertEqual(self.queue.rate_limited, 1)
+
+    async def test_errors_are_raised(self):
+
+        async def action():
+            raise discord.HTTPException(
+                SimpleNamespace(status=403, reason="Forbidden"),
+                "Missing Permissions")
+
+        with self.assertRaises(discord.HTTPException):
+            await self.queue.run(self.channel.id, "reaction", action)
+        self.assertEqual(self.queue.rate_limited, 0)
+
+    async def test_close_cancels_waiting(self):
+        queue = OutboundQueue({"message": (1, 60)})
+        await queue.run(1, "message", lambda: self.channel.send("first"))
+        waiting = asyncio.create_task(
+            queue.run(1, "message", lambda: self.channel.send("later")))
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(queue), 1)
+        await queue.close()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual([m.content for m in self.channel.sent], ["first"])
+
+    async def test_idle_worker_exits(self):
+        queue = OutboundQueue(idle_timeout=0.05)
+        self.addAsyncCleanup(queue.close)
+        await queue.run(1, "message", lambda: self.channel.send("hello"))
+        self.assertIn(1, queue._channels)
+        await asyncio.sleep(0.1)
+        self.assertNotIn(1, queue._channels)
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from puzzle_index import PuzzleIndex
+
+
+class PuzzleIndexTest(TestCase):
+
+    def setUp(self):
+        self.index = PuzzleIndex(
+            "2022-01-01", "a", ["l", "e", "r", "t", "n", "p"],
+            ["PLANTER", "planet", "alert", "plan", "later", "replant"])
+
+    def test_pangrams(self):
+        self.assertEqual(self.index.pangrams, frozenset(["planter",
+                                                         "replant"]))
+        self.assertTrue(self.index.is_pangram("Planter"))
+        self.assertFalse(self.index.is_pangram("plan"))
+
+    def test_find_guesses(self):
+        # (repeats are kept, so that they get the session's repeat reaction)
+        self.assertEqual(
+            self.index.find_guesses("<@1234> Planet! plan, alert? planet"),
+            ["planet", "plan", "alert", "planet"])
+
+    def test_keeps_possible_words(self):
+        # "plant" only uses the puzzle's letters but isn't an answer; it's up
+        # to the session to react to it
+        self.assertEqual(self.index.find_guesses("plant alert"),
+                         ["plant", "alert"])
+
+    def test_rejects_impossible_words(self):
+        # "pelt" is missing the center letter, "plane" is part of a longer
+        # word, "plans" uses a letter that isn't in the puzzle and "pal" is
+        # too short
+        self.assertEqual(self.index.find_guesses("pelt planetoid plans pal"),
+                         [])
+        self.assertEqual(self.index.find_guesses("good morning everyone"), [])
+        self.assertEqual(self.index.find_guesses(""), [])
+
+    def test_word_boundaries(self):
+        self.assertEqual(self.index.find_guesses("alert_ alert1 (alert)"),
+                         ["alert"])
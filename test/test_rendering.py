@@ -0,0 +1,77 @@
+import asyncio
+import os
+import time
+from unittest import IsolatedAsyncioTestCase
+
+from rendering import PuzzleRenderer, RenderError
+
+
+def quick_render(day: str, db_path: str) -> float:
+    # stands in for actually rendering; busy-waits so that the render would
+    # show up as event loop lag if it were run in this process
+    start = time.perf_counter()
+    while time.perf_counter() - start < 0.2:
+        pass
+    return time.perf_counter() - start
+
+
+def slow_render(day: str, db_path: str) -> float:
+    time.sleep(10)
+    return 10
+
+
+def flaky_render(day: str, db_path: str) -> float:
+    # fails the first time it's called and succeeds afterwards
+    if not os.path.exists(db_path):
+        open(db_path, "w").close()
+        raise RuntimeError("first attempt")
+    return 0.1
+
+
+class PuzzleRendererTest(IsolatedAsyncioTestCase):
+
+    async def test_render(self):
+        renderer = PuzzleRenderer(render_func=quick_render)
+        try:
+            duration = await renderer.render("2022-08-01", "unused.db")
+        finally:
+            renderer.close()
+        self.assertGreaterEqual(duration, 0.2)
+        self.assertEqual(renderer.last_duration, duration)
+        self.assertLess(renderer.last_max_lag, 0.2)
+
+    async def test_overlapping_renders(self):
+        renderer = PuzzleRenderer(attempts=1, render_func=quick_render)
+        try:
+            # (each render's attempt has its own worker, which the other one's
+            # doesn't stop)
+            durations = await asyncio.gather(
+                renderer.render("2022-08-01", "unused.db"),
+                renderer.render("2022-08-02", "unused.db"))
+        finally:
+            renderer.close()
+        for duration in durations:
+            self.assertGreaterEqual(duration, 0.2)
+        self.assertEqual(renderer._processes, set())
+
+    async def test_timeout(self):
+        renderer = PuzzleRenderer(
+            timeout=0.5, attempts=2, retry_delay=0, render_func=slow_render
+        )
+        start = time.monotonic()
+        with self.assertRaises(RenderError):
+            await renderer.render("2022-08-01", "unused.db")
+        renderer.close()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertIsNone(renderer.last_duration)
+
+    async def test_retry(self):
+        marker = "test_rendering_attempted"
+        if os.path.exists(marker):
+            os.remove(marker)
+        renderer = PuzzleRenderer(attempts=2, retry_delay=0, render_func=flaky_render)
+        try:
+            self.assertEqual(await renderer.render("2022-08-01", marker), 0.1)
+        finally:
+            renderer.close()
+            os.remove(marker)
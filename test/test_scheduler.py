@@ -0,0 +1,81 @@
+import asyncio
+from datetime import timedelta
+from unittest import IsolatedAsyncioTestCase
+
+from models import ScheduledPost, hourable, tz
+from scheduler import PostScheduler
+
+
+class PostSchedulerTest(IsolatedAsyncioTestCase):
+
+    @staticmethod
+    def get_future_post(guild_id=-1, **kwargs):
+        return ScheduledPost(guild_id=guild_id,
+                             channel_id=-1,
+                             timing=(hourable.now(tz=tz) +
+                                     timedelta(**kwargs)).decimal_hours)
+
+    def setUp(self):
+        self.fired: list[list[ScheduledPost]] = []
+        self.scheduler = PostScheduler(self.fired.append)
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    async def test_fires(self):
+        post = self.get_future_post(seconds=1)
+        self.scheduler.add(post)
+        self.assertIn(post.guild_id, self.scheduler)
+        await asyncio.sleep(2)
+        self.assertEqual(self.fired, [[post]])
+        # the post stays scheduled for the next day
+        self.assertIn(post.guild_id, self.scheduler)
+        self.assertGreater(self.scheduler.next_time(post.guild_id),
+                           hourable.now(tz=tz) + timedelta(hours=23))
+
+    async def test_batches_simultaneous_posts(self):
+        timing = self.get_future_post(seconds=1).timing
+        posts = [
+            ScheduledPost(guild_id=i, channel_id=i, timing=timing)
+            for i in range(5)
+        ]
+        self.scheduler.load(posts)
+        self.assertEqual(len(self.scheduler), 5)
+        await asyncio.sleep(2)
+        self.assertEqual(len(self.fired), 1)
+        self.assertCountEqual(self.fired[0], posts)
+
+    async def test_remove(self):
+        post = self.get_future_post(seconds=1)
+        self.scheduler.add(post)
+        self.assertTrue(self.scheduler.remove(post.guild_id))
+        self.assertFalse(self.scheduler.remove(post.guild_id))
+        await asyncio.sleep(2)
+        self.assertEqual(self.fired, [])
+
+    async def test_replace(self):
+        self.scheduler.add(self.get_future_post(seconds=1))
+        later = self.get_future_post(hours=1)
+        self.scheduler.add(later)
+        self.assertEqual(len(self.scheduler), 1)
+        await asyncio.sleep(2)
+        self.assertEqual(self.fired, [])
+
+    async def test_earlier_post_wakes_scheduler(self):
+        self.scheduler.add(self.get_future_post(guild_id=1, hours=1))
+        await asyncio.sleep(0)
+        soon = self.get_future_post(guild_id=2, seconds=1)
+        self.scheduler.add(soon)
+        await asyncio.sleep(2)
+        self.assertEqual(self.fired, [[soon]])
+
+    def test_compaction(self):
+        posts = [
+            ScheduledPost(guild_id=i, channel_id=i, timing=i % 24)
+            for i in range(100)
+        ]
+        self.scheduler.load(posts)
+        for post in posts[:60]:
+            self.scheduler.remove(post.guild_id)
+        self.assertEqual(len(self.scheduler), 40)
+        self.assertLessEqual(len(self.scheduler._heap), 70)
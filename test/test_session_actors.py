@@ -0,0 +1,93 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from session_actors import SessionActors
+from session_cache import SessionCache
+from test.test_session_cache import FakeStorage
+
+
+def respond(bee, content, message_id=None):
+    reactions = []
+    for word in content.split():
+        if word == "boom":
+            raise ValueError(word)
+        reactions.append("🤝" if word in bee.gotten_words else "👍")
+        bee.guess(word, message_id)
+    return reactions
+
+
+class SessionActorsTest(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.storage = FakeStorage(str(i) for i in range(10))
+        self.cache = SessionCache(self.storage, flush_interval=60)
+        self.actors = SessionActors(self.cache, respond, idle_timeout=0.05)
+
+    async def asyncTearDown(self):
+        await self.actors.close()
+        await self.cache.close()
+
+    async def test_concurrent_guesses(self):
+        words = [f"word{i}" for i in range(50)]
+        results = await asyncio.gather(
+            *(self.actors.submit("1", word) for word in words))
+        self.assertEqual([reactions for _, reactions in results],
+                         [["👍"]] * 50)
+        bee = await self.cache.get("1")
+        self.assertTrue(all(result_bee is bee for result_bee, _ in results))
+        self.assertEqual(bee.gotten_words, set(words))
+        self.assertEqual(self.storage.reads, 1)
+        self.assertEqual(self.actors.batches, 1)
+        self.assertEqual(self.cache.dirty_count, 1)
+        await self.cache.flush()
+        self.assertEqual(self.storage.saved["1"].gotten_words, set(words))
+
+    async def test_guesses_in_order(self):
+        results = await asyncio.gather(self.actors.submit("1", "same"),
+                                       self.actors.submit("1", "same other"),
+                                       self.actors.submit("1", "other"))
+        self.assertEqual([reactions for _, reactions in results],
+                         [["👍"], ["🤝", "👍"], ["🤝"]])
+
+    async def test_missing_session(self):
+        self.assertEqual(await self.actors.submit("missing", "word"),
+                         (None, []))
+        self.assertEqual(self.cache.dirty_count, 0)
+
+    async def test_error_goes_to_sender(self):
+        results = await asyncio.gather(self.actors.submit("1", "boom"),
+                                       self.actors.submit("1", "word"),
+                                       return_exceptions=True)
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual(results[1][1], ["👍"])
+
+    async def test_idle_actor_exits(self):
+        await self.actors.submit("1", "word")
+        self.assertEqual(len(self.actors), 1)
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(self.actors), 0)
+        self.assertEqual((await self.actors.submit("1", "word"))[1], ["🤝"])
+
+    async def test_close_cancels_waiting(self):
+        self.storage.read_session = lambda _: asyncio.sleep(10)
+        waiting = asyncio.create_task(self.actors.submit("1", "word"))
+        await asyncio.sleep(0.01)
+        await self.actors.close()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(len(self.actors), 0)
+
+    async def test_throughput(self):
+        sessions = [str(i) for i in range(10)]
+        await asyncio.gather(*(self.actors.submit(sessions[i % 10], f"word{i}")
+                               for i in range(5000)))
+        self.assertEqual(self.actors.messages, 5000)
+        # each session is looked up once per batch rather than per message,
+        # and saved once for all of its guesses
+        self.assertLessEqual(self.actors.batches, 20)
+        self.assertEqual(self.storage.reads, 10)
+        await self.cache.flush()
+        self.assertEqual(self.storage.saves, 1)
+        self.assertEqual(
+            sum(len(bee.gotten_words) for bee in self.storage.saved.values()),
+            5000)
@@ -0,0 +1,192 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from session_cache import SessionCache
+
+
+class FakeSession:
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.metadata = {}
+        self.gotten_words = set()
+        self.unsaved = []
+
+    def guess(self, word: str, message_id=None):
+        if word not in self.gotten_words:
+            self.gotten_words.add(word)
+            self.unsaved.append((self.session_id, word, message_id))
+
+    def take_unsaved(self):
+        unsaved, self.unsaved = self.unsaved, []
+        return unsaved
+
+
+class FakeStorage:
+    """
+    Stands in for storage.Storage, keeping saved sessions in a dict and
+    adding logged guesses to them.
+    """
+
+    def __init__(self, session_ids):
+        self.saved = {
+            session_id: FakeSession(session_id)
+            for session_id in session_ids
+        }
+        self.logged = []
+        self.reads = 0
+        self.saves = 0
+
+    async def read_session(self, session_id):
+        self.reads += 1
+        await asyncio.sleep(0)
+        saved = self.saved.get(session_id)
+        if saved is None:
+            return None
+        loaded = FakeSession(session_id)
+        loaded.metadata = dict(saved.metadata)
+        loaded.gotten_words = set(saved.gotten_words)
+        return loaded
+
+    async def log_guesses(self, guesses):
+        self.saves += 1
+        self.logged.extend(guesses)
+        for session_id, word, _ in guesses:
+            self.saved[session_id].gotten_words.add(word)
+
+    async def set_session_metadata(self, bee, metadata):
+        bee.metadata = metadata
+        await asyncio.sleep(0)
+        self.saved[bee.session_id].metadata = metadata
+
+
+class SessionCacheTest(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.storage = FakeStorage(str(i) for i in range(10))
+        self.cache = SessionCache(self.storage,
+                                  max_size=3,
+                                  idle_timeout=60,
+                                  flush_interval=0.05)
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    async def test_loads_once(self):
+        first, second = await asyncio.gather(self.cache.get("1"),
+                                             self.cache.get("1"))
+        self.assertIs(first, second)
+        self.assertIs(await self.cache.get("1"), first)
+        self.assertLessEqual(self.storage.reads, 2)
+        self.assertIsNone(await self.cache.get("missing"))
+        self.assertNotIn("missing", self.cache)
+
+    async def test_write_behind(self):
+        bee = await self.cache.get("1")
+        bee.guess("word")
+        self.cache.mark_dirty(bee)
+        self.assertEqual(self.storage.saved["1"].gotten_words, set())
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.storage.saved["1"].gotten_words, {"word"})
+        # only newly gotten words are logged, once each
+        bee.guess("word")
+        bee.guess("other")
+        self.cache.mark_dirty(bee)
+        await self.cache.flush()
+        self.assertEqual(self.storage.logged, [("1", "word", None),
+                                               ("1", "other", None)])
+
+    async def test_failed_flush(self):
+        bee = await self.cache.get("1")
+        bee.guess("word")
+        self.cache.mark_dirty(bee)
+        log_guesses = self.storage.log_guesses
+
+        async def fail(guesses):
+            raise OSError()
+
+        self.storage.log_guesses = fail
+        with self.assertRaises(OSError):
+            await self.cache.flush()
+        # the guesses are kept, and their session can't be evicted until
+        # they've been written
+        self.assertEqual(self.cache.dirty_count, 1)
+        self.storage.log_guesses = log_guesses
+        await self.cache.flush()
+        self.assertEqual(self.storage.logged, [("1", "word", None)])
+
+    async def test_evicted_during_failed_flush(self):
+        self.cache.idle_timeout = 0.01
+        bee = await self.cache.get("1")
+        bee.guess("word")
+        self.cache.mark_dirty(bee)
+        log_guesses = self.storage.log_guesses
+
+        async def fail_slowly(guesses):
+            await asyncio.sleep(0.05)
+            raise OSError()
+
+        self.storage.log_guesses = fail_slowly
+        flushing = asyncio.create_task(self.cache.flush())
+        await asyncio.sleep(0.02)
+        # the session is pinned while its guesses are being written
+        self.cache._evict()
+        self.assertIn("1", self.cache)
+        with self.assertRaises(OSError):
+            await flushing
+        self.storage.log_guesses = log_guesses
+        await self.cache.flush()
+        self.assertEqual(self.storage.logged, [("1", "word", None)])
+        self.cache._evict()
+        self.assertNotIn("1", self.cache)
+
+    async def test_flushes_in_batches(self):
+        for session_id in ("1", "2", "3"):
+            bee = await self.cache.get(session_id)
+            bee.guess("word")
+            self.cache.mark_dirty(bee)
+        await self.cache.flush()
+        self.assertEqual(self.storage.saves, 1)
+        self.assertEqual(self.cache.dirty_count, 0)
+
+    async def test_flushes_on_close(self):
+        bee = await self.cache.get("1")
+        bee.guess("word")
+        self.cache.mark_dirty(bee)
+        await self.cache.close()
+        self.assertEqual(self.storage.saved["1"].gotten_words, {"word"})
+
+    async def test_size_bound(self):
+        dirty = await self.cache.get("0")
+        self.cache.mark_dirty(dirty)
+        for session_id in ("1", "2", "3", "4"):
+            await self.cache.get(session_id)
+        self.assertEqual(len(self.cache), 3)
+        # dirty sessions aren't evicted until they've been saved
+        self.assertIn("0", self.cache)
+        self.assertNotIn("1", self.cache)
+        self.assertIn("4", self.cache)
+
+    async def test_idle_eviction(self):
+        self.cache.idle_timeout = 0.01
+        await self.cache.get("1")
+        await asyncio.sleep(0.1)
+        self.assertNotIn("1", self.cache)
+
+    async def test_metadata_during_load(self):
+        created = FakeSession("1")
+        loading = asyncio.create_task(self.cache.get("1"))
+        await self.cache.set_metadata(created, {"status_message_id": 5})
+        cached = await loading
+        self.assertEqual(cached.metadata, {"status_message_id": 5})
+        self.assertEqual(self.storage.saved["1"].metadata,
+                         {"status_message_id": 5})
+
+    async def test_metadata_written_through(self):
+        cached = await self.cache.get("1")
+        await self.cache.set_metadata(FakeSession("1"),
+                                      {"status_message_id": 6})
+        self.assertEqual(cached.metadata, {"status_message_id": 6})
+        self.assertEqual(self.storage.saved["1"].metadata,
+                         {"status_message_id": 6})
+        self.assertEqual(self.cache.dirty_count, 0)
@@ -0,0 +1,60 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from status_updates import StatusUpdater
+
+
+class FakeMessage:
+
+    def __init__(self, id: int):
+        self.id = id
+        self.contents: list[str] = []
+
+    async def edit(self, content: str):
+        self.contents.append(content)
+
+
+class StatusUpdaterTest(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.updater = StatusUpdater(window=0.1)
+        self.text = "0"
+
+    async def test_first_update_is_immediate(self):
+        message = FakeMessage(1)
+        await self.updater.update(message, lambda: self.text)
+        self.assertEqual(message.contents, ["0"])
+
+    async def test_coalesces_burst(self):
+        message = FakeMessage(1)
+        for i in range(10):
+            self.text = str(i)
+            await self.updater.update(message, lambda: self.text)
+        self.assertEqual(message.contents, ["0"])
+        await asyncio.sleep(0.2)
+        # one trailing edit shows the latest text
+        self.assertEqual(message.contents, ["0", "9"])
+        self.assertEqual(self.updater.requested, 10)
+        self.assertEqual(self.updater.edits, 2)
+        self.assertEqual(self.updater.edits_saved, 8)
+
+    async def test_separate_messages(self):
+        first, second = FakeMessage(1), FakeMessage(2)
+        await self.updater.update(first, lambda: "a")
+        await self.updater.update(second, lambda: "b")
+        self.assertEqual(first.contents, ["a"])
+        self.assertEqual(second.contents, ["b"])
+
+    async def test_quiet_period(self):
+        message = FakeMessage(1)
+        await self.updater.update(message, lambda: "a")
+        await asyncio.sleep(0.15)
+        await self.updater.update(message, lambda: "b")
+        self.assertEqual(message.contents, ["a", "b"])
+
+    async def test_close_flushes(self):
+        message = FakeMessage(1)
+        await self.updater.update(message, lambda: "a")
+        await self.updater.update(message, lambda: "b")
+        await self.updater.close()
+        self.assertEqual(message.contents, ["a", "b"])